@@ -0,0 +1,209 @@
+# api/cache/transcript_cache.py
+from collections import OrderedDict
+from typing import Optional, Any, Callable, Awaitable, NamedTuple
+import gzip
+import hashlib
+import json
+import logging
+import os
+
+import redis.asyncio as aioredis
+from fastapi.encoders import jsonable_encoder
+from starlette.requests import Request
+from starlette.responses import Response
+
+try:
+    import zstandard
+except ImportError:  # zstd responses are only offered when zstandard is installed
+    zstandard = None
+
+# In-process LRU bounded by the total size of the cached (compressed) bodies
+TRANSCRIPT_CACHE_MAX_BYTES = int(os.getenv("TRANSCRIPT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# Shared Redis tier
+TRANSCRIPT_CACHE_TTL = int(os.getenv("TRANSCRIPT_CACHE_TTL", str(7 * 24 * 60 * 60)))  # seconds
+TRANSCRIPT_CACHE_KEY_PREFIX = 'transcript_cache:'
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 10
+# Bodies smaller than this are sent uncompressed
+MIN_COMPRESS_SIZE = 1024  # bytes
+# Transcripts never change once written, so clients may reuse them for a while
+TRANSCRIPT_CACHE_CONTROL = 'public, max-age=86400'
+
+class CachedBody(NamedTuple):
+    body: bytes
+    etag: str
+
+def make_etag(data: bytes) -> str:
+    """
+    Weak ETag over the uncompressed JSON, so every encoding of the same
+    content shares one validator.
+    """
+    return f'W/"{hashlib.blake2b(data, digest_size=16).hexdigest()}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    opaque = etag[2:] if etag.startswith('W/') else etag
+    for tag in header.split(','):
+        tag = tag.strip()
+        if (tag[2:] if tag.startswith('W/') else tag) == opaque:
+            return True
+    return False
+
+def negotiate_encoding(request: Request) -> Optional[str]:
+    """
+    Picks the response encoding from Accept-Encoding, preferring zstd when it
+    is available, then gzip. Returns None for identity.
+    """
+    accepted = set()
+    for item in request.headers.get('accept-encoding', '').split(','):
+        name, _, params = item.partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                pass
+        if quality > 0:
+            accepted.add(name.strip().lower())
+    if zstandard is not None and 'zstd' in accepted:
+        return 'zstd'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    # A fixed mtime keeps the output identical across API instances
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+def decompress(data: bytes, encoding: str) -> bytes:
+    if encoding == 'zstd':
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+class TranscriptCache:
+    """
+    Read-through cache for completed transcripts, which never change once
+    written. Entries are compressed JSON response bodies with their ETag,
+    keyed by response form, encoding and video_id, held in an in-process LRU
+    with a byte-size cap and backed by Redis with a TTL. Hot videos are
+    therefore served without touching MongoDB or re-encoding JSON.
+    """
+    def __init__(self, max_bytes: int = TRANSCRIPT_CACHE_MAX_BYTES, ttl: int = TRANSCRIPT_CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries: "OrderedDict[str, CachedBody]" = OrderedDict()
+        self.size = 0
+
+    def _get_local(self, key: str) -> Optional[CachedBody]:
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    def _put_local(self, key: str, entry: CachedBody):
+        if len(entry.body) > self.max_bytes:
+            return
+        previous = self.entries.pop(key, None)
+        if previous is not None:
+            self.size -= len(previous.body)
+        self.entries[key] = entry
+        self.size += len(entry.body)
+        while self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted.body)
+
+    async def get(self, redis_client: aioredis.Redis, form: str, video_id: str,
+                  loader: Callable[[], Awaitable[Optional[Any]]],
+                  encoding: Optional[str] = 'gzip') -> Optional[CachedBody]:
+        """
+        Returns the compressed response body for a video, loading it with
+        `loader` (which returns the response payload or None) on a miss.
+        Identity requests share the gzip entry. Missing transcripts are not
+        cached since they may appear later.
+        """
+        encoding = encoding or 'gzip'
+        key = f"{form}:{encoding}:{video_id}"
+        entry = self._get_local(key)
+        if entry is not None:
+            return entry
+
+        redis_key = f"{TRANSCRIPT_CACHE_KEY_PREFIX}{key}"
+        try:
+            etag, body = await redis_client.hmget(redis_key, 'etag', 'body')
+        except aioredis.RedisError as e:
+            logging.warning(f"Transcript cache read failed for {key}: {e}")
+            etag, body = None, None
+        if etag is not None and body is not None:
+            entry = CachedBody(body, etag.decode())
+            self._put_local(key, entry)
+            return entry
+
+        payload = await loader()
+        if payload is None:
+            return None
+        encoded = json.dumps(jsonable_encoder(payload), separators=(',', ':')).encode()
+        entry = CachedBody(compress(encoded, encoding), make_etag(encoded))
+        self._put_local(key, entry)
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                pipe.hset(redis_key, mapping={'etag': entry.etag, 'body': entry.body})
+                pipe.expire(redis_key, self.ttl)
+                await pipe.execute()
+        except aioredis.RedisError as e:
+            logging.warning(f"Transcript cache write failed for {key}: {e}")
+        return entry
+
+def not_modified_response(etag: str) -> Response:
+    return Response(status_code=304, headers={
+        'ETag': etag,
+        'Cache-Control': TRANSCRIPT_CACHE_CONTROL,
+        'Vary': 'Accept-Encoding'
+    })
+
+def compressed_json_response(request: Request, cached: CachedBody, encoding: Optional[str],
+                             status_code: int = 200, conditional: bool = True) -> Response:
+    """
+    Sends a cached body as-is in the negotiated encoding, decompressing the
+    gzip entry for clients that accept neither. With `conditional`, the
+    response is tagged and cacheable and matching If-None-Match requests get
+    a 304; without it (e.g. for POST responses) neither applies.
+    """
+    headers = {'Vary': 'Accept-Encoding'}
+    if conditional:
+        if etag_matches(request, cached.etag):
+            return not_modified_response(cached.etag)
+        headers['ETag'] = cached.etag
+        headers['Cache-Control'] = TRANSCRIPT_CACHE_CONTROL
+    if encoding:
+        headers['Content-Encoding'] = encoding
+        return Response(content=cached.body, status_code=status_code, media_type='application/json', headers=headers)
+    return Response(content=decompress(cached.body, 'gzip'), status_code=status_code, media_type='application/json', headers=headers)
+
+def json_response(request: Request, payload: Any, status_code: int = 200) -> Response:
+    """
+    Uncached counterpart of compressed_json_response for small payloads such
+    as segment pages: serializes, tags and compresses on the fly.
+    """
+    body = json.dumps(jsonable_encoder(payload), separators=(',', ':')).encode()
+    etag = make_etag(body)
+    if etag_matches(request, etag):
+        return not_modified_response(etag)
+    headers = {
+        'ETag': etag,
+        'Cache-Control': TRANSCRIPT_CACHE_CONTROL,
+        'Vary': 'Accept-Encoding'
+    }
+    encoding = negotiate_encoding(request)
+    if encoding and len(body) >= MIN_COMPRESS_SIZE:
+        headers['Content-Encoding'] = encoding
+        body = compress(body, encoding)
+    return Response(content=body, status_code=status_code, media_type='application/json', headers=headers)
+
+transcript_cache = TranscriptCache()
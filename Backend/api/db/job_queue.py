@@ -0,0 +1,138 @@
+# api/db/job_queue.py
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional, List, Tuple, Any
+
+import redis.asyncio as aioredis
+from motor.motor_asyncio import AsyncIOMotorCollection
+
+# Jobs wait in this sorted set until a worker promotes them into the
+# transcription stream, lowest score first
+JOB_QUEUE_KEY = 'transcription_queue'
+# Idle workers block on this list; every enqueue pushes a wake-up token
+QUEUE_WAKE_KEY = 'transcription_queue_wake'
+CLIENT_CLOCK_KEY_PREFIX = 'queue_client_clock:'
+
+# Queue delay charged per second of audio: short videos go first, while a
+# long video still runs once it has waited out its (capped) charge
+QUEUE_SECONDS_PER_AUDIO_SECOND = float(os.getenv("QUEUE_SECONDS_PER_AUDIO_SECOND", "0.1"))
+MAX_QUEUE_DELAY = float(os.getenv("MAX_QUEUE_DELAY", "1800"))  # seconds
+# Charged for videos whose duration could not be looked up
+DEFAULT_JOB_DURATION = float(os.getenv("DEFAULT_JOB_DURATION", "600"))  # seconds
+# Extra lifetime of a client's clock after its last charge runs out
+CLIENT_CLOCK_GRACE = 60  # seconds
+# Active jobs still pending after this long, and no longer queued, are
+# assumed orphaned (e.g. the API died between recording and queueing them)
+STALE_PENDING_JOB_AGE = float(os.getenv("STALE_PENDING_JOB_AGE", "3600"))  # seconds
+
+# Each client has a virtual clock that starts at the current time and
+# advances by the charge of every job it submits. A job is scored at its
+# client's advanced clock, so one client's backlog interleaves with other
+# clients' jobs instead of running ahead of them.
+ENQUEUE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local clock = tonumber(redis.call('GET', KEYS[2]) or '0')
+local score = math.max(now, clock) + tonumber(ARGV[2])
+redis.call('ZADD', KEYS[1], score, ARGV[3])
+redis.call('SET', KEYS[2], tostring(score), 'EX', math.ceil(score - now) + tonumber(ARGV[4]))
+redis.call('LPUSH', KEYS[3], '1')
+redis.call('LTRIM', KEYS[3], 0, 0)
+return tostring(score)
+"""
+
+def job_member(job_data: Dict[str, str]) -> str:
+    return json.dumps(job_data, sort_keys=True)
+
+def queue_charge(duration: Optional[float]) -> float:
+    """
+    Returns the queue delay charged for a job of `duration` seconds.
+    """
+    if duration is None or duration <= 0:
+        duration = DEFAULT_JOB_DURATION
+    return min(duration * QUEUE_SECONDS_PER_AUDIO_SECOND, MAX_QUEUE_DELAY)
+
+async def enqueue_job(redis_client: aioredis.Redis, job_data: Dict[str, str], client_id: str,
+                      duration: Optional[float]) -> float:
+    """
+    Adds a job to the priority queue and wakes an idle worker. Returns the
+    job's score (the time before which it yields to cheaper work).
+    """
+    score = await redis_client.eval(
+        ENQUEUE_SCRIPT, 3,
+        JOB_QUEUE_KEY, f"{CLIENT_CLOCK_KEY_PREFIX}{client_id}", QUEUE_WAKE_KEY,
+        time.time(), queue_charge(duration), job_member(job_data), CLIENT_CLOCK_GRACE
+    )
+    return float(score)
+
+async def enqueue_jobs(redis_client: aioredis.Redis, jobs: List[Tuple[Dict[str, str], Optional[float]]],
+                       client_id: str) -> List[float]:
+    """
+    Queues many (job_data, duration) pairs in one pipelined round trip. The
+    jobs are charged to the client's clock in order, so a large batch
+    interleaves with other clients' work instead of jumping ahead of it.
+    """
+    if not jobs:
+        return []
+    clock_key = f"{CLIENT_CLOCK_KEY_PREFIX}{client_id}"
+    now = time.time()
+    pipeline = redis_client.pipeline(transaction=False)
+    for job_data, duration in jobs:
+        pipeline.eval(
+            ENQUEUE_SCRIPT, 3,
+            JOB_QUEUE_KEY, clock_key, QUEUE_WAKE_KEY,
+            now, queue_charge(duration), job_member(job_data), CLIENT_CLOCK_GRACE
+        )
+    return [float(score) for score in await pipeline.execute()]
+
+async def requeue_stale_jobs(redis_client: aioredis.Redis, jobs_collection: AsyncIOMotorCollection,
+                             jobs: List[Dict[str, Any]], client_id: str) -> int:
+    """
+    Queues again the jobs among `jobs` (job records) that are still pending
+    STALE_PENDING_JOB_AGE after their last update and are no longer in the
+    queue, so submissions coalescing onto an orphaned job do not wait on it
+    forever. Returns how many were queued.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=STALE_PENDING_JOB_AGE)
+    requeued = 0
+    for job in jobs:
+        if job.get('status') != 'pending' or not job.get('updated_at') or job['updated_at'] >= cutoff:
+            continue
+        # Claim the recovery so concurrent submissions queue the job only once
+        claimed = await jobs_collection.update_one(
+            {'job_id': job['job_id'], 'status': 'pending', 'updated_at': job['updated_at']},
+            {'$set': {'updated_at': datetime.utcnow()}}
+        )
+        if not claimed.modified_count:
+            continue
+        job_data = {'job_id': job['job_id'], 'video_id': job['video_id']}
+        if await redis_client.zscore(JOB_QUEUE_KEY, job_member(job_data)) is not None:
+            continue
+        logging.warning(f"Requeueing job {job['job_id']}, pending since {job['updated_at']}")
+        await enqueue_job(redis_client, job_data, client_id, None)
+        requeued += 1
+    return requeued
+
+async def abandon_jobs(jobs_collection: AsyncIOMotorCollection, job_ids: List[str]):
+    """
+    Fails jobs that were recorded but could not be queued, releasing their
+    videos for new submissions. Clients already attached to them see the
+    failure instead of waiting on a job that will never run.
+    """
+    if not job_ids:
+        return
+    try:
+        await jobs_collection.update_many(
+            {'job_id': {'$in': job_ids}, 'status': 'pending'},
+            {'$set': {
+                'status': 'failed',
+                'error': 'The job could not be queued. Please submit it again.',
+                'error_type': 'QUEUE_ERROR',
+                'updated_at': datetime.utcnow()
+            }, '$unset': {'active': ''}}
+        )
+    except Exception as e:
+        # Left active, the jobs are requeued once STALE_PENDING_JOB_AGE passes
+        logging.error(f"Error abandoning unqueued jobs {job_ids}: {e}")
@@ -1,6 +1,6 @@
 # api/db/mongodb.py
-from pymongo import MongoClient
-from pymongo.collection import Collection
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import ASCENDING
 from fastapi import Depends
 import os
 from dotenv import load_dotenv
@@ -10,8 +10,38 @@ load_dotenv()
 MONGODB_URL = os.getenv("MONGODB_URL")
 DATABASE_NAME = os.getenv("DATABASE_NAME", "transcriptions")
 
-client = MongoClient(MONGODB_URL)
+# Connection pool sizing and timeouts
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "10"))
+MONGO_OPERATION_TIMEOUT_MS = int(os.getenv("MONGO_OPERATION_TIMEOUT_MS", "5000"))
+MONGO_CONNECT_TIMEOUT_MS = 5000
+MONGO_WAIT_QUEUE_TIMEOUT_MS = 2000  # max wait for a free pooled connection
+
+# The async client never blocks the event loop; timeoutMS bounds every
+# operation (including server selection and waiting for a pooled connection)
+client = AsyncIOMotorClient(
+    MONGODB_URL,
+    maxPoolSize=MONGO_MAX_POOL_SIZE,
+    minPoolSize=MONGO_MIN_POOL_SIZE,
+    connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+    waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    timeoutMS=MONGO_OPERATION_TIMEOUT_MS
+)
 db = client[DATABASE_NAME]
 
-def get_db():
+def get_db() -> AsyncIOMotorDatabase:
     return db
+
+async def ensure_indexes(database: AsyncIOMotorDatabase = db):
+    """
+    Creates the indexes the API relies on. At most one job per video can be
+    active (pending or processing), which makes concurrent submissions for the
+    same video coalesce onto a single job across all API replicas.
+    """
+    await database.jobs.create_index([('job_id', ASCENDING)], unique=True)
+    await database.jobs.create_index(
+        [('video_id', ASCENDING)],
+        unique=True,
+        partialFilterExpression={'active': True},
+        name='active_job_per_video'
+    )
@@ -0,0 +1,44 @@
+# api/db/redis.py
+import redis.asyncio as aioredis
+import os
+
+REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
+REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
+REDIS_DB = int(os.getenv("REDIS_DB", "0"))
+
+# Connection pool sizing and timeouts
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "100"))
+REDIS_POOL_TIMEOUT = 2  # seconds to wait for a free pooled connection
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "2"))  # per-command timeout
+REDIS_CONNECT_TIMEOUT = 2  # seconds
+# Every open event stream holds a pub/sub connection for its lifetime
+REDIS_MAX_PUBSUB_CONNECTIONS = int(os.getenv("REDIS_MAX_PUBSUB_CONNECTIONS", "1000"))
+
+# Commands wait briefly for a free connection instead of failing when the pool is busy
+command_pool = aioredis.BlockingConnectionPool(
+    host=REDIS_HOST,
+    port=REDIS_PORT,
+    db=REDIS_DB,
+    max_connections=REDIS_MAX_CONNECTIONS,
+    timeout=REDIS_POOL_TIMEOUT,
+    socket_timeout=REDIS_SOCKET_TIMEOUT,
+    socket_connect_timeout=REDIS_CONNECT_TIMEOUT
+)
+redis_client = aioredis.Redis(connection_pool=command_pool)
+
+# Pub/sub connections idle between events, so they have no read timeout
+pubsub_pool = aioredis.ConnectionPool(
+    host=REDIS_HOST,
+    port=REDIS_PORT,
+    db=REDIS_DB,
+    max_connections=REDIS_MAX_PUBSUB_CONNECTIONS,
+    socket_connect_timeout=REDIS_CONNECT_TIMEOUT
+)
+pubsub_client = aioredis.Redis(connection_pool=pubsub_pool)
+
+def get_redis() -> aioredis.Redis:
+    return redis_client
+
+async def close_redis():
+    await redis_client.aclose()
+    await pubsub_client.aclose()
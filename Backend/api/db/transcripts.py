@@ -0,0 +1,48 @@
+# api/db/transcripts.py
+from typing import Optional, Dict, Any, List, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+
+from shared.transcript_codec import CompactTranscript, is_compact, load_transcription
+
+async def find_transcript(transcriptions_collection: AsyncIOMotorCollection, video_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Loads a stored transcript in the legacy response shape (video_id,
+    video_title, transcription_raw, transcription), decoding compact
+    documents on the way out.
+    """
+    doc = await transcriptions_collection.find_one({'_id': video_id})
+    if not doc:
+        return None
+    return {
+        'video_id': doc['_id'],
+        'video_title': doc.get('video_title'),
+        **load_transcription(doc)
+    }
+
+async def find_segment_page(transcriptions_collection: AsyncIOMotorCollection, video_id: str,
+                            cursor: int, limit: int) -> Optional[Tuple[Optional[str], List[Dict[str, Any]], bool]]:
+    """
+    Returns (video_title, segments, has_more) for `limit` segments starting
+    at `cursor`. Legacy documents are sliced in MongoDB; compact documents
+    only build the requested segments.
+    """
+    # One extra segment tells whether another page follows
+    doc = await transcriptions_collection.find_one(
+        {'_id': video_id},
+        {
+            'video_title': 1,
+            'format': 1,
+            'segment_count': 1,
+            'segments_blob': 1,
+            'transcription.segments': {'$slice': [cursor, limit + 1]}
+        }
+    )
+    if not doc:
+        return None
+    if is_compact(doc):
+        transcript = CompactTranscript(doc)
+        segments = transcript.segments(cursor, cursor + limit) if cursor < len(transcript) else []
+        return doc.get('video_title'), segments, cursor + limit < len(transcript)
+    segments = (doc.get('transcription') or {}).get('segments', [])
+    return doc.get('video_title'), segments[:limit], len(segments) > limit
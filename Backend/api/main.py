@@ -1,7 +1,14 @@
 # api/main.py
-from fastapi import FastAPI
-from api.routers import transcription, health
+from fastapi import FastAPI, Response
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+from api.routers import transcription, batch, health
 from api.middleware.access_control import AccessControlMiddleware
+from api.middleware.metrics import MetricsMiddleware
+from api.db.mongodb import ensure_indexes, client as mongo_client
+from api.db.redis import close_redis
+from api.utils.video_info import close_http_client
+from api.utils.metrics import monitor_event_loop_lag
+import asyncio
 import logging
 
 # Initialize FastAPI app
@@ -14,10 +21,12 @@ app = FastAPI(
 
 # Include Routers
 app.include_router(transcription.router, prefix="/transcribe", tags=["Transcription"])
+app.include_router(batch.router, prefix="/transcribe/batch", tags=["Batch"])
 app.include_router(health.router, tags=["Health"])
 
 # Add Middleware
 app.add_middleware(AccessControlMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 # Configure Logging
 logging.basicConfig(
@@ -25,7 +34,31 @@ logging.basicConfig(
     level=logging.INFO
 )
 
+# Background task probing the event loop for lag
+loop_lag_monitor = None
+
+@app.on_event("startup")
+async def create_indexes():
+    await ensure_indexes()
+
+@app.on_event("startup")
+async def start_loop_lag_monitor():
+    global loop_lag_monitor
+    loop_lag_monitor = asyncio.create_task(monitor_event_loop_lag())
+
+@app.on_event("shutdown")
+async def close_connections():
+    if loop_lag_monitor:
+        loop_lag_monitor.cancel()
+    await close_redis()
+    await close_http_client()
+    mongo_client.close()
+
 # Root endpoint for health check
 @app.get("/")
 def read_root():
     return {"message": "Welcome to the YouTube Transcription API. Health check OK."}
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,37 @@
+# api/middleware/metrics.py
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+import time
+
+from api.utils.metrics import REQUEST_DURATION
+
+def route_template(request: Request) -> str:
+    """
+    The matched route with its parameters put back, e.g. /transcribe/status/{job_id}.
+    Requests that matched no route share one label.
+    """
+    if 'route' not in request.scope:
+        return 'unmatched'
+    path = request.scope.get('path', '')
+    for name, value in request.scope.get('path_params', {}).items():
+        path = path.replace(f"/{value}", f"/{{{name}}}", 1)
+    return path
+
+class MetricsMiddleware(BaseHTTPMiddleware):
+    """
+    Records how long each request takes until its response starts. Event
+    streams are therefore timed to their first byte, not their lifetime.
+    """
+    async def dispatch(self, request: Request, call_next):
+        started = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            REQUEST_DURATION.labels(
+                request.method,
+                route_template(request),
+                str(status)
+            ).observe(time.perf_counter() - started)
@@ -1,5 +1,13 @@
 # api/models/request.py
 from pydantic import BaseModel, HttpUrl
+from typing import Optional, List
 
 class TranscriptionRequest(BaseModel):
     youtube_url: HttpUrl
+
+class BatchTranscriptionRequest(BaseModel):
+    youtube_urls: Optional[List[str]] = None
+    playlist_id: Optional[str] = None
+
+class BulkJobStatusRequest(BaseModel):
+    job_ids: List[str]
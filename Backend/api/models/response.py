@@ -1,6 +1,6 @@
 # api/models/response.py
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 
 class TranscriptionResponse(BaseModel):
     status: str
@@ -15,6 +15,36 @@ class JobStatusResponse(BaseModel):
     job_id: Optional[str] = None
     video_id: Optional[str] = None
     video_title: Optional[str] = None
-    transcription_raw: Optional[str] = None
-    transcription: Optional[Dict[str, Any]] = None
+    transcript_url: Optional[str] = None
+    error: Optional[str] = None
+
+class BulkJobStatusResponse(BaseModel):
+    jobs: List[JobStatusResponse]
+    not_found: List[str] = []
+
+class TranscriptPageResponse(BaseModel):
+    video_id: str
+    video_title: Optional[str] = None
+    segments: List[Dict[str, Any]]
+    cursor: int
+    next_cursor: Optional[int] = None
+
+
+class BatchItem(BaseModel):
+    video_id: str
+    job_id: Optional[str] = None
+    status: str
     error: Optional[str] = None
+
+class BatchTranscriptionResponse(BaseModel):
+    batch_id: str
+    total: int
+    items: List[BatchItem]
+    invalid_urls: List[str] = []
+
+class BatchStatusResponse(BaseModel):
+    batch_id: str
+    total: int
+    counts: Dict[str, int]
+    progress: float
+    items: List[BatchItem]
@@ -0,0 +1,217 @@
+# api/routers/batch.py
+from fastapi import APIRouter, HTTPException, Depends, Request
+from api.models.request import BatchTranscriptionRequest
+from api.models.response import BatchTranscriptionResponse, BatchStatusResponse, BatchItem
+from api.db.mongodb import get_db
+from api.db.redis import get_redis
+from api.db.job_queue import enqueue_jobs, requeue_stale_jobs, abandon_jobs
+from api.routers.transcription import client_identifier, JOB_PROGRESS_KEY_PREFIX, TERMINAL_JOB_STATUSES
+from api.utils.validation import validate_youtube_url, extract_video_id
+from api.utils.video_info import get_video_durations, fetch_playlist_video_ids
+from api.utils.metrics import SUBMISSIONS
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo.errors import BulkWriteError
+from datetime import datetime
+from typing import Dict, List
+import asyncio
+import json
+import logging
+import os
+import re
+import uuid
+
+router = APIRouter()
+
+# Videos accepted per batch (a playlist is cut off after this many)
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "500"))
+PLAYLIST_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{2,64}$')
+DUPLICATE_KEY_ERROR = 11000
+
+@router.post("/", response_model=BatchTranscriptionResponse, status_code=202)
+async def create_batch(request: BatchTranscriptionRequest, http_request: Request, db=Depends(get_db), redis_client=Depends(get_redis)):
+    """
+    Submits many videos at once, given as a list of URLs or a playlist ID.
+    Already transcribed videos and videos with a job in flight are looked up
+    with one query each, new jobs are inserted with one bulk write and
+    queued in one pipelined Redis round trip.
+    """
+    if bool(request.youtube_urls) == bool(request.playlist_id):
+        raise HTTPException(status_code=400, detail="Provide either youtube_urls or playlist_id.")
+
+    invalid_urls: List[str] = []
+    if request.playlist_id:
+        if not PLAYLIST_ID_PATTERN.match(request.playlist_id):
+            raise HTTPException(status_code=400, detail="Invalid playlist ID.")
+        try:
+            requested_ids = await fetch_playlist_video_ids(request.playlist_id, MAX_BATCH_SIZE)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail="Timed out reading the playlist.")
+        except Exception as e:
+            logging.error(f"Error reading playlist {request.playlist_id}: {e}")
+            raise HTTPException(status_code=400, detail="Could not read the playlist.")
+    else:
+        if len(request.youtube_urls) > MAX_BATCH_SIZE:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_SIZE} URLs per batch.")
+        requested_ids = []
+        for youtube_url in request.youtube_urls:
+            video_id = extract_video_id(youtube_url) if validate_youtube_url(youtube_url) else None
+            if video_id:
+                requested_ids.append(video_id)
+            else:
+                invalid_urls.append(youtube_url)
+
+    # Each video once, in submission order
+    video_ids = list(dict.fromkeys(requested_ids))
+    if not video_ids:
+        raise HTTPException(status_code=400, detail="No valid YouTube videos in the batch.")
+
+    transcriptions_collection: AsyncIOMotorCollection = db.transcriptions
+    jobs_collection: AsyncIOMotorCollection = db.jobs
+    items: Dict[str, BatchItem] = {}
+    attached_jobs: List[Dict] = []
+    try:
+        async for doc in transcriptions_collection.find({'_id': {'$in': video_ids}}, {'_id': 1}):
+            items[doc['_id']] = BatchItem(video_id=doc['_id'], status='success')
+
+        async def attach_active_jobs(candidate_ids: List[str]):
+            async for job in jobs_collection.find(
+                {'video_id': {'$in': candidate_ids}, 'active': True},
+                {'job_id': 1, 'video_id': 1, 'status': 1, 'updated_at': 1}
+            ):
+                items[job['video_id']] = BatchItem(video_id=job['video_id'], job_id=job['job_id'], status=job['status'])
+                attached_jobs.append(job)
+
+        await attach_active_jobs([video_id for video_id in video_ids if video_id not in items])
+
+        now = datetime.utcnow()
+        new_jobs = {
+            video_id: {
+                'job_id': str(uuid.uuid4()),
+                'video_id': video_id,
+                'status': 'pending',
+                'active': True,
+                'created_at': now,
+                'updated_at': now
+            }
+            for video_id in video_ids if video_id not in items
+        }
+        if new_jobs:
+            try:
+                await jobs_collection.insert_many(list(new_jobs.values()), ordered=False)
+            except BulkWriteError as e:
+                # Videos another request started meanwhile attach to that job
+                write_errors = e.details.get('writeErrors', [])
+                if any(error['code'] != DUPLICATE_KEY_ERROR for error in write_errors):
+                    raise
+                raced = [error['op']['video_id'] for error in write_errors]
+                for video_id in raced:
+                    new_jobs.pop(video_id, None)
+                await attach_active_jobs(raced)
+            for video_id, job in new_jobs.items():
+                items[video_id] = BatchItem(video_id=video_id, job_id=job['job_id'], status='pending')
+    except Exception as e:
+        logging.error(f"Error recording batch jobs in MongoDB: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error.")
+
+    # A video that finished between the queries above has no item yet
+    for video_id in video_ids:
+        items.setdefault(video_id, BatchItem(video_id=video_id, status='success'))
+
+    batch_id = str(uuid.uuid4())
+    batch_items = [items[video_id] for video_id in video_ids]
+    try:
+        await db.batches.insert_one({
+            '_id': batch_id,
+            'items': [{'video_id': item.video_id, 'job_id': item.job_id} for item in batch_items],
+            'created_at': datetime.utcnow()
+        })
+    except Exception as e:
+        logging.error(f"Error inserting batch into MongoDB: {e}")
+        await abandon_jobs(jobs_collection, [job['job_id'] for job in new_jobs.values()])
+        raise HTTPException(status_code=500, detail="Internal server error.")
+
+    if new_jobs:
+        durations = await get_video_durations(redis_client, list(new_jobs))
+        try:
+            await enqueue_jobs(
+                redis_client,
+                [({'job_id': job['job_id'], 'video_id': video_id}, durations[video_id]) for video_id, job in new_jobs.items()],
+                client_identifier(http_request)
+            )
+        except Exception as e:
+            logging.error(f"Error adding batch jobs to Redis queue: {e}")
+            # Otherwise later submissions would coalesce onto jobs that never run
+            await abandon_jobs(jobs_collection, [job['job_id'] for job in new_jobs.values()])
+            raise HTTPException(status_code=500, detail="Internal server error.")
+    if attached_jobs:
+        try:
+            await requeue_stale_jobs(redis_client, jobs_collection, attached_jobs, client_identifier(http_request))
+        except Exception as e:
+            logging.error(f"Error requeueing stale batch jobs: {e}")
+
+    for item in batch_items:
+        if item.job_id is None:
+            SUBMISSIONS.labels('completed').inc()
+        else:
+            SUBMISSIONS.labels('queued' if item.video_id in new_jobs else 'attached').inc()
+    logging.info(f"Batch {batch_id}: {len(new_jobs)} new jobs for {len(video_ids)} videos")
+    return BatchTranscriptionResponse(
+        batch_id=batch_id,
+        total=len(batch_items),
+        items=batch_items,
+        invalid_urls=invalid_urls
+    )
+
+@router.get("/{batch_id}", response_model=BatchStatusResponse)
+async def get_batch_status(batch_id: str, db=Depends(get_db), redis_client=Depends(get_redis)):
+    """
+    Returns the state of every video in a batch, counts per status and the
+    overall progress (0-100), which includes the live progress of running
+    jobs.
+    """
+    batch = await db.batches.find_one({'_id': batch_id})
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found.")
+
+    job_ids = [item['job_id'] for item in batch['items'] if item.get('job_id')]
+    jobs = {}
+    if job_ids:
+        async for job in db.jobs.find({'job_id': {'$in': job_ids}}, {'job_id': 1, 'status': 1, 'error': 1}):
+            jobs[job['job_id']] = job
+
+    running = [job_id for job_id, job in jobs.items() if job['status'] not in TERMINAL_JOB_STATUSES]
+    live_progress: Dict[str, float] = {}
+    if running:
+        try:
+            snapshots = await redis_client.mget([f"{JOB_PROGRESS_KEY_PREFIX}{job_id}" for job_id in running])
+            for job_id, snapshot in zip(running, snapshots):
+                if snapshot:
+                    live_progress[job_id] = json.loads(snapshot).get('progress', 0)
+        except Exception as e:
+            logging.error(f"Error reading job progress from Redis: {e}")
+
+    items = []
+    counts: Dict[str, int] = {}
+    progress_total = 0.0
+    for entry in batch['items']:
+        job = jobs.get(entry.get('job_id')) if entry.get('job_id') else None
+        if entry.get('job_id') and not job:
+            status = 'unknown'
+        else:
+            status = job['status'] if job else 'success'
+        items.append(BatchItem(
+            video_id=entry['video_id'],
+            job_id=entry.get('job_id'),
+            status=status,
+            error=job.get('error') if job and status == 'failed' else None
+        ))
+        counts[status] = counts.get(status, 0) + 1
+        progress_total += 100 if status in TERMINAL_JOB_STATUSES else live_progress.get(entry.get('job_id'), 0)
+
+    return BatchStatusResponse(
+        batch_id=batch_id,
+        total=len(items),
+        counts=counts,
+        progress=round(progress_total / len(items), 1) if items else 100.0,
+        items=items
+    )
@@ -1,30 +1,80 @@
 # api/routers/transcription.py
-from fastapi import APIRouter, HTTPException, Depends
-from api.models.request import TranscriptionRequest
-from api.models.response import TranscriptionResponse, JobStatusResponse
+from fastapi import APIRouter, HTTPException, Depends, Request, Query
+from api.models.request import TranscriptionRequest, BulkJobStatusRequest
+from api.models.response import TranscriptionResponse, JobStatusResponse, TranscriptPageResponse, BulkJobStatusResponse
 from api.db.mongodb import get_db
+from api.db.redis import get_redis, pubsub_client
+from api.db.transcripts import find_transcript, find_segment_page
+from api.db.job_queue import enqueue_job, requeue_stale_jobs, abandon_jobs
+from api.cache.transcript_cache import (
+    transcript_cache,
+    compressed_json_response,
+    json_response,
+    negotiate_encoding
+)
 from api.utils.validation import validate_youtube_url, extract_video_id
-from pymongo.collection import Collection
+from api.utils.video_info import get_video_duration
+from api.utils.metrics import SUBMISSIONS
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo.errors import DuplicateKeyError
 from datetime import datetime
 import uuid
-import redis
 import json
-from fastapi.responses import JSONResponse
+import ipaddress
+import os
+from fastapi.responses import JSONResponse, StreamingResponse
 import logging
-from typing import Optional
+from typing import Optional, Dict, Any
 
 router = APIRouter()
 
-# Redis configuration
-REDIS_HOST = 'localhost'
-REDIS_PORT = 6379
-REDIS_DB = 0
+# Live progress events published by the transcriber
+JOB_EVENTS_CHANNEL_PREFIX = 'job_events:'
+JOB_PROGRESS_KEY_PREFIX = 'job_progress:'
+SSE_KEEPALIVE_INTERVAL = 15  # seconds
+TERMINAL_JOB_STATUSES = ('success', 'failed')
 
-# Initialize Redis client
-redis_client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB)
+# Segment pagination for the transcript endpoint
+DEFAULT_SEGMENT_PAGE_SIZE = 200
+MAX_SEGMENT_PAGE_SIZE = 1000
+
+# Job IDs accepted by one bulk status request
+MAX_BULK_STATUS_JOBS = 1000
+
+# Proxies (addresses or CIDR ranges) whose X-Forwarded-For entries are trusted
+TRUSTED_PROXIES = [
+    ipaddress.ip_network(proxy.strip(), strict=False)
+    for proxy in os.getenv("TRUSTED_PROXIES", "").split(',') if proxy.strip()
+]
+
+def format_sse(event: str, data: str) -> str:
+    return f"event: {event}\ndata: {data}\n\n"
+
+def is_trusted_proxy(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in TRUSTED_PROXIES)
+
+def client_identifier(request: Request) -> str:
+    """
+    Identifies the submitter for queue fairness. Clients can put anything in
+    X-Forwarded-For, so it is only read when the peer is one of
+    TRUSTED_PROXIES, and then from the right: the first hop not added by a
+    trusted proxy is the client. Otherwise the peer address is used.
+    """
+    peer = request.client.host if request.client else 'unknown'
+    if not is_trusted_proxy(peer):
+        return peer
+    hops = [hop.strip() for hop in request.headers.get('x-forwarded-for', '').split(',') if hop.strip()]
+    for hop in reversed(hops):
+        if not is_trusted_proxy(hop):
+            return hop
+    return hops[0] if hops else peer
 
 @router.post("/", response_model=TranscriptionResponse, status_code=202)
-async def create_transcription(request: TranscriptionRequest, db=Depends(get_db)):
+async def create_transcription(request: TranscriptionRequest, http_request: Request, db=Depends(get_db), redis_client=Depends(get_redis)):
     youtube_url = request.youtube_url
 
     # Convert Url object to string
@@ -39,79 +89,257 @@ async def create_transcription(request: TranscriptionRequest, db=Depends(get_db)
     if not video_id:
         raise HTTPException(status_code=400, detail="Could not extract video ID from the URL.")
 
-    # Check if transcription already exists
-    transcriptions_collection: Collection = db.transcriptions
-    existing_transcription = transcriptions_collection.find_one({'_id': video_id})
-    if existing_transcription:
-        return TranscriptionResponse(
-            status="completed",
-            video_id=existing_transcription['_id'],
-            video_title=existing_transcription['video_title'],
-            transcription_raw=existing_transcription['transcription_raw'],
-            transcription=existing_transcription['transcription']
-        )
+    # Check if transcription already exists (served from the transcript cache when hot)
+    transcriptions_collection: AsyncIOMotorCollection = db.transcriptions
+
+    async def load_completed_response():
+        existing_transcription = await find_transcript(transcriptions_collection, video_id)
+        if not existing_transcription:
+            return None
+        return TranscriptionResponse(status="completed", **existing_transcription)
+
+    encoding = negotiate_encoding(http_request)
+    cached_body = await transcript_cache.get(redis_client, 'completed', video_id, load_completed_response, encoding)
+    if cached_body:
+        SUBMISSIONS.labels('completed').inc()
+        return compressed_json_response(http_request, cached_body, encoding, status_code=202, conditional=False)
 
     # Generate a unique job ID
     job_id = str(uuid.uuid4())
 
-    # Create a job record in MongoDB
-    jobs_collection: Collection = db.jobs
+    # Create a job record in MongoDB. Only one job per video may be active, so
+    # a duplicate key means another request already started this video.
+    jobs_collection: AsyncIOMotorCollection = db.jobs
     job = {
         'job_id': job_id,
         'video_id': video_id,
         'status': 'pending',
+        'active': True,
         'created_at': datetime.utcnow(),
         'updated_at': datetime.utcnow()
     }
     try:
-        jobs_collection.insert_one(job)
+        await jobs_collection.insert_one(job)
+    except DuplicateKeyError:
+        existing_job = await jobs_collection.find_one({'video_id': video_id, 'active': True})
+        if existing_job:
+            logging.info(f"Attaching submission for video {video_id} to in-flight job {existing_job['job_id']}")
+            try:
+                await requeue_stale_jobs(redis_client, jobs_collection, [existing_job], client_identifier(http_request))
+            except Exception as e:
+                logging.error(f"Error requeueing stale job {existing_job['job_id']}: {e}")
+            SUBMISSIONS.labels('attached').inc()
+            return TranscriptionResponse(status="accepted", job_id=existing_job['job_id'], video_id=video_id)
+        # The active job finished between the insert and the lookup
+        cached_body = await transcript_cache.get(redis_client, 'completed', video_id, load_completed_response, encoding)
+        if cached_body:
+            SUBMISSIONS.labels('completed').inc()
+            return compressed_json_response(http_request, cached_body, encoding, status_code=202, conditional=False)
+        try:
+            await jobs_collection.insert_one(job)
+        except Exception as e:
+            logging.error(f"Error inserting job into MongoDB: {e}")
+            raise HTTPException(status_code=500, detail="Internal server error.")
     except Exception as e:
         logging.error(f"Error inserting job into MongoDB: {e}")
         raise HTTPException(status_code=500, detail="Internal server error.")
 
-    # Add the job to the Redis queue
+    # Queue the job, prioritized by video duration and per-client fairness
     job_data = {
         'job_id': job_id,
         'video_id': video_id
     }
+    duration = await get_video_duration(redis_client, video_id)
     try:
-        redis_client.rpush('transcription_queue', json.dumps(job_data))
+        await enqueue_job(redis_client, job_data, client_identifier(http_request), duration)
     except Exception as e:
         logging.error(f"Error adding job to Redis queue: {e}")
+        # Otherwise later submissions would coalesce onto a job that never runs
+        await abandon_jobs(jobs_collection, [job_id])
         raise HTTPException(status_code=500, detail="Internal server error.")
 
+    SUBMISSIONS.labels('queued').inc()
     return TranscriptionResponse(status="accepted", job_id=job_id)
 
-@router.get("/status/{job_id}", response_model=JobStatusResponse)
-async def get_job_status(job_id: str, db=Depends(get_db)):
-    jobs_collection: Collection = db.jobs
-    transcriptions_collection: Collection = db.transcriptions
-
-    job = jobs_collection.find_one({'job_id': job_id})
-    if not job:
-        raise HTTPException(status_code=404, detail="Job not found.")
-
+def build_job_status(job: Dict[str, Any], transcription: Optional[Dict[str, Any]]) -> JobStatusResponse:
+    """
+    Builds a job's status response from its record and, for successful
+    jobs, the transcript's metadata (`_id` and `video_title` only).
+    """
     if job['status'] == 'success':
-        transcription = transcriptions_collection.find_one({'_id': job['video_id']})
         if transcription:
             return JobStatusResponse(
                 status="success",
+                job_id=job['job_id'],
                 video_id=transcription['_id'],
-                video_title=transcription['video_title'],
-                transcription_raw=transcription['transcription_raw'],
-                transcription=transcription['transcription']
+                video_title=transcription.get('video_title'),
+                transcript_url=f"/transcribe/transcript/{transcription['_id']}"
             )
         else:
             return JobStatusResponse(
                 status="success",
-                transcription=None
+                job_id=job['job_id'],
+                video_id=job['video_id']
             )
     elif job['status'] == 'failed':
         return JobStatusResponse(
             status="failed",
+            job_id=job['job_id'],
+            video_id=job['video_id'],
             error=job.get('error', 'Unknown error')
         )
     else:
         return JobStatusResponse(
-            status=job['status']
+            status=job['status'],
+            job_id=job['job_id'],
+            video_id=job['video_id']
         )
+
+@router.get("/status/{job_id}", response_model=JobStatusResponse)
+async def get_job_status(job_id: str, db=Depends(get_db)):
+    """
+    Returns the state of a job. Successful jobs point at the transcript
+    endpoint instead of embedding the transcript, so polling stays cheap.
+    """
+    jobs_collection: AsyncIOMotorCollection = db.jobs
+    transcriptions_collection: AsyncIOMotorCollection = db.transcriptions
+
+    job = await jobs_collection.find_one({'job_id': job_id})
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found.")
+
+    transcription = None
+    if job['status'] == 'success':
+        transcription = await transcriptions_collection.find_one({'_id': job['video_id']}, {'video_title': 1})
+    return build_job_status(job, transcription)
+
+@router.post("/status", response_model=BulkJobStatusResponse)
+async def get_job_statuses(request: BulkJobStatusRequest, db=Depends(get_db)):
+    """
+    Returns the states of many jobs with one query against jobs and one
+    against transcriptions (metadata only), in the order requested. Unknown
+    job IDs are listed in `not_found`.
+    """
+    job_ids = list(dict.fromkeys(request.job_ids))
+    if len(job_ids) > MAX_BULK_STATUS_JOBS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_STATUS_JOBS} job IDs per request.")
+    jobs_collection: AsyncIOMotorCollection = db.jobs
+    transcriptions_collection: AsyncIOMotorCollection = db.transcriptions
+
+    jobs = {}
+    async for job in jobs_collection.find(
+        {'job_id': {'$in': job_ids}},
+        {'job_id': 1, 'video_id': 1, 'status': 1, 'error': 1}
+    ):
+        jobs[job['job_id']] = job
+
+    succeeded_videos = list({job['video_id'] for job in jobs.values() if job['status'] == 'success'})
+    transcriptions = {}
+    if succeeded_videos:
+        async for transcription in transcriptions_collection.find(
+            {'_id': {'$in': succeeded_videos}},
+            {'video_title': 1}
+        ):
+            transcriptions[transcription['_id']] = transcription
+
+    return BulkJobStatusResponse(
+        jobs=[
+            build_job_status(jobs[job_id], transcriptions.get(jobs[job_id]['video_id']))
+            for job_id in job_ids if job_id in jobs
+        ],
+        not_found=[job_id for job_id in job_ids if job_id not in jobs]
+    )
+
+@router.get("/transcript/{video_id}")
+async def get_transcript(
+    video_id: str,
+    http_request: Request,
+    cursor: Optional[int] = Query(None, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_SEGMENT_PAGE_SIZE),
+    db=Depends(get_db),
+    redis_client=Depends(get_redis)
+):
+    """
+    Returns a completed transcript. Without `cursor` or `limit` the whole
+    transcript is sent from the transcript cache; otherwise one page of
+    segments starting at `cursor`, with `next_cursor` set while more remain.
+    Both forms carry an ETag and honour If-None-Match.
+    """
+    transcriptions_collection: AsyncIOMotorCollection = db.transcriptions
+
+    if cursor is None and limit is None:
+        async def load_completed_response():
+            transcription = await find_transcript(transcriptions_collection, video_id)
+            if not transcription:
+                return None
+            return TranscriptionResponse(status="completed", **transcription)
+
+        encoding = negotiate_encoding(http_request)
+        cached_body = await transcript_cache.get(redis_client, 'completed', video_id, load_completed_response, encoding)
+        if not cached_body:
+            raise HTTPException(status_code=404, detail="Transcript not found.")
+        return compressed_json_response(http_request, cached_body, encoding)
+
+    cursor = cursor or 0
+    limit = limit or DEFAULT_SEGMENT_PAGE_SIZE
+    page = await find_segment_page(transcriptions_collection, video_id, cursor, limit)
+    if page is None:
+        raise HTTPException(status_code=404, detail="Transcript not found.")
+    video_title, segments, has_more = page
+    return json_response(http_request, TranscriptPageResponse(
+        video_id=video_id,
+        video_title=video_title,
+        segments=segments,
+        cursor=cursor,
+        next_cursor=cursor + limit if has_more else None
+    ))
+
+@router.get("/events/{job_id}")
+async def stream_job_events(job_id: str, request: Request, db=Depends(get_db), redis_client=Depends(get_redis)):
+    """
+    Streams a job's progress as server-sent events: the current state first,
+    then every stage update (download percent, chunks done, merge, save)
+    until the job succeeds or fails. Events arrive through Redis pub/sub, so
+    any API replica can serve any job.
+    """
+    jobs_collection: AsyncIOMotorCollection = db.jobs
+    job = await jobs_collection.find_one({'job_id': job_id}, {'status': 1, 'error': 1})
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found.")
+
+    async def event_stream():
+        pubsub = pubsub_client.pubsub()
+        # Subscribe before reading the snapshot so no update falls in between
+        await pubsub.subscribe(f"{JOB_EVENTS_CHANNEL_PREFIX}{job_id}")
+        try:
+            snapshot = await redis_client.get(f"{JOB_PROGRESS_KEY_PREFIX}{job_id}")
+            if snapshot:
+                snapshot_event = json.loads(snapshot)
+            else:
+                snapshot_event = {'job_id': job_id, 'stage': job['status'], 'progress': 0}
+                if job['status'] in TERMINAL_JOB_STATUSES:
+                    snapshot_event['progress'] = 100
+                    if job.get('error'):
+                        snapshot_event['error'] = job['error']
+            yield format_sse("progress", json.dumps(snapshot_event))
+            if snapshot_event['stage'] in TERMINAL_JOB_STATUSES:
+                return
+
+            while not await request.is_disconnected():
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=SSE_KEEPALIVE_INTERVAL)
+                if message is None:
+                    yield ": keepalive\n\n"
+                    continue
+                data = message['data'].decode() if isinstance(message['data'], bytes) else message['data']
+                yield format_sse("progress", data)
+                if json.loads(data).get('stage') in TERMINAL_JOB_STATUSES:
+                    return
+        finally:
+            await pubsub.unsubscribe()
+            await pubsub.aclose()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
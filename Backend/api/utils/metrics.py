@@ -0,0 +1,41 @@
+# api/utils/metrics.py
+import asyncio
+import os
+
+from prometheus_client import Counter, Histogram
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+LOOP_LAG_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+# How often the event loop is probed for lag
+EVENT_LOOP_LAG_INTERVAL = float(os.getenv("EVENT_LOOP_LAG_INTERVAL", "0.25"))  # seconds
+
+# Labelled by route template rather than raw path, so job and video IDs do
+# not create a series each
+REQUEST_DURATION = Histogram(
+    'api_request_duration_seconds',
+    'Time to produce a response, per route and status code',
+    ['method', 'route', 'status'],
+    buckets=REQUEST_BUCKETS
+)
+SUBMISSIONS = Counter(
+    'api_transcription_submissions_total',
+    'Submitted videos by outcome: completed (already transcribed), attached (job in flight) or queued',
+    ['outcome']
+)
+EVENT_LOOP_LAG = Histogram(
+    'api_event_loop_lag_seconds',
+    'How much later than scheduled the event loop woke a periodic timer',
+    buckets=LOOP_LAG_BUCKETS
+)
+
+async def monitor_event_loop_lag(interval: float = EVENT_LOOP_LAG_INTERVAL):
+    """
+    Sleeps `interval` seconds at a time and records how late each wake-up
+    was. Anything that blocks the loop (CPU-bound work, synchronous I/O)
+    shows up as lag for every request in the process.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(0.0, loop.time() - started - interval))
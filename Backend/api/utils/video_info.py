@@ -0,0 +1,143 @@
+# api/utils/video_info.py
+import asyncio
+import logging
+import os
+import re
+from typing import Optional, List, Dict
+
+import httpx
+import redis.asyncio as aioredis
+from pytubefix import Playlist
+
+from api.utils.validation import extract_video_id
+
+# Video durations never change, so lookups are cached for a long time
+VIDEO_DURATION_TTL = int(os.getenv("VIDEO_DURATION_TTL", str(30 * 24 * 60 * 60)))  # seconds
+VIDEO_DURATION_KEY_PREFIX = 'video_duration:'
+# Submissions fall back to a default duration rather than wait on YouTube
+DURATION_LOOKUP_TIMEOUT = float(os.getenv("DURATION_LOOKUP_TIMEOUT", "3"))  # seconds
+# Concurrent YouTube lookups for the durations of a batch
+DURATION_LOOKUP_CONCURRENCY = 16
+PLAYLIST_LOOKUP_TIMEOUT = float(os.getenv("PLAYLIST_LOOKUP_TIMEOUT", "30"))  # seconds
+
+# Overridable so benchmarks can serve watch pages locally
+YOUTUBE_BASE_URL = os.getenv("YOUTUBE_BASE_URL", "https://www.youtube.com")
+
+LENGTH_SECONDS_PATTERN = re.compile(rb'"lengthSeconds"\s*:\s*"(\d+)"')
+
+http_client = httpx.AsyncClient(
+    timeout=DURATION_LOOKUP_TIMEOUT,
+    follow_redirects=True,
+    headers={
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36',
+        'Accept-Language': 'en-US,en;q=0.9'
+    }
+)
+
+async def fetch_video_duration(video_id: str) -> Optional[float]:
+    """
+    Reads the video length from the watch page's player response. Returns
+    None if YouTube does not answer in time or the length is missing.
+    """
+    try:
+        response = await http_client.get(f"{YOUTUBE_BASE_URL}/watch", params={'v': video_id})
+        response.raise_for_status()
+    except httpx.HTTPError as e:
+        logging.warning(f"Duration lookup for video {video_id} failed: {e}")
+        return None
+    match = LENGTH_SECONDS_PATTERN.search(response.content)
+    if not match:
+        logging.warning(f"Duration lookup for video {video_id} found no length")
+        return None
+    return float(match.group(1))
+
+async def get_video_duration(redis_client: aioredis.Redis, video_id: str) -> Optional[float]:
+    """
+    Returns the duration of a video in seconds from Redis, looking it up on
+    YouTube (and caching it) on a miss.
+    """
+    key = f"{VIDEO_DURATION_KEY_PREFIX}{video_id}"
+    try:
+        cached = await redis_client.get(key)
+    except aioredis.RedisError as e:
+        logging.error(f"Error reading cached duration of video {video_id}: {e}")
+        cached = None
+    if cached is not None:
+        return float(cached)
+
+    duration = await fetch_video_duration(video_id)
+    if duration is not None:
+        try:
+            await redis_client.set(key, duration, ex=VIDEO_DURATION_TTL)
+        except aioredis.RedisError as e:
+            logging.error(f"Error caching duration of video {video_id}: {e}")
+    return duration
+
+async def get_video_durations(redis_client: aioredis.Redis, video_ids: List[str]) -> Dict[str, Optional[float]]:
+    """
+    Batch counterpart of get_video_duration: cached durations are read with
+    a single MGET and the misses looked up concurrently. Lookups still
+    running after DURATION_LOOKUP_TIMEOUT are abandoned and reported as None.
+    """
+    durations: Dict[str, Optional[float]] = {video_id: None for video_id in video_ids}
+    if not video_ids:
+        return durations
+    try:
+        cached = await redis_client.mget([f"{VIDEO_DURATION_KEY_PREFIX}{video_id}" for video_id in video_ids])
+    except aioredis.RedisError as e:
+        logging.error(f"Error reading cached video durations: {e}")
+        cached = [None] * len(video_ids)
+    missing = []
+    for video_id, value in zip(video_ids, cached):
+        if value is not None:
+            durations[video_id] = float(value)
+        else:
+            missing.append(video_id)
+    if not missing:
+        return durations
+
+    semaphore = asyncio.Semaphore(DURATION_LOOKUP_CONCURRENCY)
+
+    async def lookup(video_id: str):
+        async with semaphore:
+            durations[video_id] = await fetch_video_duration(video_id)
+
+    tasks = [asyncio.ensure_future(lookup(video_id)) for video_id in missing]
+    _, pending = await asyncio.wait(tasks, timeout=DURATION_LOOKUP_TIMEOUT)
+    for task in pending:
+        task.cancel()
+    found = {video_id: durations[video_id] for video_id in missing if durations[video_id] is not None}
+    if found:
+        try:
+            pipeline = redis_client.pipeline(transaction=False)
+            for video_id, duration in found.items():
+                pipeline.set(f"{VIDEO_DURATION_KEY_PREFIX}{video_id}", duration, ex=VIDEO_DURATION_TTL)
+            await pipeline.execute()
+        except aioredis.RedisError as e:
+            logging.error(f"Error caching video durations: {e}")
+    return durations
+
+def _list_playlist_video_ids(playlist_id: str, limit: int) -> List[str]:
+    playlist = Playlist(f"https://www.youtube.com/playlist?list={playlist_id}")
+    video_ids = []
+    for video_url in playlist.video_urls:
+        video_id = extract_video_id(video_url)
+        if video_id:
+            video_ids.append(video_id)
+        if len(video_ids) >= limit:
+            break
+    return video_ids
+
+async def fetch_playlist_video_ids(playlist_id: str, limit: int) -> List[str]:
+    """
+    Returns the IDs of up to `limit` videos of a playlist, in playlist order.
+    Raises asyncio.TimeoutError if YouTube takes longer than
+    PLAYLIST_LOOKUP_TIMEOUT.
+    """
+    return await asyncio.wait_for(
+        asyncio.to_thread(_list_playlist_video_ids, playlist_id, limit),
+        timeout=PLAYLIST_LOOKUP_TIMEOUT
+    )
+
+async def close_http_client():
+    await http_client.aclose()
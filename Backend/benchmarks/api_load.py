@@ -0,0 +1,357 @@
+# benchmarks/api_load.py
+"""
+Load test of the API tier alone: POST /transcribe/ and
+GET /transcribe/status/{job_id} under thousands of simulated clients.
+
+Run the API against a scratch database, with duration lookups served by
+the local YouTube stand-in this script starts (see fake_services.py) and no
+worker, so queued jobs stay put:
+
+    DATABASE_NAME=transcribee_bench REDIS_DB=15 \
+    YOUTUBE_BASE_URL=http://127.0.0.1:9801 uvicorn api.main:app --port 8000
+
+    python benchmarks/api_load.py --base-url http://localhost:8000 \
+        --database transcribee_bench --clients 2000 --phase-duration 60
+
+The script first seeds the database with finished transcripts (a fraction
+of them very large), successful, failed and still-processing jobs, then
+runs three phases with the same number of clients:
+
+  submit  every client submits a video, waits --think-time and repeats;
+          --existing-fraction of submissions are already transcribed
+          videos, which return the whole stored transcript
+  status  every client polls random seeded jobs every --poll-interval
+  mixed   every client submits a video, polls its job a few times at
+          --poll-interval, thinks and starts over
+
+Clients start spread over --ramp-up seconds and every pause is jittered.
+Each phase reports p50/p95/p99 latency per endpoint and the API's event
+loop lag (from its api_event_loop_lag_seconds histogram) during the
+phase. The load generator's own loop lag is reported too; when it is high
+the generator, not the API, is the bottleneck.
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+from pymongo import MongoClient
+
+from e2e_throughput import percentile, read_histograms, histogram_quantile
+from fake_services import start_media_server
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from shared.transcript_codec import encode_transcript  # noqa: E402
+
+SUBMIT_ROUTE = 'POST /transcribe/'
+STATUS_ROUTE = 'GET /transcribe/status/{job_id}'
+PHASES = ('submit', 'status', 'mixed')
+LOOP_LAG_METRIC = 'api_event_loop_lag_seconds'
+LOOP_PROBE_INTERVAL = 0.1  # seconds
+SEGMENT_SECONDS = 5
+SEED_BATCH_SIZE = 500
+WORDS = (
+    "the quick brown fox jumps over a lazy dog while we talk about transcription "
+    "latency queues workers keys chunks audio video segments and many other things"
+).split()
+
+class Targets:
+    """
+    Seeded IDs the clients draw from.
+    """
+    def __init__(self, job_ids: List[str], transcript_ids: List[str]):
+        self.job_ids = job_ids
+        self.transcript_ids = transcript_ids
+
+def random_segments(count: int) -> List[Dict[str, object]]:
+    return [
+        {
+            'start': index * SEGMENT_SECONDS,
+            'end': (index + 1) * SEGMENT_SECONDS,
+            'text': ' ' + ' '.join(random.choices(WORDS, k=random.randint(8, 16)))
+        }
+        for index in range(count)
+    ]
+
+def seed(args: argparse.Namespace, tag: str) -> Targets:
+    """
+    Inserts transcripts and jobs in the shapes the transcriber writes them.
+    """
+    mongo_client = MongoClient(args.mongodb_url)
+    db = mongo_client[args.database]
+    now = datetime.utcnow()
+    transcripts, jobs = [], []
+    try:
+        for index in range(args.transcripts):
+            video_id = f"seed{tag}t{index:06d}"
+            large = random.random() < args.large_fraction
+            segments = random_segments(args.large_segments if large else args.segments)
+            transcripts.append({
+                '_id': video_id,
+                'video_title': f"Seeded video {index}",
+                **encode_transcript({'segments': segments}),
+                'created_at': now
+            })
+            jobs.append({'job_id': str(uuid.uuid4()), 'video_id': video_id, 'status': 'success',
+                         'created_at': now, 'updated_at': now})
+            if len(transcripts) >= SEED_BATCH_SIZE:
+                db.transcriptions.insert_many(transcripts)
+                transcripts = []
+        if transcripts:
+            db.transcriptions.insert_many(transcripts)
+
+        for index in range(args.processing_jobs):
+            jobs.append({'job_id': str(uuid.uuid4()), 'video_id': f"seed{tag}p{index:06d}", 'status': 'processing',
+                         'active': True, 'created_at': now, 'updated_at': now})
+        for index in range(args.failed_jobs):
+            jobs.append({'job_id': str(uuid.uuid4()), 'video_id': f"seed{tag}f{index:06d}", 'status': 'failed',
+                         'error': 'Seeded failure', 'error_type': 'SEEDED', 'created_at': now, 'updated_at': now})
+        for start in range(0, len(jobs), SEED_BATCH_SIZE):
+            db.jobs.insert_many(jobs[start:start + SEED_BATCH_SIZE])
+    finally:
+        mongo_client.close()
+    return Targets(
+        [job['job_id'] for job in jobs],
+        [f"seed{tag}t{index:06d}" for index in range(args.transcripts)]
+    )
+
+def load_targets(args: argparse.Namespace) -> Targets:
+    """
+    Samples jobs and transcripts already in the database.
+    """
+    mongo_client = MongoClient(args.mongodb_url)
+    db = mongo_client[args.database]
+    try:
+        jobs = [job['job_id'] for job in db.jobs.aggregate([
+            {'$sample': {'size': args.processing_jobs + args.failed_jobs + args.transcripts}},
+            {'$project': {'job_id': 1}}
+        ])]
+        transcripts = [doc['_id'] for doc in db.transcriptions.aggregate([
+            {'$sample': {'size': args.transcripts}},
+            {'$project': {'_id': 1}}
+        ])]
+    finally:
+        mongo_client.close()
+    return Targets(jobs, transcripts)
+
+class Recorder:
+    """
+    Latencies (milliseconds) and errors per endpoint for one phase.
+    """
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    async def request(self, client: httpx.AsyncClient, route: str, method: str, url: str,
+                      **kwargs) -> Optional[httpx.Response]:
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.errors[route] += 1
+            return None
+        finally:
+            self.latencies[route].append((time.perf_counter() - start) * 1000)
+        if response.status_code >= 400:
+            self.errors[route] += 1
+            return None
+        return response
+
+def jittered(seconds: float) -> float:
+    return seconds * random.uniform(0.5, 1.5)
+
+class Simulation:
+    def __init__(self, args: argparse.Namespace, targets: Targets, tag: str):
+        self.args = args
+        self.targets = targets
+        self.tag = tag
+        self.submitted = 0
+
+    def next_video_url(self) -> str:
+        if self.targets.transcript_ids and random.random() < self.args.existing_fraction:
+            video_id = random.choice(self.targets.transcript_ids)
+        else:
+            self.submitted += 1
+            video_id = f"bench{random.choice(self.args.video_durations)}x{self.tag}{self.submitted:07d}"
+        return f"https://www.youtube.com/watch?v={video_id}"
+
+    async def submit(self, client: httpx.AsyncClient, recorder: Recorder, headers: Dict[str, str]) -> Optional[str]:
+        response = await recorder.request(
+            client, SUBMIT_ROUTE, 'POST', '/transcribe/',
+            json={'youtube_url': self.next_video_url()}, headers=headers
+        )
+        if response is None:
+            return None
+        try:
+            return response.json().get('job_id')
+        except ValueError:
+            return None
+
+    async def poll(self, client: httpx.AsyncClient, recorder: Recorder, job_id: str) -> Optional[str]:
+        response = await recorder.request(client, STATUS_ROUTE, 'GET', f"/transcribe/status/{job_id}")
+        return response.json().get('status') if response is not None else None
+
+    async def run_client(self, phase: str, client: httpx.AsyncClient, recorder: Recorder,
+                         client_index: int, deadline: float):
+        args = self.args
+        # A distinct submitter per client, as the frontend proxy would report it
+        headers = {'X-Forwarded-For': f"10.{client_index // 65536 % 256}.{client_index // 256 % 256}.{client_index % 256}"}
+        await asyncio.sleep(random.uniform(0, args.ramp_up))
+        while time.monotonic() < deadline:
+            if phase == 'submit':
+                await self.submit(client, recorder, headers)
+                await asyncio.sleep(jittered(args.think_time))
+            elif phase == 'status':
+                await self.poll(client, recorder, random.choice(self.targets.job_ids))
+                await asyncio.sleep(jittered(args.poll_interval))
+            else:
+                job_id = await self.submit(client, recorder, headers)
+                for _ in range(random.randint(1, args.max_polls) if job_id else 0):
+                    await asyncio.sleep(jittered(args.poll_interval))
+                    if time.monotonic() >= deadline:
+                        return
+                    if await self.poll(client, recorder, job_id) in ('success', 'failed'):
+                        break
+                await asyncio.sleep(jittered(args.think_time))
+
+async def probe_loop_lag(samples: List[float], stop: asyncio.Event):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        started = loop.time()
+        await asyncio.sleep(LOOP_PROBE_INTERVAL)
+        samples.append(max(0.0, loop.time() - started - LOOP_PROBE_INTERVAL) * 1000)
+
+async def loop_lag_buckets(client: httpx.AsyncClient) -> List[Tuple[float, float]]:
+    response = await client.get('/metrics')
+    response.raise_for_status()
+    # The histogram has no labels, so there is a single series
+    return next(iter(read_histograms(response.text, LOOP_LAG_METRIC, 'series').values()), [])
+
+def subtract_buckets(after: List[Tuple[float, float]], before: List[Tuple[float, float]]) -> List[Tuple[float, float]]:
+    earlier = dict(before)
+    return [(le, count - earlier.get(le, 0.0)) for le, count in after]
+
+async def run_phase(simulation: Simulation, phase: str) -> Dict[str, object]:
+    args = simulation.args
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as client:
+        lag_before = await loop_lag_buckets(client)
+        generator_lag: List[float] = []
+        stop = asyncio.Event()
+        prober = asyncio.create_task(probe_loop_lag(generator_lag, stop))
+        started = time.monotonic()
+        deadline = started + args.phase_duration
+        await asyncio.gather(*(
+            simulation.run_client(phase, client, recorder, index, deadline)
+            for index in range(args.clients)
+        ))
+        elapsed = time.monotonic() - started
+        stop.set()
+        await prober
+        lag_after = await loop_lag_buckets(client)
+
+    server_lag = subtract_buckets(lag_after, lag_before)
+    endpoints = {}
+    for route, latencies in sorted(recorder.latencies.items()):
+        endpoints[route] = {
+            'requests': len(latencies),
+            'rps': len(latencies) / elapsed,
+            'errors': recorder.errors[route],
+            **{f"p{pct}": percentile(latencies, pct) for pct in (50, 95, 99)},
+            'max': max(latencies)
+        }
+    return {
+        'phase': phase,
+        'elapsed': elapsed,
+        'endpoints': endpoints,
+        'server_loop_lag': {
+            'samples': server_lag[-1][1] if server_lag else 0,
+            **{f"p{pct}": (histogram_quantile(server_lag, pct / 100) or 0) * 1000 for pct in (50, 95, 99)}
+        },
+        'generator_loop_lag': {
+            'samples': len(generator_lag),
+            **{f"p{pct}": percentile(generator_lag, pct) for pct in (50, 95, 99)}
+        }
+    }
+
+def print_report(results: List[Dict[str, object]]):
+    for result in results:
+        print()
+        print(f"phase {result['phase']} ({result['elapsed']:.0f}s)")
+        print(f"  {'endpoint':<34} {'requests':>9} {'req/s':>8} {'errors':>7} {'p50':>9} {'p95':>9} {'p99':>9}")
+        for route, stats in result['endpoints'].items():
+            print(f"  {route:<34} {stats['requests']:>9} {stats['rps']:>8.1f} {stats['errors']:>7} "
+                  f"{stats['p50']:>7.1f}ms {stats['p95']:>7.1f}ms {stats['p99']:>7.1f}ms")
+        for name, label in (('server_loop_lag', 'API event loop lag'), ('generator_loop_lag', 'generator loop lag')):
+            lag = result[name]
+            print(f"  {label:<34} {lag['samples']:>9.0f} {'':>8} {'':>7} "
+                  f"{lag['p50']:>7.1f}ms {lag['p95']:>7.1f}ms {lag['p99']:>7.1f}ms")
+
+def parse_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(',') if item.strip()]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--phase", action="append", choices=PHASES, dest="phases",
+                        help="phase to run, repeatable (default: all)")
+    parser.add_argument("--phase-duration", type=float, default=60, help="seconds")
+    parser.add_argument("--ramp-up", type=float, default=10, help="seconds over which clients start")
+    parser.add_argument("--poll-interval", type=float, default=2, help="mean seconds between status polls")
+    parser.add_argument("--max-polls", type=int, default=20, help="polls per job in the mixed phase, at most")
+    parser.add_argument("--think-time", type=float, default=5, help="mean seconds between submissions")
+    parser.add_argument("--existing-fraction", type=float, default=0.3,
+                        help="fraction of submissions for already transcribed videos")
+    parser.add_argument("--video-durations", type=parse_list, default=[300, 900, 3600],
+                        help="comma-separated lengths of new videos, seconds")
+    parser.add_argument("--max-connections", type=int, default=1000)
+    parser.add_argument("--timeout", type=float, default=30, help="per-request timeout, seconds")
+    parser.add_argument("--mongodb-url", default="mongodb://localhost:27017")
+    parser.add_argument("--database", default="transcribee_bench", help="the API's DATABASE_NAME")
+    parser.add_argument("--skip-seed", action="store_true", help="sample targets from existing data instead")
+    parser.add_argument("--transcripts", type=int, default=2000)
+    parser.add_argument("--segments", type=int, default=720, help="segments per seeded transcript (5s each)")
+    parser.add_argument("--large-fraction", type=float, default=0.02, help="fraction of very large transcripts")
+    parser.add_argument("--large-segments", type=int, default=20000, help="segments per large transcript")
+    parser.add_argument("--processing-jobs", type=int, default=2000)
+    parser.add_argument("--failed-jobs", type=int, default=200)
+    parser.add_argument("--media-port", type=int, default=9801, help="port of the fake YouTube watch pages")
+    parser.add_argument("--json", dest="json_path", help="also write the results to this file")
+    args = parser.parse_args()
+
+    tag = uuid.uuid4().hex[:6]
+    if args.skip_seed:
+        targets = load_targets(args)
+    else:
+        print(f"seeding {args.transcripts} transcripts and "
+              f"{args.transcripts + args.processing_jobs + args.failed_jobs} jobs...")
+        targets = seed(args, tag)
+    if not targets.job_ids:
+        parser.error("No jobs to poll; seed the database first.")
+    start_media_server('127.0.0.1', args.media_port)
+
+    simulation = Simulation(args, targets, tag)
+    results = []
+    for phase in args.phases or PHASES:
+        print(f"running phase {phase}: {args.clients} clients for {args.phase_duration:.0f}s...")
+        results.append(asyncio.run(run_phase(simulation, phase)))
+
+    print_report(results)
+    if args.json_path:
+        with open(args.json_path, 'w') as file:
+            json.dump({'arguments': vars(args), 'phases': results}, file, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,385 @@
+# benchmarks/e2e_throughput.py
+"""
+End-to-end throughput of the API -> Redis -> worker -> transcriber path.
+
+For every combination of --chunk-durations and --concurrency this starts
+the real API, transcriber and Redis worker against local stand-ins for
+YouTube and Groq (see fake_services.py) and a local Redis and MongoDB, then
+runs closed-loop clients that each submit a video, poll its status until it
+finishes and submit the next one:
+
+    python benchmarks/e2e_throughput.py --concurrency 1,4,8 \
+        --chunk-durations 120,600 --video-durations 300,900 --duration 120 \
+        --groq-base-latency 0.5 --groq-requests-per-minute 20
+
+Each run reports jobs/minute, client-observed job latency, per-stage
+latency percentiles (estimated from the transcriber's Prometheus
+histograms) and key utilization: the time each fake key spent serving
+requests divided by the run length times KEY_CONCURRENCY_LIMIT.
+
+Needs ffmpeg, a local Redis and MongoDB. The Redis DB (--redis-db) and the
+Mongo database (--database) are wiped before every run. The transcriber
+and worker listen on their usual ports (9696 and WORKER_METRICS_PORT), so
+stop any local instances first.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+import redis
+from prometheus_client.parser import text_string_to_metric_families
+from pymongo import MongoClient
+
+from fake_services import (
+    FakeGroq,
+    add_groq_arguments,
+    fake_groq_from_args,
+    start_groq_server,
+    start_media_server
+)
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+TRANSCRIBER_URL = 'http://127.0.0.1:9696'
+TERMINAL_JOB_STATUSES = ('success', 'failed')
+STAGES = ('download', 'chunking', 'transcription', 'merge', 'mongo_write', 'total')
+QUANTILES = (50, 95, 99)
+STARTUP_TIMEOUT = 60  # seconds
+SHUTDOWN_TIMEOUT = 10  # seconds
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+def parse_list(value: str, cast=int) -> List:
+    return [cast(item) for item in value.split(',') if item.strip()]
+
+def read_histograms(metrics_text: str, name: str, label: str,
+                    only: Optional[Dict[str, str]] = None) -> Dict[str, List[Tuple[float, float]]]:
+    """
+    Returns the cumulative (le, count) buckets of a histogram per value of
+    `label`, summed over its other labels.
+    """
+    series: Dict[str, Dict[float, float]] = {}
+    for family in text_string_to_metric_families(metrics_text):
+        if family.name != name:
+            continue
+        for sample in family.samples:
+            if sample.name != f"{name}_bucket":
+                continue
+            if only and any(sample.labels.get(key) != value for key, value in only.items()):
+                continue
+            buckets = series.setdefault(sample.labels.get(label, ''), {})
+            le = float(sample.labels['le'])
+            buckets[le] = buckets.get(le, 0.0) + sample.value
+    return {key: sorted(buckets.items()) for key, buckets in series.items()}
+
+def histogram_quantile(buckets: List[Tuple[float, float]], quantile: float) -> Optional[float]:
+    """
+    Estimates a quantile by linear interpolation within its bucket, the way
+    Prometheus' histogram_quantile does.
+    """
+    if not buckets or buckets[-1][1] == 0:
+        return None
+    rank = quantile * buckets[-1][1]
+    previous_le, previous_count = 0.0, 0.0
+    for le, count in buckets:
+        if count >= rank:
+            if math.isinf(le):
+                return previous_le
+            if count == previous_count:
+                return le
+            return previous_le + (le - previous_le) * (rank - previous_count) / (count - previous_count)
+        previous_le, previous_count = le, count
+    return previous_le
+
+def summarize_histograms(histograms: Dict[str, List[Tuple[float, float]]]) -> Dict[str, Dict[str, Optional[float]]]:
+    summary = {}
+    for key, buckets in histograms.items():
+        summary[key] = {'count': buckets[-1][1] if buckets else 0}
+        for pct in QUANTILES:
+            summary[key][f"p{pct}"] = histogram_quantile(buckets, pct / 100)
+    return summary
+
+class Services:
+    """
+    The API, transcriber and worker processes of one benchmark run.
+    """
+    def __init__(self, env: Dict[str, str], api_port: int, worker_metrics_port: int, log_dir: str):
+        self.env = env
+        self.api_port = api_port
+        self.worker_metrics_port = worker_metrics_port
+        self.log_dir = log_dir
+        self.processes: List[Tuple[str, subprocess.Popen]] = []
+        self.log_files = []
+
+    def _spawn(self, name: str, command: List[str]):
+        log_file = open(os.path.join(self.log_dir, f"{name}.log"), 'ab')
+        self.log_files.append(log_file)
+        process = subprocess.Popen(command, cwd=BACKEND_DIR, env=self.env, stdout=log_file, stderr=subprocess.STDOUT)
+        self.processes.append((name, process))
+
+    def start(self):
+        self._spawn('transcriber', [sys.executable, '-m', 'flask_transcriber.app'])
+        self._spawn('worker', [sys.executable, '-m', 'redis_worker.worker'])
+        self._spawn('api', [
+            sys.executable, '-m', 'uvicorn', 'api.main:app',
+            '--host', '127.0.0.1', '--port', str(self.api_port), '--log-level', 'warning'
+        ])
+        self._wait_ready([
+            f"http://127.0.0.1:{self.api_port}/health",
+            f"{TRANSCRIBER_URL}/metrics",
+            f"http://127.0.0.1:{self.worker_metrics_port}/metrics"
+        ])
+
+    def _wait_ready(self, urls: List[str]):
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        pending = list(urls)
+        with httpx.Client(timeout=2) as client:
+            while pending:
+                for name, process in self.processes:
+                    if process.poll() is not None:
+                        raise RuntimeError(f"{name} exited during startup, see {self.log_dir}/{name}.log")
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"Services not ready after {STARTUP_TIMEOUT}s: {pending}")
+                try:
+                    if client.get(pending[0]).status_code == 200:
+                        pending.pop(0)
+                        continue
+                except httpx.HTTPError:
+                    pass
+                time.sleep(0.5)
+
+    def stop(self):
+        for _, process in self.processes:
+            if process.poll() is None:
+                process.terminate()
+        for _, process in self.processes:
+            try:
+                process.wait(timeout=SHUTDOWN_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+        for log_file in self.log_files:
+            log_file.close()
+        self.processes.clear()
+        self.log_files.clear()
+
+def reset_stores(args: argparse.Namespace):
+    redis.Redis(host=args.redis_host, port=args.redis_port, db=args.redis_db).flushdb()
+    mongo_client = MongoClient(args.mongodb_url)
+    try:
+        mongo_client.drop_database(args.database)
+    finally:
+        mongo_client.close()
+
+def service_env(args: argparse.Namespace, chunk_duration: int, concurrency: int) -> Dict[str, str]:
+    return {
+        **os.environ,
+        'MONGODB_URL': args.mongodb_url,
+        'DATABASE_NAME': args.database,
+        'REDIS_HOST': args.redis_host,
+        'REDIS_PORT': str(args.redis_port),
+        'REDIS_DB': str(args.redis_db),
+        'API_KEYS': ','.join(f"bench-key-{index}" for index in range(args.keys)),
+        'GROQ_BASE_URL': f"http://127.0.0.1:{args.groq_port}",
+        'AUDIO_SOURCE_URL': f"http://127.0.0.1:{args.media_port}/audio/{{video_id}}.m4a",
+        'YOUTUBE_BASE_URL': f"http://127.0.0.1:{args.media_port}",
+        'TRANSCRIPTION_ENGINE': args.engine,
+        'CHUNK_TARGET_DURATION': str(chunk_duration),
+        # Fixed chunk sizes, so runs differ only in the setting under test
+        'ADAPTIVE_CHUNKING': 'false',
+        'AUDIO_CACHE_MAX_BYTES': '0',
+        'MAX_CONCURRENT_JOBS': str(concurrency),
+        'KEY_CONCURRENCY_LIMIT': str(args.key_concurrency),
+        'PER_KEY_CONCURRENCY': str(args.key_concurrency),
+        'KEY_REQUESTS_PER_MINUTE': str(args.groq_requests_per_minute or 1_000_000),
+        'KEY_AUDIO_SECONDS_PER_HOUR': str(1_000_000_000),
+        'WORKER_METRICS_PORT': str(args.worker_metrics_port)
+    }
+
+async def client_loop(client: httpx.AsyncClient, client_index: int, run_tag: str, video_durations: List[int],
+                      deadline: float, poll_interval: float, counter: itertools.count, results: Dict[str, list]):
+    # A distinct submitter per client, as the frontend proxy would report it
+    headers = {'X-Forwarded-For': f"10.0.{client_index // 256}.{client_index % 256}"}
+    while time.monotonic() < deadline:
+        video_id = f"bench{random.choice(video_durations)}x{run_tag}{next(counter):05d}"
+        submitted = time.monotonic()
+        try:
+            response = await client.post(
+                '/transcribe/',
+                json={'youtube_url': f"https://www.youtube.com/watch?v={video_id}"},
+                headers=headers
+            )
+            response.raise_for_status()
+            job = response.json()
+            status = job['status']
+            while status not in TERMINAL_JOB_STATUSES and time.monotonic() < deadline:
+                await asyncio.sleep(poll_interval)
+                response = await client.get(f"/transcribe/status/{job['job_id']}")
+                response.raise_for_status()
+                status = response.json()['status']
+        except (httpx.HTTPError, KeyError, ValueError):
+            results['request_errors'].append(video_id)
+            await asyncio.sleep(poll_interval)
+            continue
+        if status == 'success':
+            results['latencies'].append(time.monotonic() - submitted)
+        elif status == 'failed':
+            results['failed'].append(video_id)
+        else:
+            results['unfinished'].append(video_id)
+
+async def drive_clients(args: argparse.Namespace, concurrency: int, run_tag: str) -> Dict[str, list]:
+    results: Dict[str, list] = {'latencies': [], 'failed': [], 'unfinished': [], 'request_errors': []}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    counter = itertools.count()
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.api_port}", limits=limits, timeout=30) as client:
+        deadline = time.monotonic() + args.duration
+        await asyncio.gather(*(
+            client_loop(client, index, run_tag, args.video_durations, deadline, args.poll_interval, counter, results)
+            for index in range(concurrency)
+        ))
+    return results
+
+def key_utilization(groq_stats: Dict[str, object], key_concurrency: int) -> Dict[str, Dict[str, float]]:
+    elapsed = groq_stats['elapsed'] or 1
+    return {
+        api_key: {
+            'utilization': stats['busy_seconds'] / (elapsed * key_concurrency),
+            'requests': stats['requests'],
+            'rate_limited': stats['rate_limited'],
+            'errors': stats['errors']
+        }
+        for api_key, stats in sorted(groq_stats['keys'].items())
+    }
+
+def run_once(args: argparse.Namespace, groq: FakeGroq, chunk_duration: int, concurrency: int) -> Dict[str, object]:
+    reset_stores(args)
+    log_dir = os.path.join(args.log_dir, f"chunk{chunk_duration}_c{concurrency}")
+    os.makedirs(log_dir, exist_ok=True)
+    services = Services(service_env(args, chunk_duration, concurrency), args.api_port, args.worker_metrics_port, log_dir)
+    try:
+        services.start()
+        groq.reset()
+        started = time.monotonic()
+        results = asyncio.run(drive_clients(args, concurrency, uuid.uuid4().hex[:6]))
+        elapsed = time.monotonic() - started
+        groq_stats = groq.snapshot()
+        metrics_text = httpx.get(f"{TRANSCRIBER_URL}/metrics", timeout=10).text
+    finally:
+        services.stop()
+
+    latencies = results['latencies']
+    stages = summarize_histograms(read_histograms(metrics_text, 'transcriber_stage_duration_seconds', 'stage'))
+    chunk_requests = summarize_histograms(read_histograms(
+        metrics_text, 'transcriber_chunk_request_seconds', 'outcome', only={'outcome': 'success'}
+    ))
+    keys = key_utilization(groq_stats, args.key_concurrency)
+    return {
+        'chunk_duration': chunk_duration,
+        'concurrency': concurrency,
+        'elapsed': elapsed,
+        'completed': len(latencies),
+        'failed': len(results['failed']),
+        'unfinished': len(results['unfinished']),
+        'request_errors': len(results['request_errors']),
+        'jobs_per_minute': len(latencies) / elapsed * 60,
+        'job_latency': {
+            'mean': statistics.mean(latencies) if latencies else None,
+            **{f"p{pct}": percentile(latencies, pct) if latencies else None for pct in QUANTILES}
+        },
+        'stages': {stage: stages[stage] for stage in STAGES if stage in stages},
+        'chunk_requests': chunk_requests.get('success'),
+        'keys': keys,
+        'key_utilization': statistics.mean(key['utilization'] for key in keys.values()) if keys else 0.0,
+        'rate_limited': sum(key['rate_limited'] for key in keys.values())
+    }
+
+def format_seconds(value: Optional[float]) -> str:
+    return '-' if value is None else f"{value:.1f}s"
+
+def print_report(runs: List[Dict[str, object]]):
+    print()
+    print(f"{'chunk':>6} {'conc':>5} {'jobs/min':>9} {'done':>5} {'failed':>6} {'job p50':>8} "
+          f"{'job p95':>8} {'key util':>9} {'429s':>5}")
+    for run in runs:
+        print(f"{run['chunk_duration']:>5}s {run['concurrency']:>5} {run['jobs_per_minute']:>9.2f} "
+              f"{run['completed']:>5} {run['failed']:>6} {format_seconds(run['job_latency']['p50']):>8} "
+              f"{format_seconds(run['job_latency']['p95']):>8} {run['key_utilization']:>8.0%} {run['rate_limited']:>5}")
+
+    for run in runs:
+        print()
+        print(f"chunk {run['chunk_duration']}s, concurrency {run['concurrency']}: stage latency (p50 / p95 / p99)")
+        rows = list(run['stages'].items())
+        if run['chunk_requests']:
+            rows.append(('chunk_request', run['chunk_requests']))
+        for stage, summary in rows:
+            print(f"  {stage:<14} {format_seconds(summary['p50']):>8} {format_seconds(summary['p95']):>8} "
+                  f"{format_seconds(summary['p99']):>8}  ({summary['count']:.0f} samples)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=parse_list, default=[1, 4, 8],
+                        help="comma-separated numbers of concurrent clients")
+    parser.add_argument("--chunk-durations", type=parse_list, default=[600],
+                        help="comma-separated CHUNK_TARGET_DURATION values, seconds")
+    parser.add_argument("--video-durations", type=parse_list, default=[300, 900],
+                        help="comma-separated video lengths picked at random, seconds")
+    parser.add_argument("--duration", type=float, default=120, help="measurement window per run, seconds")
+    parser.add_argument("--poll-interval", type=float, default=1, help="seconds between status polls")
+    parser.add_argument("--keys", type=int, default=4, help="number of fake API keys")
+    parser.add_argument("--key-concurrency", type=int, default=4, help="KEY_CONCURRENCY_LIMIT for the run")
+    parser.add_argument("--engine", choices=["threads", "async"], default="threads")
+    parser.add_argument("--api-port", type=int, default=8000)
+    parser.add_argument("--worker-metrics-port", type=int, default=9697)
+    parser.add_argument("--media-port", type=int, default=9801)
+    parser.add_argument("--groq-port", type=int, default=9802)
+    parser.add_argument("--redis-host", default="localhost")
+    parser.add_argument("--redis-port", type=int, default=6379)
+    parser.add_argument("--redis-db", type=int, default=15, help="wiped before every run")
+    parser.add_argument("--mongodb-url", default="mongodb://localhost:27017")
+    parser.add_argument("--database", default="transcribee_bench", help="wiped before every run")
+    parser.add_argument("--audio-dir", help="where generated audio is kept (default: a temporary directory)")
+    parser.add_argument("--log-dir", help="where service logs go (default: a temporary directory)")
+    parser.add_argument("--json", dest="json_path", help="also write the results to this file")
+    add_groq_arguments(parser)
+    args = parser.parse_args()
+    args.log_dir = args.log_dir or tempfile.mkdtemp(prefix="bench_logs_")
+
+    media_server = start_media_server('127.0.0.1', args.media_port, args.audio_dir)
+    # Generate the audio up front so the first run does not time ffmpeg
+    for video_duration in args.video_durations:
+        media_server.RequestHandlerClass.library.path_for(video_duration)
+    groq = fake_groq_from_args(args)
+    start_groq_server('127.0.0.1', args.groq_port, groq)
+    print(f"service logs: {args.log_dir}")
+
+    runs = []
+    for chunk_duration in args.chunk_durations:
+        for concurrency in args.concurrency:
+            print(f"running chunk {chunk_duration}s, concurrency {concurrency} for {args.duration:.0f}s...")
+            runs.append(run_once(args, groq, chunk_duration, concurrency))
+
+    print_report(runs)
+    if args.json_path:
+        with open(args.json_path, 'w') as file:
+            json.dump({'arguments': {key: value for key, value in vars(args).items()}, 'runs': runs}, file, indent=2)
+
+if __name__ == "__main__":
+    main()
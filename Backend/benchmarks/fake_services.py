@@ -0,0 +1,401 @@
+# benchmarks/fake_services.py
+"""
+Local stand-ins for YouTube and the Groq transcription API.
+
+    python benchmarks/fake_services.py --media-port 9801 --groq-port 9802 \
+        --groq-base-latency 0.5 --groq-latency-per-audio-second 0.01 \
+        --groq-error-rate 0.01 --groq-requests-per-minute 20
+
+Point the services at them with:
+
+    AUDIO_SOURCE_URL=http://127.0.0.1:9801/audio/{video_id}.m4a
+    YOUTUBE_BASE_URL=http://127.0.0.1:9801
+    GROQ_BASE_URL=http://127.0.0.1:9802
+
+Video IDs encode their length: bench<seconds>x<anything>, e.g.
+bench600x0001 is a ten minute video. Its audio is generated with ffmpeg on
+first request (a tone broken by a short silence every 30 seconds, so the
+chunker has cut points) and served with byte-range support. The watch page
+only carries the player response's lengthSeconds.
+
+The fake transcription endpoint sleeps base + per-audio-second latency for
+each upload (its length estimated from the upload size), fails a fraction
+of requests, and enforces a per-key requests-per-minute limit with 429s and
+Groq's x-ratelimit headers. GET /stats returns per-key counters and
+POST /stats/reset clears them.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+
+VIDEO_ID_PATTERN = re.compile(r'^bench(\d+)x')
+AUDIO_PATH_PATTERN = re.compile(r'^/audio/([A-Za-z0-9_-]+)\.m4a$')
+TRANSCRIPTIONS_PATH = '/openai/v1/audio/transcriptions'
+AUDIO_BITRATE_KBPS = 48
+SEGMENT_SECONDS = 5
+SILENCE_PERIOD = 30  # seconds between silences in generated audio
+SILENCE_LENGTH = 2  # seconds
+MAX_VIDEO_DURATION = 6 * 60 * 60  # seconds
+READ_BLOCK_SIZE = 64 * 1024  # bytes
+
+def video_duration(video_id: str) -> Optional[int]:
+    match = VIDEO_ID_PATTERN.match(video_id)
+    if not match:
+        return None
+    duration = int(match.group(1))
+    return duration if 0 < duration <= MAX_VIDEO_DURATION else None
+
+class AudioLibrary:
+    """
+    Generates one audio file per distinct duration and shares it between
+    every video of that length.
+    """
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.files: Dict[int, str] = {}
+        self.locks: Dict[int, threading.Lock] = {}
+        self.lock = threading.Lock()
+
+    def path_for(self, duration: int) -> str:
+        with self.lock:
+            duration_lock = self.locks.setdefault(duration, threading.Lock())
+        with duration_lock:
+            if duration not in self.files:
+                path = os.path.join(self.directory, f"{duration}.m4a")
+                if not os.path.exists(path):
+                    self._generate(duration, path)
+                self.files[duration] = path
+            return self.files[duration]
+
+    def _generate(self, duration: int, path: str):
+        tone = f"0.3*sin(2*PI*440*t)*lt(mod(t\\,{SILENCE_PERIOD})\\,{SILENCE_PERIOD - SILENCE_LENGTH})"
+        partial_path = f"{path}.partial.m4a"
+        subprocess.run([
+            'ffmpeg', '-y', '-loglevel', 'error',
+            '-f', 'lavfi', '-i', f"aevalsrc={tone}:s=16000:d={duration}",
+            '-ac', '1', '-c:a', 'aac', '-b:a', f"{AUDIO_BITRATE_KBPS}k",
+            partial_path
+        ], check=True)
+        os.replace(partial_path, path)
+
+class MediaHandler(BaseHTTPRequestHandler):
+    """
+    Serves /watch?v=<id> pages and /audio/<id>.m4a files.
+    """
+    library: AudioLibrary
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        if parsed.path == '/watch':
+            video_id = parse_qs(parsed.query).get('v', [''])[0]
+            duration = video_duration(video_id)
+            if duration is None:
+                self.send_error(404)
+                return
+            body = f'<html><script>var ytInitialPlayerResponse = {{"videoDetails":{{"videoId":"{video_id}","lengthSeconds":"{duration}"}}}};</script></html>'.encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        match = AUDIO_PATH_PATTERN.match(parsed.path)
+        duration = video_duration(match.group(1)) if match else None
+        if duration is None:
+            self.send_error(404)
+            return
+        try:
+            path = self.library.path_for(duration)
+        except (subprocess.CalledProcessError, FileNotFoundError):
+            self.send_error(500, "Audio generation failed")
+            return
+        self._send_file(path)
+
+    def _send_file(self, path: str):
+        size = os.path.getsize(path)
+        start, end = 0, size - 1
+        range_header = self.headers.get('Range')
+        if range_header:
+            range_match = re.match(r'bytes=(\d*)-(\d*)$', range_header.strip())
+            if not range_match or not (range_match.group(1) or range_match.group(2)):
+                self.send_error(416)
+                return
+            if range_match.group(1):
+                start = int(range_match.group(1))
+                if range_match.group(2):
+                    end = min(int(range_match.group(2)), size - 1)
+            else:
+                start = max(0, size - int(range_match.group(2)))
+            if start > end:
+                self.send_response(416)
+                self.send_header('Content-Range', f"bytes */{size}")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', f"bytes {start}-{end}/{size}")
+        else:
+            self.send_response(200)
+        self.send_header('Content-Type', 'audio/mp4')
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(end - start + 1))
+        self.end_headers()
+        with open(path, 'rb') as file:
+            file.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                block = file.read(min(READ_BLOCK_SIZE, remaining))
+                if not block:
+                    break
+                self.wfile.write(block)
+                remaining -= len(block)
+
+class FakeGroq:
+    """
+    Latency, failure and rate-limit model of the transcription API, with
+    per-key counters.
+    """
+    def __init__(self, base_latency: float = 0.5, latency_per_audio_second: float = 0.01,
+                 jitter: float = 0.1, error_rate: float = 0.0, error_status: int = 500,
+                 requests_per_minute: float = 0, audio_bitrate_kbps: float = AUDIO_BITRATE_KBPS):
+        self.base_latency = base_latency
+        self.latency_per_audio_second = latency_per_audio_second
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.requests_per_minute = requests_per_minute
+        self.bytes_per_audio_second = audio_bitrate_kbps * 1000 / 8
+        self.lock = threading.Lock()
+        self.buckets: Dict[str, Tuple[float, float]] = {}
+        self.stats: Dict[str, Dict[str, float]] = {}
+        self.started_at = time.monotonic()
+
+    def reset(self):
+        with self.lock:
+            self.buckets.clear()
+            self.stats.clear()
+            self.started_at = time.monotonic()
+
+    def _key_stats(self, api_key: str) -> Dict[str, float]:
+        return self.stats.setdefault(api_key, {
+            'requests': 0, 'rate_limited': 0, 'errors': 0,
+            'busy_seconds': 0.0, 'audio_seconds': 0.0
+        })
+
+    def admit(self, api_key: str) -> Tuple[bool, float, float]:
+        """
+        Takes a request token for the key. Returns (admitted, tokens left,
+        seconds until a token is available).
+        """
+        with self.lock:
+            stats = self._key_stats(api_key)
+            stats['requests'] += 1
+            if self.requests_per_minute <= 0:
+                return True, float('inf'), 0.0
+            now = time.monotonic()
+            tokens, updated_at = self.buckets.get(api_key, (self.requests_per_minute, now))
+            tokens = min(self.requests_per_minute, tokens + (now - updated_at) * self.requests_per_minute / 60)
+            if tokens < 1:
+                self.buckets[api_key] = (tokens, now)
+                stats['rate_limited'] += 1
+                return False, tokens, (1 - tokens) * 60 / self.requests_per_minute
+            self.buckets[api_key] = (tokens - 1, now)
+            return True, tokens - 1, 0.0
+
+    def record(self, api_key: str, busy_seconds: float, audio_seconds: float, failed: bool):
+        with self.lock:
+            stats = self._key_stats(api_key)
+            stats['busy_seconds'] += busy_seconds
+            stats['audio_seconds'] += audio_seconds
+            if failed:
+                stats['errors'] += 1
+
+    def snapshot(self) -> Dict[str, object]:
+        with self.lock:
+            return {
+                'elapsed': time.monotonic() - self.started_at,
+                'keys': {api_key: dict(stats) for api_key, stats in self.stats.items()}
+            }
+
+    def latency(self, audio_seconds: float) -> float:
+        latency = self.base_latency + self.latency_per_audio_second * audio_seconds
+        return max(0.0, latency * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+    def rate_limit_headers(self, remaining: float, reset: float) -> Dict[str, str]:
+        if self.requests_per_minute <= 0:
+            return {}
+        return {
+            'x-ratelimit-limit-requests': str(int(self.requests_per_minute)),
+            'x-ratelimit-remaining-requests': str(max(0, int(remaining))),
+            'x-ratelimit-reset-requests': f"{reset:.2f}s"
+        }
+
+def transcription_body(audio_seconds: float) -> Dict[str, object]:
+    segments = []
+    start = 0.0
+    while start < audio_seconds:
+        end = min(audio_seconds, start + SEGMENT_SECONDS)
+        segments.append({
+            'id': len(segments),
+            'seek': 0,
+            'start': round(start, 2),
+            'end': round(end, 2),
+            'text': f" Segment {len(segments)} of benchmark audio.",
+            'tokens': [],
+            'temperature': 0.0,
+            'avg_logprob': -0.2,
+            'compression_ratio': 1.2,
+            'no_speech_prob': 0.01
+        })
+        start = end
+    return {
+        'task': 'transcribe',
+        'language': 'English',
+        'duration': round(audio_seconds, 2),
+        'text': ''.join(segment['text'] for segment in segments),
+        'segments': segments,
+        'x_groq': {'id': f"req_{uuid.uuid4().hex}"}
+    }
+
+class GroqHandler(BaseHTTPRequestHandler):
+    """
+    Serves POST /openai/v1/audio/transcriptions and the /stats endpoints.
+    """
+    protocol_version = 'HTTP/1.1'
+    groq: FakeGroq
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: object, headers: Optional[Dict[str, str]] = None):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path == '/stats':
+            self._send_json(200, self.groq.snapshot())
+        else:
+            self._send_json(404, {'error': {'message': 'Not found'}})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        # Drain the upload so the connection can be reused
+        remaining = length
+        while remaining > 0:
+            remaining -= len(self.rfile.read(min(READ_BLOCK_SIZE, remaining)))
+
+        if self.path == '/stats/reset':
+            self.groq.reset()
+            self._send_json(200, {'reset': True})
+            return
+        if self.path != TRANSCRIPTIONS_PATH:
+            self._send_json(404, {'error': {'message': 'Not found'}})
+            return
+
+        api_key = self.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+        if not api_key:
+            self._send_json(401, {'error': {'message': 'Invalid API Key', 'type': 'invalid_request_error'}})
+            return
+
+        admitted, remaining_tokens, reset = self.groq.admit(api_key)
+        headers = self.groq.rate_limit_headers(remaining_tokens, reset)
+        if not admitted:
+            headers['retry-after'] = str(max(1, round(reset)))
+            self._send_json(429, {'error': {
+                'message': 'Rate limit reached for requests',
+                'type': 'requests',
+                'code': 'rate_limit_exceeded'
+            }}, headers)
+            return
+
+        audio_seconds = length / self.groq.bytes_per_audio_second
+        busy = self.groq.latency(audio_seconds)
+        time.sleep(busy)
+        failed = random.random() < self.groq.error_rate
+        self.groq.record(api_key, busy, audio_seconds, failed)
+        if failed:
+            self._send_json(self.groq.error_status, {'error': {
+                'message': 'Injected failure',
+                'type': 'internal_server_error'
+            }}, headers)
+            return
+        self._send_json(200, transcription_body(audio_seconds), headers)
+
+def serve(server: ThreadingHTTPServer) -> ThreadingHTTPServer:
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def start_media_server(host: str, port: int, audio_dir: Optional[str] = None) -> ThreadingHTTPServer:
+    """
+    Starts the fake YouTube server in a background thread.
+    """
+    library = AudioLibrary(audio_dir or tempfile.mkdtemp(prefix="bench_audio_"))
+    handler = type('BoundMediaHandler', (MediaHandler,), {'library': library})
+    return serve(ThreadingHTTPServer((host, port), handler))
+
+def start_groq_server(host: str, port: int, groq: FakeGroq) -> ThreadingHTTPServer:
+    """
+    Starts the fake transcription API in a background thread.
+    """
+    handler = type('BoundGroqHandler', (GroqHandler,), {'groq': groq})
+    return serve(ThreadingHTTPServer((host, port), handler))
+
+def add_groq_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--groq-base-latency", type=float, default=0.5, help="seconds per request")
+    parser.add_argument("--groq-latency-per-audio-second", type=float, default=0.01,
+                        help="seconds added per second of uploaded audio")
+    parser.add_argument("--groq-jitter", type=float, default=0.1, help="relative latency jitter")
+    parser.add_argument("--groq-error-rate", type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument("--groq-error-status", type=int, default=500)
+    parser.add_argument("--groq-requests-per-minute", type=float, default=0,
+                        help="per-key request limit enforced with 429s; 0 disables")
+
+def fake_groq_from_args(args: argparse.Namespace) -> FakeGroq:
+    return FakeGroq(
+        base_latency=args.groq_base_latency,
+        latency_per_audio_second=args.groq_latency_per_audio_second,
+        jitter=args.groq_jitter,
+        error_rate=args.groq_error_rate,
+        error_status=args.groq_error_status,
+        requests_per_minute=args.groq_requests_per_minute
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--media-port", type=int, default=9801)
+    parser.add_argument("--groq-port", type=int, default=9802)
+    parser.add_argument("--audio-dir", help="where generated audio is kept (default: a temporary directory)")
+    add_groq_arguments(parser)
+    args = parser.parse_args()
+
+    start_media_server(args.host, args.media_port, args.audio_dir)
+    start_groq_server(args.host, args.groq_port, fake_groq_from_args(args))
+    print(f"media: http://{args.host}:{args.media_port}  groq: http://{args.host}:{args.groq_port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# benchmarks/status_poll.py
+"""
+Measures GET /transcribe/status/{job_id} latency under concurrent polling.
+
+Run it against a live API before and after a change to compare percentiles:
+
+    python benchmarks/status_poll.py --base-url http://localhost:8000 \
+        --job-id <id> [--job-id <id> ...] --concurrency 200 --duration 30
+
+Each simulated client polls a job id in a tight loop (optionally pausing
+--interval seconds between polls) for --duration seconds.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from typing import List
+
+import httpx
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+async def poll_client(client: httpx.AsyncClient, job_ids: List[str], deadline: float,
+                      interval: float, latencies: List[float], errors: List[int]):
+    # Stagger clients so paced polls do not arrive in lockstep bursts
+    await asyncio.sleep(random.uniform(0, interval))
+    while time.perf_counter() < deadline:
+        job_id = random.choice(job_ids)
+        start = time.perf_counter()
+        try:
+            response = await client.get(f"/transcribe/status/{job_id}")
+            if response.status_code >= 500:
+                errors.append(response.status_code)
+        except httpx.HTTPError:
+            errors.append(0)
+        latencies.append((time.perf_counter() - start) * 1000)
+        if interval:
+            await asyncio.sleep(interval)
+
+async def run(base_url: str, job_ids: List[str], concurrency: int, duration: float, interval: float):
+    latencies: List[float] = []
+    errors: List[int] = []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*(
+            poll_client(client, job_ids, deadline, interval, latencies, errors)
+            for _ in range(concurrency)
+        ))
+
+    print(f"requests:    {len(latencies)} ({len(latencies) / duration:.1f}/s)")
+    print(f"errors:      {len(errors)}")
+    if latencies:
+        print(f"mean:        {statistics.mean(latencies):.1f} ms")
+        for pct in (50, 95, 99):
+            print(f"p{pct}:         {percentile(latencies, pct):.1f} ms")
+        print(f"max:         {max(latencies):.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--job-id", action="append", required=True, dest="job_ids")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument("--interval", type=float, default=0, help="pause between polls per client, seconds")
+    args = parser.parse_args()
+    asyncio.run(run(args.base_url, args.job_ids, args.concurrency, args.duration, args.interval))
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,25 @@
 # flask_transcriber/app.py
-from flask import Flask, request, jsonify
-from flask_transcriber.transcription_logic import process_transcription
+from flask import Flask, Response, request, jsonify
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+from flask_transcriber.transcription_logic import (
+    process_transcription,
+    mark_job_failed,
+    get_job_status,
+    publish_job_completion,
+    ensure_checkpoint_indexes,
+    TERMINAL_JOB_STATUSES
+)
+from flask_transcriber.utils import youtube_token_provider, AUDIO_SOURCE_URL
+from flask_transcriber.audio_cache import audio_cache
+from flask_transcriber.metrics import ACTIVE_JOBS
+from concurrent.futures import ThreadPoolExecutor
+import threading
 import logging
+import os
+
+# Number of jobs this process transcribes at once; further submissions get a 503
+MAX_CONCURRENT_JOBS = int(os.getenv("MAX_CONCURRENT_JOBS", "5"))
+RETRY_AFTER_SECONDS = 10
 
 app = Flask(__name__)
 
@@ -11,8 +29,35 @@ logging.basicConfig(
     level=logging.INFO
 )
 
+# Generate YouTube tokens before the first job needs them
+if not AUDIO_SOURCE_URL:
+    youtube_token_provider.start()
+
+# Expire chunk checkpoints left behind by jobs that never finished
+ensure_checkpoint_indexes()
+
+# Jobs run here rather than in the request thread
+job_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_JOBS, thread_name_prefix="transcription-job")
+running_jobs = set()
+running_jobs_lock = threading.Lock()
+ACTIVE_JOBS.set_function(lambda: len(running_jobs))
+
+def run_job(video_id: str, job_id: str):
+    try:
+        process_transcription(video_id, job_id)
+    except Exception as e:
+        mark_job_failed(job_id, f"Unexpected error during transcription: {str(e)}", 'UNEXPECTED_ERROR')
+    finally:
+        with running_jobs_lock:
+            running_jobs.discard(job_id)
+
 @app.route('/process_transcription', methods=['POST'])
 def process_transcription_endpoint():
+    """
+    Accepts a job and returns immediately. Completion is reported through the
+    job record and a Redis completion event. Resubmitting a running job is a
+    no-op, and resubmitting a finished job re-publishes its completion.
+    """
     try:
         data = request.get_json()
         if not data or 'video_id' not in data or 'job_id' not in data:
@@ -22,13 +67,43 @@ def process_transcription_endpoint():
         video_id = data['video_id']
         job_id = data['job_id']
 
-        # Start the transcription process
-        process_transcription(video_id, job_id)
+        job_status = get_job_status(job_id)
+        if job_status in TERMINAL_JOB_STATUSES:
+            publish_job_completion(job_id, job_status)
+            return jsonify({'status': job_status, 'job_id': job_id, 'message': 'Job already finished.'}), 200
+
+        with running_jobs_lock:
+            if job_id not in running_jobs:
+                if len(running_jobs) >= MAX_CONCURRENT_JOBS:
+                    logging.warning(f"At capacity, rejecting job {job_id}.")
+                    response = jsonify({'status': 'busy', 'message': 'Transcriber at capacity.'})
+                    response.headers['Retry-After'] = str(RETRY_AFTER_SECONDS)
+                    return response, 503
+                running_jobs.add(job_id)
+                job_executor.submit(run_job, video_id, job_id)
+                logging.info(f"Accepted job {job_id} for video {video_id}.")
 
-        return jsonify({'status': 'success', 'message': 'Transcription processed.'}), 200
+        return jsonify({'status': 'accepted', 'job_id': job_id, 'status_url': f'/jobs/{job_id}'}), 202
     except Exception as e:
-        logging.error(f"Error processing transcription: {e}")
+        logging.error(f"Error accepting transcription: {e}")
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status_endpoint(job_id):
+    job_status = get_job_status(job_id)
+    if job_status is None:
+        return jsonify({'status': 'error', 'message': 'Job not found.'}), 404
+    with running_jobs_lock:
+        running = job_id in running_jobs
+    return jsonify({'job_id': job_id, 'status': job_status, 'running': running}), 200
+
+@app.route('/audio_cache/stats', methods=['GET'])
+def audio_cache_stats_endpoint():
+    return jsonify(audio_cache.stats()), 200
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return Response(generate_latest(), mimetype=CONTENT_TYPE_LATEST)
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=9696)
+    app.run(host='0.0.0.0', port=9696, threaded=True)
@@ -0,0 +1,180 @@
+# flask_transcriber/async_engine.py
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future
+from typing import Optional, Dict, Any
+
+import httpx
+from groq import AsyncGroq
+
+from flask_transcriber.metrics import CHUNK_REQUEST_DURATION, KEY_RATE_LIMITED, CHUNK_RETRIES, key_label
+
+TRANSCRIPTION_MODEL = "whisper-large-v3-turbo"
+HTTP_CONNECT_TIMEOUT = 10  # seconds
+HTTP_READ_TIMEOUT = 600  # seconds
+KEEPALIVE_EXPIRY = 120  # seconds
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+class AsyncTranscriptionEngine:
+    """
+    Transcribes chunks on a dedicated event loop thread, keeping one
+    long-lived, connection-pooled Groq client per API key. A single engine is
+    meant to be shared by every job in the process, so the per-key concurrency
+    limit applies across jobs rather than per job.
+    """
+    def __init__(self, api_key_manager, per_key_concurrency: int, max_retries: int, initial_backoff: float,
+                 latency_model=None):
+        self.api_key_manager = api_key_manager
+        self.latency_model = latency_model
+        self.per_key_concurrency = per_key_concurrency
+        self.max_retries = max_retries
+        self.initial_backoff = initial_backoff
+        self.clients: Dict[str, AsyncGroq] = {}
+        self.semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run_loop, name="transcription-engine", daemon=True)
+        self.thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def _get_client(self, api_key: str) -> AsyncGroq:
+        """
+        Returns the pooled client for a key, creating it on first use.
+        Must be called from the engine's event loop.
+        """
+        client = self.clients.get(api_key)
+        if client is None:
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.per_key_concurrency,
+                    max_keepalive_connections=self.per_key_concurrency,
+                    keepalive_expiry=KEEPALIVE_EXPIRY
+                ),
+                timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+            )
+            # Retries are handled here so that a retry can move to another key
+            client = AsyncGroq(api_key=api_key, http_client=http_client, max_retries=0)
+            self.clients[api_key] = client
+            self.semaphores[api_key] = asyncio.Semaphore(self.per_key_concurrency)
+        return client
+
+    async def _transcribe(self, chunk_info: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Async counterpart of transcribe_audio_chunk with the same retry and
+        key scheduling policy; waiting for key capacity never blocks the loop.
+        """
+        chunk_path = chunk_info["chunk_path"]
+        chunk_index = chunk_info["chunk_index"]
+        audio_seconds = chunk_info.get("duration") or 0.0
+        audio_data = await asyncio.to_thread(_read_file, chunk_path)
+        exclude_key = None
+        attempt = 0
+        backoff = self.initial_backoff
+        last_error = None
+
+        while attempt < self.max_retries:
+            # Shared key managers talk to Redis, so reserve off the loop
+            lease, wait = await asyncio.to_thread(self.api_key_manager.reserve, audio_seconds, exclude_key)
+            while lease is None and wait > 0:
+                # Every key is at its concurrency limit
+                await asyncio.sleep(wait)
+                lease, wait = await asyncio.to_thread(self.api_key_manager.reserve, audio_seconds, exclude_key)
+            if not lease:
+                logging.error(f"Chunk {chunk_index}: No alternative API keys available for retry.")
+                return None
+            api_key = lease.api_key
+            try:
+                client = self._get_client(api_key)
+                try:
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                    async with self.semaphores[api_key]:
+                        request_started = time.monotonic()
+                        try:
+                            raw_response = await client.audio.transcriptions.with_raw_response.create(
+                                file=(os.path.basename(chunk_path), audio_data),
+                                model=TRANSCRIPTION_MODEL,
+                                response_format="verbose_json",
+                                temperature=0.0
+                            )
+                        except Exception:
+                            CHUNK_REQUEST_DURATION.labels(key_label(api_key), 'error').observe(time.monotonic() - request_started)
+                            raise
+                        request_latency = time.monotonic() - request_started
+                        CHUNK_REQUEST_DURATION.labels(key_label(api_key), 'success').observe(request_latency)
+                        if self.latency_model:
+                            self.latency_model.record(audio_seconds, request_latency)
+                finally:
+                    await asyncio.to_thread(self.api_key_manager.release, lease)
+                await asyncio.to_thread(self.api_key_manager.update_from_headers, api_key, raw_response.headers)
+                transcription = await raw_response.parse()
+                transcription_data = transcription.model_dump()
+                return {
+                    "chunk_index": chunk_index,
+                    "text": transcription_data.get("text", ""),
+                    "segments": transcription_data.get("segments", []),
+                    "start_offset": chunk_info.get("start_offset"),
+                    "overlap_before": chunk_info.get("overlap_before", 0.0)
+                }
+            except Exception as e:
+                last_error = e
+                error_code = getattr(e, 'status_code', None)
+                if error_code == 429:
+                    # Not a failed attempt: wait on the key's bucket instead
+                    logging.warning(f"Chunk {chunk_index}: Rate limited, waiting for key capacity. Error: {e}")
+                    await asyncio.to_thread(self.api_key_manager.record_error_response, api_key, e)
+                    CHUNK_RETRIES.labels(key_label(api_key)).inc()
+                    KEY_RATE_LIMITED.labels(key_label(api_key)).inc()
+                    exclude_key = None
+                    continue
+
+                attempt += 1
+                logging.error(f"Chunk {chunk_index}: Transcription attempt {attempt} failed. Error: {e}, Status Code: {error_code}")
+
+                # For server errors (5xx), immediately fail after one attempt
+                if error_code and 500 <= error_code < 600:
+                    error_msg = f"Groq server error (HTTP {error_code}): {str(e)}"
+                    logging.error(error_msg)
+                    raise Exception(error_msg)
+
+                if attempt >= self.max_retries:
+                    break
+
+                await asyncio.to_thread(self.api_key_manager.record_error_response, api_key, e)
+                CHUNK_RETRIES.labels(key_label(api_key)).inc()
+                exclude_key = api_key
+                await asyncio.sleep(backoff + random.uniform(0, 1))
+                backoff *= 2
+
+        logging.error(f"Chunk {chunk_index}: All transcription attempts failed.")
+        raise Exception(f"All transcription attempts failed for chunk {chunk_index}. Last error: {last_error}")
+
+    def submit(self, chunk_info: Dict[str, Any]) -> Future:
+        """
+        Schedules a chunk on the engine loop from any thread and returns a
+        concurrent.futures.Future, so callers can use as_completed as with a
+        thread pool.
+        """
+        return asyncio.run_coroutine_threadsafe(self._transcribe(chunk_info), self.loop)
+
+    async def _close_clients(self):
+        for client in self.clients.values():
+            await client.close()
+        self.clients.clear()
+
+    def close(self):
+        """
+        Closes all pooled connections and stops the event loop.
+        """
+        asyncio.run_coroutine_threadsafe(self._close_clients(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
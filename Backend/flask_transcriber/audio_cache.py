@@ -0,0 +1,232 @@
+# flask_transcriber/audio_cache.py
+import fcntl
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from typing import Optional, Dict, Any, List
+
+# Downloaded audio (and the chunks cut from it) is kept here across jobs.
+# AUDIO_CACHE_MAX_BYTES=0 disables the cache.
+AUDIO_CACHE_DIR = os.getenv("AUDIO_CACHE_DIR", os.path.join(tempfile.gettempdir(), "transcribee_audio_cache"))
+AUDIO_CACHE_MAX_BYTES = int(os.getenv("AUDIO_CACHE_MAX_BYTES", str(5 * 1024 * 1024 * 1024)))
+
+METADATA_FILE = "metadata.json"
+LOCK_FILE = ".lock"
+# Separates the video_id from the stream itag in entry directory names
+KEY_SEPARATOR = "@"
+
+def _directory_size(path: str) -> int:
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, filename))
+            except OSError:
+                pass
+    return total
+
+class CachedAudio:
+    """
+    A cache entry in use by a job. It holds a shared lock on the entry so
+    it cannot be evicted until release() is called. Chunks cut into
+    `directory` stay cached with the audio.
+    """
+    def __init__(self, directory: str, metadata: Dict[str, Any], lock_fd: int):
+        self.directory = directory
+        self.metadata = metadata
+        self.lock_fd = lock_fd
+
+    @property
+    def audio_path(self) -> str:
+        return os.path.join(self.directory, self.metadata["file_name"])
+
+    @property
+    def video_title(self) -> Optional[str]:
+        return self.metadata.get("video_title")
+
+    def release(self):
+        if self.lock_fd is not None:
+            os.close(self.lock_fd)
+            self.lock_fd = None
+
+class AudioCache:
+    """
+    Bounded on-disk cache of downloaded audio keyed by video_id and stream
+    itag, evicting least recently used entries once the total size exceeds
+    `max_bytes`. Entries are published by atomic rename and guarded by file
+    locks (shared while a job uses them, exclusive to evict), so several
+    jobs and processes can share one cache directory.
+    """
+    def __init__(self, root: str = AUDIO_CACHE_DIR, max_bytes: int = AUDIO_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.metrics_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.evicted_bytes = 0
+        if self.enabled:
+            os.makedirs(self.root, exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _count(self, metric: str, amount: int = 1):
+        with self.metrics_lock:
+            setattr(self, metric, getattr(self, metric) + amount)
+
+    def _entry_directories(self) -> List[str]:
+        try:
+            names = os.listdir(self.root)
+        except FileNotFoundError:
+            return []
+        return [os.path.join(self.root, name) for name in names if KEY_SEPARATOR in name and not name.startswith('.')]
+
+    def _open_entry(self, directory: str) -> Optional[CachedAudio]:
+        """
+        Takes a shared lock on an entry and returns it, or None if the entry
+        was evicted in the meantime.
+        """
+        try:
+            lock_fd = os.open(os.path.join(directory, LOCK_FILE), os.O_RDONLY)
+        except FileNotFoundError:
+            return None
+        fcntl.flock(lock_fd, fcntl.LOCK_SH)
+        metadata_path = os.path.join(directory, METADATA_FILE)
+        try:
+            with open(metadata_path, "r") as f:
+                metadata = json.load(f)
+        except (FileNotFoundError, ValueError):
+            os.close(lock_fd)
+            return None
+        if not os.path.exists(os.path.join(directory, metadata["file_name"])):
+            os.close(lock_fd)
+            return None
+        # The metadata file's mtime records the last use for LRU eviction
+        os.utime(metadata_path)
+        return CachedAudio(directory, metadata, lock_fd)
+
+    def acquire(self, video_id: str, itag: Optional[int] = None) -> Optional[CachedAudio]:
+        """
+        Returns the cached audio of a video (of the given stream, if `itag`
+        is set), locked against eviction, or None on a miss.
+        """
+        if not self.enabled:
+            return None
+        prefix = f"{video_id}{KEY_SEPARATOR}"
+        candidates = [
+            directory for directory in self._entry_directories()
+            if os.path.basename(directory).startswith(prefix)
+            and (itag is None or os.path.basename(directory) == f"{prefix}{itag}")
+        ]
+        for directory in candidates:
+            entry = self._open_entry(directory)
+            if entry:
+                self._count("hits")
+                logging.info(f"Audio cache hit for video {video_id} ({os.path.basename(directory)})")
+                return entry
+        self._count("misses")
+        return None
+
+    def store(self, video_id: str, itag: Optional[int], video_title: Optional[str], audio_file_path: str) -> Optional[CachedAudio]:
+        """
+        Moves a downloaded audio file into the cache and returns the locked
+        entry. If another job cached the same stream first, that entry is
+        returned and the file is discarded. Returns None when the cache is
+        disabled or the file could not be stored.
+        """
+        if not self.enabled:
+            return None
+        key = f"{video_id}{KEY_SEPARATOR}{itag if itag is not None else 'unknown'}"
+        final_directory = os.path.join(self.root, key)
+        staging_directory = os.path.join(self.root, f".staging-{uuid.uuid4().hex}")
+        try:
+            os.makedirs(staging_directory)
+            file_name = os.path.basename(audio_file_path)
+            shutil.move(audio_file_path, os.path.join(staging_directory, file_name))
+            open(os.path.join(staging_directory, LOCK_FILE), "w").close()
+            with open(os.path.join(staging_directory, METADATA_FILE), "w") as f:
+                json.dump({
+                    "video_id": video_id,
+                    "itag": itag,
+                    "video_title": video_title,
+                    "file_name": file_name,
+                    "created_at": time.time()
+                }, f)
+            try:
+                os.rename(staging_directory, final_directory)
+                self._count("stores")
+            except OSError:
+                # Another job published this entry first
+                shutil.rmtree(staging_directory, ignore_errors=True)
+        except OSError as e:
+            logging.error(f"Could not store audio for video {video_id} in the cache: {e}")
+            # Hand the file back so the job can continue uncached
+            staged_path = os.path.join(staging_directory, os.path.basename(audio_file_path))
+            if os.path.exists(staged_path) and not os.path.exists(audio_file_path):
+                shutil.move(staged_path, audio_file_path)
+            shutil.rmtree(staging_directory, ignore_errors=True)
+            return None
+
+        entry = self._open_entry(final_directory)
+        self.evict()
+        return entry
+
+    def evict(self):
+        """
+        Deletes least recently used entries until the cache fits in
+        max_bytes. Entries locked by running jobs are skipped.
+        """
+        entries = []
+        for directory in self._entry_directories():
+            try:
+                last_used = os.path.getmtime(os.path.join(directory, METADATA_FILE))
+            except OSError:
+                last_used = 0.0
+            entries.append((last_used, directory, _directory_size(directory)))
+        total = sum(size for _, _, size in entries)
+        for _, directory, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                lock_fd = os.open(os.path.join(directory, LOCK_FILE), os.O_RDONLY)
+            except FileNotFoundError:
+                continue
+            try:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(lock_fd)
+                continue
+            try:
+                shutil.rmtree(directory, ignore_errors=True)
+            finally:
+                os.close(lock_fd)
+            total -= size
+            self._count("evictions")
+            self._count("evicted_bytes", size)
+            logging.info(f"Evicted {os.path.basename(directory)} ({size} bytes) from the audio cache")
+
+    def stats(self) -> Dict[str, Any]:
+        with self.metrics_lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "evicted_bytes": self.evicted_bytes,
+                "entries": len(self._entry_directories()),
+                "size_bytes": _directory_size(self.root) if self.enabled else 0,
+                "max_bytes": self.max_bytes
+            }
+
+audio_cache = AudioCache()
@@ -0,0 +1,96 @@
+# flask_transcriber/chunk_planner.py
+import math
+import threading
+from typing import Optional
+
+# Latency assumed for a chunk before any request has been measured:
+# DEFAULT_REQUEST_OVERHEAD + DEFAULT_SECONDS_PER_AUDIO_SECOND * chunk duration
+DEFAULT_REQUEST_OVERHEAD = 2.0  # seconds
+DEFAULT_SECONDS_PER_AUDIO_SECOND = 0.01
+# Weight of each new measurement in the moving averages
+LATENCY_SMOOTHING = 0.1
+# Chunk durations (seconds) must differ this much across samples before the
+# overhead and per-second cost are fitted separately
+MIN_DURATION_SPREAD = 30
+
+class ChunkLatencyModel:
+    """
+    Estimates transcription latency as `overhead + rate * duration` from
+    measured requests, using exponentially weighted least squares so the
+    model follows changes in provider speed. Thread-safe.
+    """
+    def __init__(self, smoothing: float = LATENCY_SMOOTHING):
+        self.smoothing = smoothing
+        self.lock = threading.Lock()
+        self.samples = 0
+        self.mean_duration = 0.0
+        self.mean_latency = 0.0
+        self.var_duration = 0.0
+        self.cov = 0.0
+
+    def record(self, audio_seconds: Optional[float], latency: float):
+        if not audio_seconds or audio_seconds <= 0 or latency <= 0:
+            return
+        with self.lock:
+            if self.samples == 0:
+                self.mean_duration = audio_seconds
+                self.mean_latency = latency
+            else:
+                alpha = self.smoothing
+                d_duration = audio_seconds - self.mean_duration
+                d_latency = latency - self.mean_latency
+                self.mean_duration += alpha * d_duration
+                self.mean_latency += alpha * d_latency
+                self.var_duration = (1 - alpha) * (self.var_duration + alpha * d_duration * d_duration)
+                self.cov = (1 - alpha) * (self.cov + alpha * d_duration * d_latency)
+            self.samples += 1
+
+    def coefficients(self):
+        """
+        Returns (overhead, rate). With too little spread in the measured
+        chunk durations only the rate is refitted, keeping the default overhead.
+        """
+        with self.lock:
+            if self.samples == 0:
+                return DEFAULT_REQUEST_OVERHEAD, DEFAULT_SECONDS_PER_AUDIO_SECOND
+            if self.var_duration >= MIN_DURATION_SPREAD ** 2 and self.cov > 0:
+                rate = self.cov / self.var_duration
+                overhead = max(0.0, self.mean_latency - rate * self.mean_duration)
+                return overhead, rate
+            overhead = min(DEFAULT_REQUEST_OVERHEAD, self.mean_latency)
+            rate = max(0.0, self.mean_latency - overhead) / self.mean_duration
+            return overhead, rate
+
+    def estimate(self, audio_seconds: float) -> float:
+        overhead, rate = self.coefficients()
+        return overhead + rate * audio_seconds
+
+def plan_chunk_duration(duration: float, parallel_slots: int, latency_model: ChunkLatencyModel,
+                        max_chunk_duration: float, min_chunk_duration: float,
+                        max_requests: Optional[int] = None) -> float:
+    """
+    Picks the chunk duration that minimizes the estimated wall-clock time of
+    transcribing `duration` seconds of audio, where chunks run in waves of
+    `parallel_slots` requests. Chunks never exceed `max_chunk_duration`
+    (the upload limit) and are not made shorter than `min_chunk_duration`
+    unless the upload limit requires it. `max_requests` caps the chunk count
+    at the requests the keys can currently accept without waiting.
+    """
+    if duration <= 0:
+        return max_chunk_duration
+    parallel_slots = max(1, parallel_slots)
+    min_chunks = max(1, math.ceil(duration / max_chunk_duration))
+    max_chunks = max(min_chunks, math.floor(duration / min_chunk_duration))
+    if max_requests is not None:
+        max_chunks = max(min_chunks, min(max_chunks, max_requests))
+
+    best_chunks = min_chunks
+    best_time = None
+    for chunks in range(min_chunks, max_chunks + 1):
+        waves = math.ceil(chunks / parallel_slots)
+        wall_time = waves * latency_model.estimate(duration / chunks)
+        # Prefer fewer chunks on ties, since each request costs rate-limit budget
+        if best_time is None or wall_time < best_time - 1e-6:
+            best_chunks = chunks
+            best_time = wall_time
+    return duration / best_chunks
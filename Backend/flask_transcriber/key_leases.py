@@ -0,0 +1,417 @@
+# flask_transcriber/key_leases.py
+import hashlib
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Optional, Dict, Tuple, Mapping, List
+
+import redis
+
+from flask_transcriber.key_manager import (
+    KeyLease,
+    RateLimitWaitTooLong,
+    parse_reset_duration,
+    KEY_REQUESTS_PER_MINUTE,
+    KEY_AUDIO_SECONDS_PER_HOUR,
+    MAX_RATE_LIMIT_WAIT,
+    REQUEST_LIMIT_HEADERS,
+    AUDIO_LIMIT_HEADERS,
+    DAY
+)
+
+# Requests in flight per key across every transcriber process and host
+KEY_CONCURRENCY_LIMIT = int(os.getenv("KEY_CONCURRENCY_LIMIT", "4"))
+# A lease not renewed for this long is dropped, so a crashed process only
+# holds its slots until they expire
+KEY_LEASE_TTL = float(os.getenv("KEY_LEASE_TTL", "60"))  # seconds
+LEASE_RENEW_INTERVAL = KEY_LEASE_TTL / 3
+# How often a caller checks again while every key is at its concurrency limit
+LEASE_POLL_INTERVAL = 0.25  # seconds
+# Budgets of keys that are no longer used disappear after this long
+KEY_BUDGET_TTL = 24 * 60 * 60  # seconds
+
+KEY_BUDGET_KEY_PREFIX = 'key_budget:'
+KEY_LEASES_KEY_PREFIX = 'key_leases:'
+
+# Token buckets stored as Redis hashes. Same model as key_manager.KeyState:
+# tokens may go negative, the deficit being reservations still waiting. The
+# per-minute request bucket always uses the configured rate; the daily request
+# bucket has a capacity of 0 until the provider's headers report one.
+BUCKET_FUNCTIONS = """
+local function load_budget(budget, now, requests_per_minute, audio_seconds_per_hour)
+    local f = redis.call('HMGET', budget, 'req_tokens', 'audio_tokens', 'audio_capacity', 'audio_rate',
+        'updated_at', 'blocked_until', 'usage_count', 'day_tokens', 'day_capacity', 'day_rate')
+    local s
+    if not f[1] then
+        s = {
+            req_tokens = requests_per_minute, audio_tokens = audio_seconds_per_hour,
+            audio_capacity = audio_seconds_per_hour, audio_rate = audio_seconds_per_hour / 3600,
+            updated_at = now, blocked_until = 0, usage_count = 0, day_tokens = 0, day_capacity = 0, day_rate = 0
+        }
+    else
+        s = {
+            req_tokens = tonumber(f[1]), audio_tokens = tonumber(f[2]), audio_capacity = tonumber(f[3]),
+            audio_rate = tonumber(f[4]), updated_at = tonumber(f[5]), blocked_until = tonumber(f[6]),
+            usage_count = tonumber(f[7]), day_tokens = tonumber(f[8]) or 0, day_capacity = tonumber(f[9]) or 0,
+            day_rate = tonumber(f[10]) or 0
+        }
+    end
+    s.req_capacity = requests_per_minute
+    s.req_rate = requests_per_minute / 60
+    local elapsed = now - s.updated_at
+    if elapsed > 0 then
+        s.req_tokens = math.min(s.req_capacity, s.req_tokens + elapsed * s.req_rate)
+        s.audio_tokens = math.min(s.audio_capacity, s.audio_tokens + elapsed * s.audio_rate)
+        s.day_tokens = math.min(s.day_capacity, s.day_tokens + elapsed * s.day_rate)
+        s.updated_at = now
+    end
+    return s
+end
+
+local function save_budget(budget, s, ttl)
+    redis.call('HSET', budget,
+        'req_tokens', tostring(s.req_tokens), 'audio_tokens', tostring(s.audio_tokens),
+        'audio_capacity', tostring(s.audio_capacity), 'audio_rate', tostring(s.audio_rate),
+        'updated_at', tostring(s.updated_at), 'blocked_until', tostring(s.blocked_until),
+        'usage_count', tostring(s.usage_count), 'day_tokens', tostring(s.day_tokens),
+        'day_capacity', tostring(s.day_capacity), 'day_rate', tostring(s.day_rate))
+    redis.call('EXPIRE', budget, ttl)
+end
+
+local function request_tokens(s)
+    if s.day_capacity > 0 then
+        return math.min(s.req_tokens, s.day_tokens)
+    end
+    return s.req_tokens
+end
+
+local function bucket_wait(tokens, capacity, rate, amount)
+    local needed = math.min(amount, capacity)
+    if tokens >= needed then
+        return 0
+    end
+    return (needed - tokens) / rate
+end
+
+local function budget_wait(s, now, audio_seconds)
+    return math.max(
+        s.blocked_until - now,
+        bucket_wait(s.req_tokens, s.req_capacity, s.req_rate, 1),
+        s.day_capacity > 0 and bucket_wait(s.day_tokens, s.day_capacity, s.day_rate, 1) or 0,
+        bucket_wait(s.audio_tokens, s.audio_capacity, s.audio_rate, audio_seconds)
+    )
+end
+"""
+
+# KEYS: budget and lease set of every API key, in pairs
+# ARGV: now, audio seconds, excluded key position (0 for none), concurrency
+#       limit, lease TTL, lease id, max wait, default budgets, budget TTL
+# Returns {position, wait}: position 0 if no key is eligible, -1 if every key
+# is at its concurrency limit, -2 if the soonest key is more than max wait away
+LEASE_SCRIPT = BUCKET_FUNCTIONS + """
+local now = tonumber(ARGV[1])
+local audio_seconds = tonumber(ARGV[2])
+local excluded = tonumber(ARGV[3])
+local limit = tonumber(ARGV[4])
+local best, best_wait, best_active, best_state
+local candidates = 0
+for position = 1, #KEYS / 2 do
+    if position ~= excluded then
+        candidates = candidates + 1
+        local leases = KEYS[position * 2]
+        redis.call('ZREMRANGEBYSCORE', leases, '-inf', now)
+        local active = redis.call('ZCARD', leases)
+        if active < limit then
+            local s = load_budget(KEYS[position * 2 - 1], now, tonumber(ARGV[8]), tonumber(ARGV[9]))
+            local wait = budget_wait(s, now, audio_seconds)
+            if best == nil or wait < best_wait or (wait == best_wait and active < best_active) then
+                best, best_wait, best_active, best_state = position, wait, active, s
+            end
+        end
+    end
+end
+if candidates == 0 then
+    return {0, '0'}
+end
+if best == nil then
+    return {-1, '0'}
+end
+if best_wait > tonumber(ARGV[7]) then
+    return {-2, tostring(best_wait)}
+end
+best_state.req_tokens = best_state.req_tokens - 1
+if best_state.day_capacity > 0 then
+    best_state.day_tokens = best_state.day_tokens - 1
+end
+best_state.audio_tokens = best_state.audio_tokens - audio_seconds
+best_state.usage_count = best_state.usage_count + 1
+save_budget(KEYS[best * 2 - 1], best_state, tonumber(ARGV[10]))
+local ttl = tonumber(ARGV[5])
+redis.call('ZADD', KEYS[best * 2], now + ttl, ARGV[6])
+redis.call('EXPIRE', KEYS[best * 2], math.ceil(ttl) * 2)
+return {best, tostring(best_wait)}
+"""
+
+# KEYS: budget of one API key
+# ARGV: now, default budgets, budget TTL, then daily request and audio
+#       (limit, remaining, reset) with '' for missing values, then the
+#       retry-after of a 429 ('' if not rate limited, 'drain' if the
+#       provider gave none), then the length of a day in seconds
+# Returns the seconds the key is paused for
+UPDATE_SCRIPT = BUCKET_FUNCTIONS + """
+local now = tonumber(ARGV[1])
+local s = load_budget(KEYS[1], now, tonumber(ARGV[2]), tonumber(ARGV[3]))
+
+local function sync(prefix, limit, remaining, reset)
+    limit, remaining, reset = tonumber(limit), tonumber(remaining), tonumber(reset)
+    if limit and limit > 0 then
+        s[prefix .. '_capacity'] = limit
+    end
+    if remaining then
+        s[prefix .. '_tokens'] = math.min(s[prefix .. '_tokens'], remaining)
+        if reset and reset > 0 and remaining < s[prefix .. '_capacity'] then
+            s[prefix .. '_rate'] = (s[prefix .. '_capacity'] - remaining) / reset
+        end
+    end
+end
+local day_limit = tonumber(ARGV[5])
+if s.day_capacity == 0 and day_limit and day_limit > 0 then
+    s.day_capacity, s.day_tokens, s.day_rate = day_limit, day_limit, day_limit / tonumber(ARGV[12])
+end
+if s.day_capacity > 0 then
+    sync('day', ARGV[5], ARGV[6], ARGV[7])
+end
+sync('audio', ARGV[8], ARGV[9], ARGV[10])
+
+local retry_after = 0
+if ARGV[11] == 'drain' then
+    s.req_tokens = math.min(s.req_tokens, 0)
+    retry_after = bucket_wait(s.req_tokens, s.req_capacity, s.req_rate, 1)
+elseif ARGV[11] ~= '' then
+    retry_after = tonumber(ARGV[11])
+end
+s.blocked_until = math.max(s.blocked_until, now + retry_after)
+save_budget(KEYS[1], s, tonumber(ARGV[4]))
+return tostring(retry_after)
+"""
+
+# KEYS: budget and lease set of every API key, in pairs
+# ARGV: now, default budgets
+# Returns {active leases, wait, request tokens} per key, flattened
+INSPECT_SCRIPT = BUCKET_FUNCTIONS + """
+local now = tonumber(ARGV[1])
+local result = {}
+for position = 1, #KEYS / 2 do
+    local s = load_budget(KEYS[position * 2 - 1], now, tonumber(ARGV[2]), tonumber(ARGV[3]))
+    result[#result + 1] = redis.call('ZCOUNT', KEYS[position * 2], '(' .. now, '+inf')
+    result[#result + 1] = tostring(budget_wait(s, now, 0))
+    result[#result + 1] = tostring(request_tokens(s))
+    result[#result + 1] = s.usage_count
+end
+return result
+"""
+
+def key_fingerprint(api_key: str) -> str:
+    """
+    Identifies a key in Redis without storing the key itself.
+    """
+    return hashlib.blake2b(api_key.encode(), digest_size=8).hexdigest()
+
+class SharedKeyManager:
+    """
+    Drop-in replacement for APIKeyManager whose budgets live in Redis, so
+    every transcriber process and host draws from the same per-key request
+    and audio-second buckets. Each request also holds one of the key's
+    KEY_CONCURRENCY_LIMIT lease slots until it is released. Leases expire
+    after KEY_LEASE_TTL unless the holding process keeps renewing them.
+    """
+    def __init__(self, api_keys: list, redis_client: redis.Redis,
+                 concurrency_limit: int = KEY_CONCURRENCY_LIMIT,
+                 requests_per_minute: float = KEY_REQUESTS_PER_MINUTE,
+                 audio_seconds_per_hour: float = KEY_AUDIO_SECONDS_PER_HOUR,
+                 lease_ttl: float = KEY_LEASE_TTL):
+        self.api_keys = api_keys
+        self.redis_client = redis_client
+        self.concurrency_limit = concurrency_limit
+        self.requests_per_minute = requests_per_minute
+        self.audio_seconds_per_hour = audio_seconds_per_hour
+        self.lease_ttl = lease_ttl
+        fingerprints = {key: key_fingerprint(key) for key in api_keys}
+        self.budget_keys = {key: f"{KEY_BUDGET_KEY_PREFIX}{fp}" for key, fp in fingerprints.items()}
+        self.lease_keys = {key: f"{KEY_LEASES_KEY_PREFIX}{fp}" for key, fp in fingerprints.items()}
+        self.lease_script = redis_client.register_script(LEASE_SCRIPT)
+        self.update_script = redis_client.register_script(UPDATE_SCRIPT)
+        self.inspect_script = redis_client.register_script(INSPECT_SCRIPT)
+        # Leases held by this process, renewed until released
+        self.held_leases: Dict[str, str] = {}  # lease_id -> api_key
+        self.held_leases_lock = threading.Lock()
+        self.renewer = threading.Thread(target=self._renew_leases, name="key-lease-renewer", daemon=True)
+        self.renewer.start()
+
+    def _script_keys(self) -> List[str]:
+        keys = []
+        for key in self.api_keys:
+            keys.extend((self.budget_keys[key], self.lease_keys[key]))
+        return keys
+
+    def _inspect(self) -> List[Tuple[int, float, float, int]]:
+        values = self.inspect_script(
+            keys=self._script_keys(),
+            args=[time.time(), self.requests_per_minute, self.audio_seconds_per_hour]
+        )
+        return [
+            (int(values[i]), float(values[i + 1]), float(values[i + 2]), int(values[i + 3]))
+            for i in range(0, len(values), 4)
+        ]
+
+    @property
+    def usage_counts(self) -> Dict[str, int]:
+        return {key: state[3] for key, state in zip(self.api_keys, self._inspect())}
+
+    def free_capacity(self) -> Tuple[int, int]:
+        """
+        Returns the number of keys that could send a request right now and
+        the total number of requests those keys can accept without waiting,
+        counting requests in flight anywhere in the cluster.
+        """
+        try:
+            states = self._inspect()
+        except redis.RedisError as e:
+            logging.error(f"Could not read shared key budgets: {e}")
+            return 0, 0
+        free_keys = 0
+        free_requests = 0
+        for active, wait, request_tokens, _ in states:
+            free_slots = self.concurrency_limit - active
+            if wait > 0 or free_slots <= 0:
+                continue
+            free_keys += 1
+            free_requests += min(int(request_tokens), free_slots)
+        return free_keys, free_requests
+
+    def reserve(self, audio_seconds: float = 0.0, exclude_key: Optional[str] = None) -> Tuple[Optional[KeyLease], float]:
+        """
+        Leases the key that can accept a request of `audio_seconds` soonest
+        and reserves its budget. Returns the lease and the seconds to wait
+        before sending; (None, 0) if no key other than `exclude_key` exists;
+        or (None, LEASE_POLL_INTERVAL) while every key is at its concurrency
+        limit.
+        """
+        lease_id = uuid.uuid4().hex
+        excluded = self.api_keys.index(exclude_key) + 1 if exclude_key in self.api_keys else 0
+        position, wait = self.lease_script(
+            keys=self._script_keys(),
+            args=[
+                time.time(), audio_seconds, excluded, self.concurrency_limit, self.lease_ttl, lease_id,
+                MAX_RATE_LIMIT_WAIT, self.requests_per_minute, self.audio_seconds_per_hour, KEY_BUDGET_TTL
+            ]
+        )
+        wait = float(wait)
+        if position == 0:
+            return None, 0.0
+        if position == -1:
+            return None, LEASE_POLL_INTERVAL
+        if position == -2:
+            raise RateLimitWaitTooLong(
+                f"No API key can accept a {audio_seconds:.0f}s chunk for another {wait:.0f} seconds"
+            )
+        api_key = self.api_keys[position - 1]
+        with self.held_leases_lock:
+            self.held_leases[lease_id] = api_key
+        return KeyLease(api_key, lease_id), wait
+
+    def acquire(self, audio_seconds: float = 0.0, exclude_key: Optional[str] = None) -> Optional[KeyLease]:
+        """
+        Leases a key and blocks until a slot is free and its budget allows
+        the request.
+        """
+        while True:
+            lease, wait = self.reserve(audio_seconds, exclude_key)
+            if lease is None and wait == 0:
+                return None
+            if wait > 0:
+                if lease:
+                    logging.info(f"Waiting {wait:.1f}s for API key capacity")
+                time.sleep(wait)
+            if lease:
+                return lease
+
+    def release(self, lease: Optional[KeyLease]):
+        """
+        Returns a lease's slot. Safe to call more than once.
+        """
+        if lease is None or lease.lease_id is None:
+            return
+        with self.held_leases_lock:
+            self.held_leases.pop(lease.lease_id, None)
+        try:
+            self.redis_client.zrem(self.lease_keys[lease.api_key], lease.lease_id)
+        except redis.RedisError as e:
+            # The lease expires on its own once renewals stop
+            logging.error(f"Could not release API key lease: {e}")
+
+    def _renew_leases(self):
+        while True:
+            time.sleep(LEASE_RENEW_INTERVAL)
+            with self.held_leases_lock:
+                held = list(self.held_leases.items())
+            if not held:
+                continue
+            expires_at = time.time() + self.lease_ttl
+            try:
+                pipeline = self.redis_client.pipeline(transaction=False)
+                for lease_id, api_key in held:
+                    # xx: never resurrect a lease that was released or already expired
+                    pipeline.zadd(self.lease_keys[api_key], {lease_id: expires_at}, xx=True)
+                pipeline.execute()
+            except redis.RedisError as e:
+                logging.error(f"Could not renew API key leases: {e}")
+
+    def _update(self, api_key: str, headers: Mapping[str, str], retry_after: str = '') -> float:
+        def read(names):
+            return [headers.get(name) or '' for name in names[:2]] + [
+                parse_reset_duration(headers.get(names[2])) or ''
+            ]
+
+        return float(self.update_script(
+            keys=[self.budget_keys[api_key]],
+            args=[
+                time.time(), self.requests_per_minute, self.audio_seconds_per_hour, KEY_BUDGET_TTL,
+                *read(REQUEST_LIMIT_HEADERS), *read(AUDIO_LIMIT_HEADERS), retry_after, DAY
+            ]
+        ))
+
+    def update_from_headers(self, api_key: str, headers: Mapping[str, str]):
+        """
+        Refreshes a key's shared buckets from rate-limit response headers.
+        """
+        if api_key not in self.budget_keys or not headers:
+            return
+        try:
+            self._update(api_key, headers)
+        except redis.RedisError as e:
+            logging.error(f"Could not update shared key budget: {e}")
+
+    def record_error_response(self, api_key: str, error: Exception):
+        """
+        Applies the rate-limit headers of a failed request and, after a 429,
+        pauses the key for every process until the provider's retry-after,
+        or until its request bucket refills when no retry-after was given.
+        """
+        if api_key not in self.budget_keys:
+            return
+        response = getattr(error, 'response', None)
+        headers = getattr(response, 'headers', None) or {}
+        retry_after = ''
+        if getattr(error, 'status_code', None) == 429:
+            parsed = parse_reset_duration(headers.get("retry-after"))
+            retry_after = 'drain' if parsed is None else str(parsed)
+        try:
+            paused = self._update(api_key, headers, retry_after)
+        except redis.RedisError as e:
+            logging.error(f"Could not update shared key budget: {e}")
+            return
+        if retry_after:
+            logging.warning(f"API key rate limited, pausing it for {paused:.1f}s")
@@ -0,0 +1,271 @@
+# flask_transcriber/key_manager.py
+import logging
+import os
+import re
+import threading
+import time
+from typing import Optional, Dict, Tuple, Mapping, NamedTuple
+
+# Per-key request rate. The provider's request headers describe a daily
+# budget, so this is never overridden by them.
+KEY_REQUESTS_PER_MINUTE = float(os.getenv("KEY_REQUESTS_PER_MINUTE", "20"))
+# Default per-key audio budget, used until the provider's headers are seen
+KEY_AUDIO_SECONDS_PER_HOUR = float(os.getenv("KEY_AUDIO_SECONDS_PER_HOUR", "7200"))
+# Callers refuse to queue behind a key for longer than this
+MAX_RATE_LIMIT_WAIT = float(os.getenv("MAX_RATE_LIMIT_WAIT", "900"))  # seconds
+
+# (limit, remaining, reset) response headers for each budget. The request
+# headers report requests per day (e.g. limit 14400), not per minute.
+REQUEST_LIMIT_HEADERS = (
+    "x-ratelimit-limit-requests",
+    "x-ratelimit-remaining-requests",
+    "x-ratelimit-reset-requests"
+)
+AUDIO_LIMIT_HEADERS = (
+    "x-ratelimit-limit-audio-seconds",
+    "x-ratelimit-remaining-audio-seconds",
+    "x-ratelimit-reset-audio-seconds"
+)
+DAY = 24 * 60 * 60  # seconds
+
+class KeyLease(NamedTuple):
+    """
+    A key handed out for one request. lease_id is None for keys from the
+    in-process APIKeyManager, which has nothing to release.
+    """
+    api_key: str
+    lease_id: Optional[str] = None
+
+class RateLimitWaitTooLong(Exception):
+    """
+    Raised when no key can accept a request within MAX_RATE_LIMIT_WAIT.
+    """
+
+def parse_reset_duration(value: Optional[str]) -> Optional[float]:
+    """
+    Parses reset durations such as "7.66s", "2m59.56s", "1h2m3s" or "120ms"
+    into seconds. Plain numbers are treated as seconds.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|h|m|s)", value)
+    if not parts:
+        return None
+    units = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+    return sum(float(amount) * units[unit] for amount, unit in parts)
+
+class TokenBucket:
+    """
+    A token bucket that lets callers reserve tokens ahead of time. Tokens may
+    go negative; the deficit is the queue of reservations still waiting for
+    the bucket to refill.
+    """
+    def __init__(self, capacity: float, refill_period: float):
+        self.capacity = capacity
+        self.refill_rate = capacity / refill_period
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_rate)
+            self.updated_at = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """
+        Seconds until `amount` tokens are available.
+        """
+        self._refill(now)
+        needed = min(amount, self.capacity)
+        if self.tokens >= needed:
+            return 0.0
+        return (needed - self.tokens) / self.refill_rate
+
+    def consume(self, amount: float, now: float):
+        self._refill(now)
+        self.tokens -= amount
+
+    def sync(self, limit: Optional[float], remaining: Optional[float], reset_seconds: Optional[float], now: float):
+        """
+        Aligns the bucket with the provider's view of the budget. Remaining
+        tokens only ever go down here, since reservations made after the
+        response was generated are not reflected in the headers yet.
+        """
+        self._refill(now)
+        if limit and limit > 0:
+            self.capacity = limit
+        if remaining is not None:
+            self.tokens = min(self.tokens, remaining)
+            if reset_seconds and reset_seconds > 0 and remaining < self.capacity:
+                self.refill_rate = (self.capacity - remaining) / reset_seconds
+
+class KeyState:
+    """
+    Request and audio-second budgets for a single API key. The daily request
+    budget is only known once the provider's headers have reported it.
+    """
+    def __init__(self, requests_per_minute: float, audio_seconds_per_hour: float):
+        self.requests = TokenBucket(requests_per_minute, 60)
+        self.daily_requests: Optional[TokenBucket] = None
+        self.audio_seconds = TokenBucket(audio_seconds_per_hour, 3600)
+        self.blocked_until = 0.0
+        self.usage_count = 0
+
+    def wait_time(self, audio_seconds: float, now: float) -> float:
+        return max(
+            self.blocked_until - now,
+            self.requests.wait_time(1, now),
+            self.daily_requests.wait_time(1, now) if self.daily_requests else 0.0,
+            self.audio_seconds.wait_time(audio_seconds, now)
+        )
+
+    def request_tokens(self) -> float:
+        """
+        Requests the key can send before either request budget runs out.
+        """
+        if self.daily_requests:
+            return min(self.requests.tokens, self.daily_requests.tokens)
+        return self.requests.tokens
+
+    def consume(self, audio_seconds: float, now: float):
+        self.requests.consume(1, now)
+        if self.daily_requests:
+            self.daily_requests.consume(1, now)
+        self.audio_seconds.consume(audio_seconds, now)
+        self.usage_count += 1
+
+class APIKeyManager:
+    """
+    Schedules requests onto API keys. Each key is modelled as token buckets
+    (requests per minute, requests per day and audio seconds) that are
+    refilled over time and corrected from the provider's rate-limit response
+    headers, so a request is placed on whichever key can accept it soonest.
+    """
+    def __init__(self, api_keys: list,
+                 requests_per_minute: float = KEY_REQUESTS_PER_MINUTE,
+                 audio_seconds_per_hour: float = KEY_AUDIO_SECONDS_PER_HOUR):
+        self.api_keys = api_keys
+        self.states: Dict[str, KeyState] = {
+            key: KeyState(requests_per_minute, audio_seconds_per_hour) for key in api_keys
+        }
+        self.lock = threading.Lock()
+
+    @property
+    def usage_counts(self) -> Dict[str, int]:
+        return {key: state.usage_count for key, state in self.states.items()}
+
+    def free_capacity(self) -> Tuple[int, int]:
+        """
+        Returns the number of keys that could send a request right now and
+        the total number of requests those keys can accept without waiting.
+        """
+        with self.lock:
+            now = time.monotonic()
+            free_keys = 0
+            free_requests = 0
+            for state in self.states.values():
+                if state.wait_time(0.0, now) > 0:
+                    continue
+                free_keys += 1
+                free_requests += int(state.request_tokens())
+            return free_keys, free_requests
+
+    def reserve(self, audio_seconds: float = 0.0, exclude_key: Optional[str] = None) -> Tuple[Optional[KeyLease], float]:
+        """
+        Reserves capacity for one request of `audio_seconds` on the key that
+        can accept it soonest, in a thread-safe manner. Returns the key's lease
+        and the number of seconds the caller must wait before sending, or
+        (None, 0) if no key other than `exclude_key` exists.
+        """
+        with self.lock:
+            now = time.monotonic()
+            candidates = [k for k in self.api_keys if k != exclude_key]
+            if not candidates:
+                return None, 0.0
+            best_key = min(
+                candidates,
+                key=lambda k: (self.states[k].wait_time(audio_seconds, now), self.states[k].usage_count)
+            )
+            state = self.states[best_key]
+            wait = state.wait_time(audio_seconds, now)
+            if wait > MAX_RATE_LIMIT_WAIT:
+                raise RateLimitWaitTooLong(
+                    f"No API key can accept a {audio_seconds:.0f}s chunk for another {wait:.0f} seconds"
+                )
+            state.consume(audio_seconds, now)
+            return KeyLease(best_key), wait
+
+    def acquire(self, audio_seconds: float = 0.0, exclude_key: Optional[str] = None) -> Optional[KeyLease]:
+        """
+        Reserves a key and blocks until its buckets allow the request.
+        """
+        lease, wait = self.reserve(audio_seconds, exclude_key)
+        if wait > 0:
+            logging.info(f"Waiting {wait:.1f}s for API key capacity")
+            time.sleep(wait)
+        return lease
+
+    def release(self, lease: Optional[KeyLease]):
+        """
+        Nothing to return in-process; kept for parity with SharedKeyManager.
+        """
+
+    def update_from_headers(self, api_key: str, headers: Mapping[str, str]):
+        """
+        Refreshes a key's buckets from rate-limit response headers.
+        """
+        state = self.states.get(api_key)
+        if state is None or not headers:
+            return
+
+        def read(names):
+            limit, remaining, reset = (headers.get(name) for name in names)
+            try:
+                limit = float(limit) if limit is not None else None
+                remaining = float(remaining) if remaining is not None else None
+            except ValueError:
+                return None
+            return limit, remaining, parse_reset_duration(reset)
+
+        with self.lock:
+            now = time.monotonic()
+            request_limits = read(REQUEST_LIMIT_HEADERS)
+            if request_limits:
+                limit = request_limits[0]
+                if state.daily_requests is None and limit and limit > 0:
+                    state.daily_requests = TokenBucket(limit, DAY)
+                if state.daily_requests:
+                    state.daily_requests.sync(*request_limits, now)
+            audio_limits = read(AUDIO_LIMIT_HEADERS)
+            if audio_limits:
+                state.audio_seconds.sync(*audio_limits, now)
+
+    def record_error_response(self, api_key: str, error: Exception):
+        """
+        Applies the rate-limit headers of a failed request and, after a 429,
+        pauses the key for the provider's retry-after, or until its request
+        bucket refills when no retry-after was given.
+        """
+        response = getattr(error, 'response', None)
+        headers = getattr(response, 'headers', None) or {}
+        self.update_from_headers(api_key, headers)
+        if getattr(error, 'status_code', None) != 429:
+            return
+
+        state = self.states.get(api_key)
+        if state is None:
+            return
+        retry_after = parse_reset_duration(headers.get("retry-after"))
+        with self.lock:
+            now = time.monotonic()
+            if retry_after is None:
+                state.requests.consume(max(state.requests.tokens, 0), now)
+                retry_after = state.requests.wait_time(1, now)
+            state.blocked_until = max(state.blocked_until, now + retry_after)
+        logging.warning(f"API key rate limited, pausing it for {retry_after:.1f}s")
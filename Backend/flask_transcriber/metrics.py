@@ -0,0 +1,52 @@
+# flask_transcriber/metrics.py
+from prometheus_client import Counter, Gauge, Histogram
+
+from flask_transcriber.key_leases import key_fingerprint
+
+STAGE_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200, 3600)
+CHUNK_REQUEST_BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300, 600)
+
+# Stages: token_generation, download, chunking, transcription, merge,
+# mongo_write and total (the whole job)
+STAGE_DURATION = Histogram(
+    'transcriber_stage_duration_seconds',
+    'Time spent in each stage of a transcription job',
+    ['stage'],
+    buckets=STAGE_BUCKETS
+)
+CHUNK_REQUEST_DURATION = Histogram(
+    'transcriber_chunk_request_seconds',
+    'Latency of transcription API requests per key and outcome',
+    ['key', 'outcome'],
+    buckets=CHUNK_REQUEST_BUCKETS
+)
+KEY_RATE_LIMITED = Counter(
+    'transcriber_key_rate_limited_total',
+    'Transcription API responses with HTTP 429 per key',
+    ['key']
+)
+CHUNK_RETRIES = Counter(
+    'transcriber_chunk_retries_total',
+    'Chunk requests retried after a failure, per key that failed',
+    ['key']
+)
+JOBS_FINISHED = Counter(
+    'transcriber_jobs_finished_total',
+    'Jobs finished per status',
+    ['status']
+)
+JOB_ERRORS = Counter(
+    'transcriber_job_errors_total',
+    'Failed jobs per recorded error_type',
+    ['error_type']
+)
+ACTIVE_JOBS = Gauge(
+    'transcriber_active_jobs',
+    'Jobs running in this transcriber process'
+)
+
+def key_label(api_key: str) -> str:
+    """
+    Label value for an API key; the key itself never appears in metrics.
+    """
+    return key_fingerprint(api_key)
@@ -0,0 +1,90 @@
+# flask_transcriber/migrate_transcripts.py
+"""
+Converts transcripts stored as raw verbose_json into the compact format.
+
+    python -m flask_transcriber.migrate_transcripts [--batch-size 200] [--include-scores] [--dry-run]
+
+Documents already in the compact format are skipped, so the migration can be
+interrupted and re-run safely.
+"""
+import argparse
+import logging
+import os
+
+from bson import BSON
+from dotenv import load_dotenv
+from pymongo import MongoClient, UpdateOne
+
+from shared.transcript_codec import encode_transcript, TRANSCRIPT_FORMAT
+
+load_dotenv()
+
+MONGODB_URL = os.getenv("MONGODB_URL")
+DATABASE_NAME = os.getenv("DATABASE_NAME", "transcriptions")
+DEFAULT_BATCH_SIZE = 200
+
+logging.basicConfig(
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+
+def migrate(collection, batch_size: int, include_scores: bool, dry_run: bool):
+    query = {'format': {'$ne': TRANSCRIPT_FORMAT}, 'transcription': {'$exists': True}}
+    cursor = collection.find(query, batch_size=batch_size)
+    operations = []
+    migrated = 0
+    failed = 0
+    bytes_before = 0
+    bytes_after = 0
+
+    def flush():
+        if operations and not dry_run:
+            collection.bulk_write(operations, ordered=False)
+        operations.clear()
+
+    for doc in cursor:
+        try:
+            compact = encode_transcript(doc['transcription'], include_scores=include_scores)
+        except (KeyError, TypeError, ValueError) as e:
+            failed += 1
+            logging.error(f"Skipping transcript {doc['_id']}: {e}")
+            continue
+
+        bytes_before += len(BSON.encode(doc))
+        migrated_doc = {k: v for k, v in doc.items() if k not in ('transcription', 'transcription_raw')}
+        migrated_doc.update(compact)
+        bytes_after += len(BSON.encode(migrated_doc))
+
+        # Only convert documents that are still in the legacy format
+        operations.append(UpdateOne(
+            {'_id': doc['_id'], 'format': {'$ne': TRANSCRIPT_FORMAT}},
+            {'$set': compact, '$unset': {'transcription': '', 'transcription_raw': ''}}
+        ))
+        migrated += 1
+        if len(operations) >= batch_size:
+            flush()
+            logging.info(f"Migrated {migrated} transcripts so far.")
+    flush()
+
+    action = "Would migrate" if dry_run else "Migrated"
+    logging.info(
+        f"{action} {migrated} transcripts ({failed} failed): "
+        f"{bytes_before / 1e6:.1f}MB -> {bytes_after / 1e6:.1f}MB"
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert stored transcripts to the compact format.")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--include-scores", action="store_true",
+                        help="keep avg_logprob, compression_ratio and no_speech_prob")
+    parser.add_argument("--dry-run", action="store_true", help="report the size change without writing")
+    args = parser.parse_args()
+
+    client = MongoClient(MONGODB_URL)
+    try:
+        migrate(client[DATABASE_NAME]['transcriptions'], args.batch_size, args.include_scores, args.dry_run)
+    finally:
+        client.close()
+
+if __name__ == '__main__':
+    main()
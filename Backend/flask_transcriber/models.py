@@ -1,6 +1,6 @@
 # flask_transcriber/models.py
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any
+from typing import Optional
 from datetime import datetime
 
 class Job(BaseModel):
@@ -15,8 +15,9 @@ class Job(BaseModel):
 class Transcription(BaseModel):
     id: str = Field(..., alias='_id')  # Alias 'id' to '_id'
     video_title: str
-    transcription: Dict[str, Any]  # Complete transcription data
-    transcription_raw: str  # Raw transcription text
+    format: str  # Storage format, see shared/transcript_codec.py
+    segment_count: int
+    segments_blob: bytes  # Compressed parallel start/end/text arrays
     created_at: datetime
 
     class Config:
@@ -0,0 +1,197 @@
+# flask_transcriber/ranged_download.py
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional, Dict, Callable, List, Tuple
+
+import requests
+
+# Concurrent connections per download and the size of each requested range.
+# YouTube throttles single responses much more than several ~10MB ranges.
+RANGED_DOWNLOAD_CONNECTIONS = int(os.getenv("RANGED_DOWNLOAD_CONNECTIONS", "4"))
+RANGE_SIZE = int(os.getenv("RANGE_SIZE", str(10 * 1024 * 1024)))  # bytes
+RANGE_MAX_RETRIES = 3
+RANGE_INITIAL_BACKOFF = 1  # seconds
+RANGE_CONNECT_TIMEOUT = 10  # seconds
+RANGE_READ_TIMEOUT = 30  # seconds
+READ_BLOCK_SIZE = 256 * 1024  # bytes
+
+class RangedDownloadError(Exception):
+    """
+    Raised when a ranged download cannot be completed, including when the
+    server does not honour range requests.
+    """
+
+class RangesUnsupportedError(RangedDownloadError):
+    """
+    Raised when the server answers a range request with the whole resource;
+    retrying the range cannot help.
+    """
+
+def probe_content_length(session: requests.Session, url: str, headers: Optional[Dict[str, str]] = None) -> int:
+    """
+    Returns the size of the resource from a one-byte range request, which
+    also confirms that the server supports ranges.
+    """
+    request_headers = {**(headers or {}), "Range": "bytes=0-0"}
+    with session.get(url, headers=request_headers, stream=True,
+                     timeout=(RANGE_CONNECT_TIMEOUT, RANGE_READ_TIMEOUT)) as response:
+        if response.status_code == 200:
+            raise RangesUnsupportedError("Server does not support range requests")
+        if response.status_code != 206:
+            raise RangedDownloadError(f"Range probe returned HTTP {response.status_code}")
+        content_range = response.headers.get("Content-Range", "")
+        total = content_range.rpartition("/")[2]
+        if not total.isdigit():
+            raise RangedDownloadError(f"Unknown content length (Content-Range: {content_range!r})")
+        return int(total)
+
+def split_ranges(total_size: int, range_size: int) -> List[Tuple[int, int]]:
+    """
+    Splits [0, total_size) into inclusive (start, end) byte ranges.
+    """
+    return [(start, min(start + range_size, total_size) - 1) for start in range(0, total_size, range_size)]
+
+def download_ranged(url: str, dest_path: str, total_size: Optional[int] = None,
+                    connections: int = RANGED_DOWNLOAD_CONNECTIONS, range_size: int = RANGE_SIZE,
+                    on_progress: Optional[Callable[[float], None]] = None,
+                    headers: Optional[Dict[str, str]] = None,
+                    max_retries: int = RANGE_MAX_RETRIES) -> str:
+    """
+    Downloads `url` into a preallocated `dest_path` by fetching byte ranges
+    over `connections` concurrent connections. Each range is retried on its
+    own, resuming from the bytes it already wrote. on_progress, if given, is
+    called with the aggregate download percentage.
+    Raises RangedDownloadError if the server does not support ranges or a
+    range keeps failing.
+    """
+    local = threading.local()
+
+    def get_session() -> requests.Session:
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        return local.session
+
+    if total_size is None:
+        total_size = probe_content_length(get_session(), url, headers)
+    if total_size <= 0:
+        raise RangedDownloadError("Nothing to download")
+
+    fd = os.open(dest_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+    progress_lock = threading.Lock()
+    downloaded = 0
+    last_logged = -10.0
+
+    def report(amount: int):
+        nonlocal downloaded, last_logged
+        with progress_lock:
+            downloaded += amount
+            percentage = downloaded / total_size * 100
+            if percentage - last_logged >= 10:
+                logging.info(f"Download progress: {percentage:.1f}%")
+                last_logged = percentage
+        if on_progress:
+            on_progress(percentage)
+
+    def fetch_range(byte_range: Tuple[int, int]):
+        start, end = byte_range
+        position = start
+        backoff = RANGE_INITIAL_BACKOFF
+        attempt = 0
+        while True:
+            try:
+                request_headers = {**(headers or {}), "Range": f"bytes={position}-{end}"}
+                with get_session().get(url, headers=request_headers, stream=True,
+                                       timeout=(RANGE_CONNECT_TIMEOUT, RANGE_READ_TIMEOUT)) as response:
+                    if response.status_code == 200:
+                        raise RangesUnsupportedError("Server does not support range requests")
+                    if response.status_code != 206:
+                        raise RangedDownloadError(f"Range {position}-{end} returned HTTP {response.status_code}")
+                    for block in response.iter_content(chunk_size=READ_BLOCK_SIZE):
+                        block = block[:end + 1 - position]
+                        if not block:
+                            continue
+                        os.pwrite(fd, block, position)
+                        position += len(block)
+                        report(len(block))
+                if position <= end:
+                    raise RangedDownloadError(f"Range {start}-{end} ended early at byte {position}")
+                return
+            except RangesUnsupportedError:
+                raise
+            except (requests.RequestException, RangedDownloadError) as e:
+                attempt += 1
+                if attempt > max_retries:
+                    raise RangedDownloadError(f"Range {start}-{end} failed after {max_retries} retries: {e}")
+                logging.warning(f"Range {start}-{end} failed at byte {position} (attempt {attempt}): {e}")
+                time.sleep(backoff + random.uniform(0, 0.5))
+                backoff *= 2
+
+    try:
+        # Reserve the whole file up front so ranges can be written in place
+        if hasattr(os, "posix_fallocate"):
+            os.posix_fallocate(fd, 0, total_size)
+        else:
+            os.ftruncate(fd, total_size)
+        ranges = split_ranges(total_size, range_size)
+        executor = ThreadPoolExecutor(max_workers=max(1, min(connections, len(ranges))),
+                                      thread_name_prefix="ranged-download")
+        try:
+            futures = [executor.submit(fetch_range, byte_range) for byte_range in ranges]
+            for future in as_completed(futures):
+                future.result()
+        finally:
+            # After a failure, drop the ranges that have not started yet
+            executor.shutdown(wait=True, cancel_futures=True)
+    except BaseException:
+        os.close(fd)
+        try:
+            os.remove(dest_path)
+        except OSError:
+            pass
+        raise
+    os.close(fd)
+    return dest_path
+
+def download_single(url: str, dest_path: str, on_progress: Optional[Callable[[float], None]] = None,
+                    headers: Optional[Dict[str, str]] = None) -> str:
+    """
+    Downloads `url` into `dest_path` over a single connection, for servers
+    that do not support range requests.
+    """
+    with requests.get(url, headers=headers, stream=True,
+                      timeout=(RANGE_CONNECT_TIMEOUT, RANGE_READ_TIMEOUT)) as response:
+        response.raise_for_status()
+        total_size = int(response.headers.get("Content-Length") or 0)
+        downloaded = 0
+        with open(dest_path, "wb") as file:
+            for block in response.iter_content(chunk_size=READ_BLOCK_SIZE):
+                file.write(block)
+                downloaded += len(block)
+                if on_progress and total_size:
+                    on_progress(min(100.0, downloaded / total_size * 100))
+    if on_progress:
+        on_progress(100.0)
+    return dest_path
+
+def download_with_fallback(url: str, dest_path: str, total_size: Optional[int] = None,
+                           on_progress: Optional[Callable[[float], None]] = None,
+                           headers: Optional[Dict[str, str]] = None,
+                           fallback: Optional[Callable[[], str]] = None, **kwargs) -> str:
+    """
+    Downloads `url` over parallel byte ranges and, if the server does not
+    honour ranges or a range keeps failing, over one connection instead:
+    by calling `fallback` if given, else with download_single. Returns the
+    path of the downloaded file.
+    """
+    try:
+        return download_ranged(url, dest_path, total_size=total_size, on_progress=on_progress,
+                               headers=headers, **kwargs)
+    except RangedDownloadError as e:
+        logging.warning(f"Ranged download failed, retrying over one connection: {e}")
+    if fallback:
+        return fallback()
+    return download_single(url, dest_path, on_progress=on_progress, headers=headers)
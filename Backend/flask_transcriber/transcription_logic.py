@@ -3,19 +3,47 @@ import os
 import time
 import shutil
 import tempfile
-from typing import Optional, Dict, Any, List
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional, Dict, Any, List, Iterable, Tuple, Callable
+from concurrent.futures import ThreadPoolExecutor, Future, as_completed
 from groq import Groq
 from dotenv import load_dotenv
 import subprocess
 import logging
 import random
 import threading
+import json
+import redis
 from pymongo import MongoClient
 from pymongo.errors import DuplicateKeyError
 from datetime import datetime
 from flask_transcriber.models import Transcription
-from flask_transcriber.utils import download_youtube_audio, chunk_audio_file
+from flask_transcriber.async_engine import AsyncTranscriptionEngine
+from flask_transcriber.key_manager import APIKeyManager, RateLimitWaitTooLong
+from flask_transcriber.key_leases import SharedKeyManager
+from shared.transcript_codec import encode_transcript
+from flask_transcriber.chunk_planner import ChunkLatencyModel, plan_chunk_duration
+from flask_transcriber.audio_cache import audio_cache
+from flask_transcriber.metrics import (
+    STAGE_DURATION,
+    CHUNK_REQUEST_DURATION,
+    KEY_RATE_LIMITED,
+    CHUNK_RETRIES,
+    JOBS_FINISHED,
+    JOB_ERRORS,
+    key_label
+)
+from flask_transcriber.utils import (
+    download_youtube_audio,
+    resolve_youtube_audio,
+    stream_audio_segments,
+    get_audio_duration,
+    max_chunk_duration_for,
+    plan_audio_chunks,
+    extract_audio_chunks,
+    AudioStreamError,
+    AUDIO_TRANSCODE,
+    CHUNK_TARGET_DURATION
+)
 from pydantic import ValidationError
 
 load_dotenv()
@@ -30,6 +58,22 @@ MAX_WORKERS = len(API_KEYS)
 MAX_RETRIES = 3
 INITIAL_BACKOFF = 2  # seconds
 
+# Chunk transcription engine: "threads" (one request per key per job) or
+# "async" (shared pooled clients with PER_KEY_CONCURRENCY requests in flight per key)
+TRANSCRIPTION_ENGINE = os.getenv("TRANSCRIPTION_ENGINE", "threads").lower()
+PER_KEY_CONCURRENCY = int(os.getenv("PER_KEY_CONCURRENCY", "4"))
+
+# Overlap download, segmentation and transcription instead of running them back to back
+PIPELINED_TRANSCRIPTION = os.getenv("PIPELINED_TRANSCRIPTION", "false").lower() == "true"
+
+# Size chunks from the audio duration, free key capacity and measured latency,
+# between MIN_CHUNK_DURATION and CHUNK_TARGET_DURATION seconds
+ADAPTIVE_CHUNKING = os.getenv("ADAPTIVE_CHUNKING", "true").lower() == "true"
+MIN_CHUNK_DURATION = float(os.getenv("MIN_CHUNK_DURATION", "60"))  # seconds
+
+# Keep avg_logprob, compression_ratio and no_speech_prob in stored transcripts
+STORE_SEGMENT_SCORES = os.getenv("STORE_SEGMENT_SCORES", "false").lower() == "true"
+
 MONGODB_URL = os.getenv("MONGODB_URL")
 DATABASE_NAME = os.getenv("DATABASE_NAME", "transcriptions")
 
@@ -39,79 +83,149 @@ db = client[DATABASE_NAME]
 jobs_collection = db['jobs']
 transcriptions_collection = db['transcriptions']
 
+# Chunk plans and per-chunk results of unfinished jobs, so a retried job only
+# transcribes the chunks that are missing. Both expire after CHUNK_CHECKPOINT_TTL.
+chunk_plans_collection = db['chunk_plans']
+chunk_checkpoints_collection = db['chunk_checkpoints']
+CHUNK_CHECKPOINT_TTL = int(os.getenv("CHUNK_CHECKPOINT_TTL", str(3 * 24 * 60 * 60)))  # seconds
+
+# Redis configuration (job completion events for the worker)
+REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
+REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
+REDIS_DB = int(os.getenv("REDIS_DB", "0"))
+JOB_COMPLETION_CHANNEL = 'job_completions'
+JOB_COMPLETION_KEY_PREFIX = 'job_completion:'
+JOB_COMPLETION_TTL = 24 * 60 * 60  # seconds
+TERMINAL_JOB_STATUSES = ('success', 'failed')
+
+# Live progress events (served to clients by the API over SSE)
+JOB_EVENTS_CHANNEL_PREFIX = 'job_events:'
+JOB_PROGRESS_KEY_PREFIX = 'job_progress:'
+PROGRESS_MIN_INTERVAL = 0.5  # seconds between throttled progress events
+
+# Initialize Redis client
+redis_client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB)
+
 # Logging Configuration
 logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s',
     level=logging.INFO
 )
 
-# API Key Manager
-class APIKeyManager:
-    """
-    Manages API keys and tracks their usage to ensure fair rotation.
-    """
-    def __init__(self, api_keys: list):
-        self.api_keys = api_keys
-        self.usage_counts = {key: 0 for key in api_keys}
-        self.lock = threading.Lock()
+# Share key budgets and concurrency leases through Redis with every other
+# transcriber process, or schedule keys within this process only
+SHARED_KEY_LEASES = os.getenv("SHARED_KEY_LEASES", "true").lower() == "true"
 
-    def get_least_used_key(self) -> str:
-        """
-        Retrieves the least used API key in a thread-safe manner.
-        """
-        with self.lock:
-            least_used_key = min(self.api_keys, key=lambda k: self.usage_counts[k])
-            self.usage_counts[least_used_key] += 1
-            return least_used_key
+# Initialize the key manager
+if SHARED_KEY_LEASES:
+    api_key_manager = SharedKeyManager(API_KEYS, redis_client)
+else:
+    api_key_manager = APIKeyManager(API_KEYS)
+# Per-chunk request latency, shared by both engines
+chunk_latency_model = ChunkLatencyModel()
 
-    def get_new_key(self, exclude_key: Optional[str] = None) -> Optional[str]:
-        """
-        Retrieves the least used API key, excluding the specified key.
-        Returns None if no other key is available.
-        """
-        with self.lock:
-            available_keys = [k for k in self.api_keys if k != exclude_key]
-            if not available_keys:
-                return None
-            least_used_key = min(available_keys, key=lambda k: self.usage_counts[k])
-            self.usage_counts[least_used_key] += 1
-            return least_used_key
+# Groq clients are reused per key so connections stay pooled across chunks and jobs
+groq_clients: Dict[str, Groq] = {}
+groq_clients_lock = threading.Lock()
 
-# Initialize APIKeyManager
-api_key_manager = APIKeyManager(API_KEYS)
+def get_groq_client(api_key: str) -> Groq:
+    """
+    Returns the shared Groq client for an API key, creating it on first use.
+    """
+    with groq_clients_lock:
+        client_groq = groq_clients.get(api_key)
+        if client_groq is None:
+            client_groq = Groq(api_key=api_key)
+            groq_clients[api_key] = client_groq
+        return client_groq
+
+# Process-wide async engine, created on first use when TRANSCRIPTION_ENGINE=async
+async_engine: Optional[AsyncTranscriptionEngine] = None
+async_engine_lock = threading.Lock()
+
+def get_async_engine() -> AsyncTranscriptionEngine:
+    """
+    Returns the async transcription engine shared by all jobs in this process.
+    """
+    global async_engine
+    with async_engine_lock:
+        if async_engine is None:
+            async_engine = AsyncTranscriptionEngine(
+                api_key_manager,
+                per_key_concurrency=PER_KEY_CONCURRENCY,
+                max_retries=MAX_RETRIES,
+                initial_backoff=INITIAL_BACKOFF,
+                latency_model=chunk_latency_model
+            )
+            logging.info(f"Started async transcription engine ({PER_KEY_CONCURRENCY} requests per key)")
+        return async_engine
 
 def transcribe_audio_chunk(chunk_info: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     """
     Transcribes a single audio chunk using the Groq SDK with retry logic.
+    The key is picked when the request is sent, waiting on its rate-limit
+    buckets rather than failing with a 429.
     """
     chunk_path = chunk_info["chunk_path"]
     chunk_index = chunk_info["chunk_index"]
-    api_key = chunk_info.get("api_key")
-    client_groq = Groq(api_key=api_key)
+    audio_seconds = chunk_info.get("duration") or 0.0
+    api_key = None
+    exclude_key = None
     attempt = 0
     backoff = INITIAL_BACKOFF
     last_error = None
 
     while attempt < MAX_RETRIES:
+        lease = api_key_manager.acquire(audio_seconds, exclude_key=exclude_key)
+        if not lease:
+            logging.error(f"Chunk {chunk_index}: No alternative API keys available for retry.")
+            return None
+        api_key = lease.api_key
+        client_groq = get_groq_client(api_key)
         try:
-            with open(chunk_path, "rb") as file:
-                transcription = client_groq.audio.transcriptions.create(
-                    file=file,
-                    model="whisper-large-v3-turbo",
-                    response_format="verbose_json",
-                    temperature=0.0
-                )
-            transcription_data = transcription.model_dump()
+            request_started = time.monotonic()
+            try:
+                with open(chunk_path, "rb") as file:
+                    raw_response = client_groq.audio.transcriptions.with_raw_response.create(
+                        file=file,
+                        model="whisper-large-v3-turbo",
+                        response_format="verbose_json",
+                        temperature=0.0
+                    )
+            except Exception:
+                CHUNK_REQUEST_DURATION.labels(key_label(api_key), 'error').observe(time.monotonic() - request_started)
+                raise
+            finally:
+                api_key_manager.release(lease)
+            request_latency = time.monotonic() - request_started
+            CHUNK_REQUEST_DURATION.labels(key_label(api_key), 'success').observe(request_latency)
+            chunk_latency_model.record(audio_seconds, request_latency)
+            api_key_manager.update_from_headers(api_key, raw_response.headers)
+            transcription_data = raw_response.parse().model_dump()
             return {
                 "chunk_index": chunk_index,
                 "text": transcription_data.get("text", ""),
-                "segments": transcription_data.get("segments", [])
+                "segments": transcription_data.get("segments", []),
+                "start_offset": chunk_info.get("start_offset"),
+                "overlap_before": chunk_info.get("overlap_before", 0.0)
             }
+        except RateLimitWaitTooLong:
+            raise
         except Exception as e:
-            attempt += 1
             last_error = e
             error_code = getattr(e, 'status_code', None)
-            
+            if error_code == 429:
+                # Not a failed attempt: the key's bucket now carries the wait,
+                # so requeue on whichever key frees up first (possibly this
+                # one); RateLimitWaitTooLong bounds how long that can take
+                logging.warning(f"Chunk {chunk_index}: Rate limited, waiting for key capacity. Error: {e}")
+                api_key_manager.record_error_response(api_key, e)
+                CHUNK_RETRIES.labels(key_label(api_key)).inc()
+                KEY_RATE_LIMITED.labels(key_label(api_key)).inc()
+                exclude_key = None
+                continue
+
+            attempt += 1
             # Log the specific error details
             logging.error(f"Chunk {chunk_index}: Transcription attempt {attempt} failed. Error: {e}, Status Code: {error_code}")
             
@@ -120,34 +234,24 @@ def transcribe_audio_chunk(chunk_info: Dict[str, Any]) -> Optional[Dict[str, Any
                 error_msg = f"Groq server error (HTTP {error_code}): {str(e)}"
                 logging.error(error_msg)
                 raise Exception(error_msg)
-            
-            if attempt < MAX_RETRIES:
-                new_api_key = api_key_manager.get_new_key(exclude_key=api_key)
-                if not new_api_key:
-                    logging.error(f"Chunk {chunk_index}: No alternative API keys available for retry.")
-                    break
-                else:
-                    api_key = new_api_key
-                    client_groq = Groq(api_key=api_key)
-                    time.sleep(backoff + random.uniform(0, 1))
-                    backoff *= 2
-            else:
+
+            if attempt >= MAX_RETRIES:
                 logging.error(f"Chunk {chunk_index}: All transcription attempts failed.")
                 raise Exception(f"All transcription attempts failed for chunk {chunk_index}. Last error: {last_error}")
 
-def rotate_api_keys(total_requests: int) -> List[str]:
-    """
-    Rotates API keys by selecting the least used key for each request.
-    """
-    assigned_keys = []
-    for _ in range(total_requests):
-        key = api_key_manager.get_least_used_key()
-        assigned_keys.append(key)
-    return assigned_keys
+            api_key_manager.record_error_response(api_key, e)
+            CHUNK_RETRIES.labels(key_label(api_key)).inc()
+            exclude_key = api_key
+            time.sleep(backoff + random.uniform(0, 1))
+            backoff *= 2
 
 def merge_transcriptions(transcription_chunks: List[Dict[str, Any]]) -> Dict[str, Any]:
     """
     Merges multiple transcription chunks into a single transcription.
+    Segment times are shifted by each chunk's start offset in the source
+    audio. Where consecutive chunks overlap, each segment is kept only by
+    the chunk on whose side of the overlap midpoint its own midpoint falls.
+    The chunks are left untouched, since checkpoints may still be saving them.
     """
     merged_transcription = {
         "text": "",
@@ -155,19 +259,372 @@ def merge_transcriptions(transcription_chunks: List[Dict[str, Any]]) -> Dict[str
     }
 
     transcription_chunks_sorted = sorted(transcription_chunks, key=lambda x: x['chunk_index'])
-    time_offset = 0
-    for chunk in transcription_chunks_sorted:
-        merged_transcription["text"] += chunk["text"] + " "
+    # Segments before this point belong to the previous chunk
+    keep_from = [
+        chunk["start_offset"] + chunk.get("overlap_before", 0.0) / 2 if chunk.get("start_offset") is not None else None
+        for chunk in transcription_chunks_sorted
+    ]
+    time_offset = 0.0
+    for position, chunk in enumerate(transcription_chunks_sorted):
+        if chunk.get("start_offset") is not None:
+            time_offset = chunk["start_offset"]
+        lower = keep_from[position] if position > 0 else None
+        upper = keep_from[position + 1] if position + 1 < len(keep_from) else None
         for segment in chunk.get("segments", []):
-            segment["start"] += time_offset
-            segment["end"] += time_offset
+            segment = {**segment, "start": segment["start"] + time_offset, "end": segment["end"] + time_offset}
+            midpoint = (segment["start"] + segment["end"]) / 2
+            if lower is not None and midpoint < lower:
+                continue
+            if upper is not None and midpoint >= upper:
+                continue
+            segment["id"] = len(merged_transcription["segments"])
             merged_transcription["segments"].append(segment)
-        if chunk.get("segments"):
+        # Chunks without a recorded offset continue from the last segment
+        if merged_transcription["segments"]:
             time_offset = merged_transcription["segments"][-1]["end"]
 
-    merged_transcription["text"] = merged_transcription["text"].strip()
+    merged_transcription["text"] = " ".join(
+        segment["text"].strip() for segment in merged_transcription["segments"] if segment.get("text", "").strip()
+    )
     return merged_transcription
 
+def publish_job_event(job_id: str, event: Dict[str, Any], pipeline=None):
+    """
+    Stores the job's latest progress event and fans it out to subscribers.
+    The stored copy lets late subscribers start from the current state.
+    """
+    payload = json.dumps({'job_id': job_id, **event})
+    execute = pipeline is None
+    pipeline = pipeline or redis_client.pipeline()
+    pipeline.set(f"{JOB_PROGRESS_KEY_PREFIX}{job_id}", payload, ex=JOB_COMPLETION_TTL)
+    pipeline.publish(f"{JOB_EVENTS_CHANNEL_PREFIX}{job_id}", payload)
+    if execute:
+        try:
+            pipeline.execute()
+        except redis.RedisError as e:
+            logging.error(f"Failed to publish progress for job {job_id}: {e}")
+
+class JobProgress:
+    """
+    Tracks a job's per-stage progress and publishes it as events. Frequent
+    updates (download percent, chunk completions) are throttled; stage
+    changes are always published.
+    """
+    # Share of the overall progress bar covered by each stage
+    DOWNLOAD_WEIGHT = 25
+    TRANSCRIBE_WEIGHT = 65
+
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self.state: Dict[str, Any] = {
+            'stage': 'processing',
+            'progress': 0,
+            'download_percent': 0.0,
+            'chunks_done': 0,
+            'chunks_total': 0
+        }
+        self.lock = threading.Lock()
+        self.last_published = 0.0
+
+    def _overall_progress(self) -> int:
+        stage = self.state['stage']
+        if stage == 'merging':
+            return 92
+        if stage == 'saving':
+            return 96
+        progress = 5 + self.DOWNLOAD_WEIGHT * self.state['download_percent'] / 100
+        if self.state['chunks_total']:
+            progress += self.TRANSCRIBE_WEIGHT * self.state['chunks_done'] / self.state['chunks_total']
+        return int(progress)
+
+    def update(self, stage: Optional[str] = None, **fields):
+        with self.lock:
+            stage_changed = stage is not None and stage != self.state['stage']
+            if stage:
+                self.state['stage'] = stage
+            self.state.update(fields)
+            # Never move the bar backwards (e.g. when more streamed chunks appear)
+            self.state['progress'] = max(self.state['progress'], self._overall_progress())
+            now = time.time()
+            if not stage_changed and now - self.last_published < PROGRESS_MIN_INTERVAL:
+                return
+            self.last_published = now
+            event = dict(self.state)
+        publish_job_event(self.job_id, event)
+
+    def download_progress(self, percentage: float):
+        # In pipelined mode the download keeps going while chunks transcribe
+        stage = None if self.state['stage'] == 'transcribing' else 'downloading'
+        self.update(stage, download_percent=round(percentage, 1))
+
+    def chunk_progress(self, chunks_done: int, chunks_total: int):
+        self.update('transcribing', chunks_done=chunks_done, chunks_total=chunks_total)
+
+def publish_job_completion(job_id: str, status: str, error: Optional[str] = None):
+    """
+    Records that a job reached a terminal state and notifies the workers and
+    progress subscribers. The key lets a worker that missed the event find out
+    on its next check.
+    """
+    try:
+        pipeline = redis_client.pipeline()
+        pipeline.set(f"{JOB_COMPLETION_KEY_PREFIX}{job_id}", status, ex=JOB_COMPLETION_TTL)
+        pipeline.publish(JOB_COMPLETION_CHANNEL, json.dumps({'job_id': job_id, 'status': status}))
+        event = {'stage': status, 'progress': 100}
+        if error:
+            event['error'] = error
+        publish_job_event(job_id, event, pipeline)
+        pipeline.execute()
+    except redis.RedisError as e:
+        logging.error(f"Failed to publish completion for job {job_id}: {e}")
+
+def get_job_status(job_id: str) -> Optional[str]:
+    job = jobs_collection.find_one({'job_id': job_id}, {'status': 1})
+    return job['status'] if job else None
+
+def mark_job_failed(job_id: str, error_msg: str, error_type: str):
+    """
+    Logs the error and records the job as failed.
+    """
+    logging.error(error_msg)
+    JOB_ERRORS.labels(error_type).inc()
+    JOBS_FINISHED.labels('failed').inc()
+    jobs_collection.update_one(
+        {'job_id': job_id},
+        {'$set': {
+            'status': 'failed',
+            'error': error_msg,
+            'error_type': error_type,
+            'updated_at': datetime.utcnow()
+        }, '$unset': {'active': ''}}
+    )
+    publish_job_completion(job_id, 'failed', error_msg)
+
+def ensure_checkpoint_indexes():
+    """
+    Creates the expiry and lookup indexes for chunk plans and checkpoints.
+    """
+    chunk_plans_collection.create_index('created_at', expireAfterSeconds=CHUNK_CHECKPOINT_TTL)
+    chunk_checkpoints_collection.create_index('created_at', expireAfterSeconds=CHUNK_CHECKPOINT_TTL)
+    chunk_checkpoints_collection.create_index('video_id')
+
+# Checkpoints are written off the transcription threads and the engine loop
+checkpoint_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="chunk-checkpoint")
+
+class ChunkCheckpoints:
+    """
+    Completed chunk results of a video, persisted as each chunk finishes and
+    keyed by the chunk's boundaries and upload format, so a retry of the
+    same plan can reuse them. Results of chunks still in flight when the
+    job fails are saved too.
+    """
+    def __init__(self, video_id: str, job_id: str):
+        self.video_id = video_id
+        self.job_id = job_id
+        self.results: Dict[str, Dict[str, Any]] = {}
+        # Once cleared, saves still queued must not re-create checkpoints
+        self.cleared = False
+        self.lock = threading.Lock()
+        try:
+            for doc in chunk_checkpoints_collection.find({'video_id': video_id}):
+                self.results[doc['_id']] = doc['result']
+        except Exception as e:
+            logging.error(f"Error loading chunk checkpoints for video {video_id}: {e}")
+        if self.results:
+            logging.info(f"Loaded {len(self.results)} chunk checkpoints for video {video_id}")
+
+    def key(self, chunk_info: Dict[str, Any]) -> Optional[str]:
+        if chunk_info.get("start_offset") is None or not chunk_info.get("duration"):
+            return None
+        start_ms = round(chunk_info["start_offset"] * 1000)
+        end_ms = round((chunk_info["start_offset"] + chunk_info["duration"]) * 1000)
+        return f"{self.video_id}:{AUDIO_TRANSCODE}:{start_ms}-{end_ms}"
+
+    def get(self, chunk_info: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        key = self.key(chunk_info)
+        result = self.results.get(key) if key else None
+        if result is None:
+            return None
+        return {**result, "chunk_index": chunk_info["chunk_index"]}
+
+    def _save(self, key: str, result: Dict[str, Any]):
+        with self.lock:
+            if self.cleared:
+                return
+            try:
+                chunk_checkpoints_collection.replace_one(
+                    {'_id': key},
+                    {'video_id': self.video_id, 'job_id': self.job_id, 'result': result, 'created_at': datetime.utcnow()},
+                    upsert=True
+                )
+            except Exception as e:
+                logging.error(f"Error saving chunk checkpoint {key}: {e}")
+
+    def save_when_done(self, chunk_info: Dict[str, Any], future: Future):
+        key = self.key(chunk_info)
+        if not key:
+            return
+
+        def on_done(done: Future):
+            if done.cancelled() or done.exception() is not None or not done.result():
+                return
+            result = done.result()
+            self.results[key] = result
+            checkpoint_executor.submit(self._save, key, result)
+        future.add_done_callback(on_done)
+
+    def clear(self):
+        """
+        Drops the video's plan and checkpoints once its transcript is saved.
+        Saves still queued or in progress are dropped or waited for.
+        """
+        with self.lock:
+            self.cleared = True
+        try:
+            chunk_checkpoints_collection.delete_many({'video_id': self.video_id})
+            chunk_plans_collection.delete_one({'_id': self.video_id})
+        except Exception as e:
+            logging.error(f"Error clearing chunk checkpoints for video {self.video_id}: {e}")
+
+def load_chunk_plan(video_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Returns the chunk plan recorded by an earlier attempt at this video, if
+    it was made for the current upload format.
+    """
+    try:
+        plan = chunk_plans_collection.find_one({'_id': video_id})
+    except Exception as e:
+        logging.error(f"Error loading chunk plan for video {video_id}: {e}")
+        return None
+    if plan and plan.get('transcode') == AUDIO_TRANSCODE:
+        return plan
+    return None
+
+def save_chunk_plan(video_id: str, video_title: Optional[str], **plan):
+    """
+    Records how the video was split (`chunks` spans, or `segment_duration`
+    for the streaming segmenter) so a retry cuts the same chunks.
+    """
+    try:
+        chunk_plans_collection.replace_one(
+            {'_id': video_id},
+            {'video_title': video_title, 'transcode': AUDIO_TRANSCODE, 'created_at': datetime.utcnow(), **plan},
+            upsert=True
+        )
+    except Exception as e:
+        logging.error(f"Error saving chunk plan for video {video_id}: {e}")
+
+def _collect_chunk_results(chunks: Iterable[Dict[str, Any]], submit: Callable[[Dict[str, Any]], Future],
+                           on_chunk_done: Optional[Callable[[int, int], None]] = None,
+                           checkpoints: Optional[ChunkCheckpoints] = None) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Submits each chunk as soon as it is produced and gathers the results,
+    raising the first chunk failure without waiting for the remaining chunks.
+    On failure the chunk generator is closed, which stops the download and
+    segmentation, and chunks that have not started yet are cancelled.
+    Chunks with a checkpoint are not submitted again.
+    on_chunk_done, if given, is called with (chunks done, chunks submitted).
+    """
+    transcription_results = []
+    total_chunks = 0
+    futures = set()
+
+    def collect(future):
+        result = future.result()
+        if result:
+            transcription_results.append(result)
+        if on_chunk_done:
+            on_chunk_done(len(transcription_results), total_chunks)
+
+    try:
+        for chunk_info in chunks:
+            if "duration" not in chunk_info:
+                chunk_info["duration"] = get_audio_duration(chunk_info["chunk_path"])
+            total_chunks += 1
+            checkpointed = checkpoints.get(chunk_info) if checkpoints else None
+            if checkpointed:
+                transcription_results.append(checkpointed)
+                if on_chunk_done:
+                    on_chunk_done(len(transcription_results), total_chunks)
+                continue
+            future = submit(chunk_info)
+            if checkpoints:
+                checkpoints.save_when_done(chunk_info, future)
+            futures.add(future)
+
+            # Surface failures early instead of after the whole download
+            for future in [f for f in futures if f.done()]:
+                futures.discard(future)
+                collect(future)
+
+        for future in as_completed(futures):
+            collect(future)
+    except BaseException:
+        close_chunks = getattr(chunks, 'close', None)
+        if close_chunks:
+            close_chunks()
+        raise
+    return transcription_results, total_chunks
+
+def plan_chunk_target(duration: float, file_size: Optional[int]) -> float:
+    """
+    Returns the chunk duration for `duration` seconds of audio. With
+    ADAPTIVE_CHUNKING the audio is spread over the keys that are free right
+    now, trading per-request overhead against parallelism using measured
+    latencies; otherwise chunks are CHUNK_TARGET_DURATION long. Either way
+    chunks stay under the upload limit.
+    """
+    max_chunk_duration = CHUNK_TARGET_DURATION
+    if file_size and duration > 0:
+        max_chunk_duration = min(max_chunk_duration, max_chunk_duration_for(file_size, duration))
+    if not ADAPTIVE_CHUNKING or duration <= 0:
+        return max_chunk_duration
+
+    free_keys, free_requests = api_key_manager.free_capacity()
+    requests_per_key = PER_KEY_CONCURRENCY if TRANSCRIPTION_ENGINE == "async" else 1
+    parallel_slots = max(1, free_keys) * requests_per_key
+    target = plan_chunk_duration(
+        duration,
+        parallel_slots,
+        chunk_latency_model,
+        max_chunk_duration=max_chunk_duration,
+        min_chunk_duration=min(MIN_CHUNK_DURATION, max_chunk_duration),
+        max_requests=free_requests or None
+    )
+    logging.info(
+        f"Planned {target:.0f}s chunks for {duration:.0f}s of audio "
+        f"({free_keys} free keys, {parallel_slots} parallel slots)"
+    )
+    return target
+
+def transcribe_chunks(chunks: Iterable[Dict[str, Any]],
+                      on_chunk_done: Optional[Callable[[int, int], None]] = None,
+                      checkpoints: Optional[ChunkCheckpoints] = None) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Transcribes chunks on the configured engine. `chunks` may be a list or a
+    generator that is still downloading and segmenting, in which case the
+    first API calls overlap with the rest of the download.
+    Returns the results and the number of chunks submitted.
+    """
+    if TRANSCRIPTION_ENGINE == "async":
+        return _collect_chunk_results(chunks, get_async_engine().submit, on_chunk_done, checkpoints)
+
+    executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+    try:
+        results = _collect_chunk_results(
+            chunks,
+            lambda chunk_info: executor.submit(transcribe_audio_chunk, chunk_info),
+            on_chunk_done,
+            checkpoints
+        )
+    except BaseException:
+        # Fail now: queued chunks are dropped and requests already sent
+        # finish in the background, where their checkpoints are still saved
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    executor.shutdown()
+    return results
+
 def process_transcription(video_id: str, job_id: str):
     overall_start_time = time.time()
     logging.info(f"Starting transcription process for video {video_id} (Job ID: {job_id})")
@@ -178,184 +635,177 @@ def process_transcription(video_id: str, job_id: str):
         {'$set': {'status': 'processing', 'updated_at': datetime.utcnow()}}
     )
     logging.info("Job status updated to 'processing'")
+    progress = JobProgress(job_id)
+    progress.update('downloading')
 
     # Create a temporary directory for audio files
     temp_dir = tempfile.mkdtemp(prefix="transcription_temp_")
     logging.info(f"Created temporary directory: {temp_dir}")
 
+    cached_audio = None
     try:
-        # Step 1: Download YouTube Audio
-        logging.info("Step 1: Downloading YouTube audio...")
-        download_result = download_youtube_audio(video_id, temp_dir)
-        if not download_result:
-            error_msg = "Failed to download audio from YouTube"
-            logging.error(error_msg)
-            jobs_collection.update_one(
-                {'job_id': job_id},
-                {'$set': {
-                    'status': 'failed',
-                    'error': error_msg,
-                    'error_type': 'DOWNLOAD_ERROR',
-                    'updated_at': datetime.utcnow()
-                }}
-            )
-            return
+        chunks = None
+        video_title = None
+        # Resume from an earlier attempt at this video when there is one
+        checkpoints = ChunkCheckpoints(video_id, job_id)
+        chunk_plan = load_chunk_plan(video_id)
+
+        # Pipelined mode: segment the audio while it downloads
+        if PIPELINED_TRANSCRIPTION:
+            logging.info("Step 1: Streaming YouTube audio into the segmenter...")
+            try:
+                resolved = resolve_youtube_audio(video_id)
+            except Exception as e:
+                mark_job_failed(job_id, f"Failed to download audio from YouTube: {str(e)}", 'DOWNLOAD_ERROR')
+                return
+            if resolved and resolved["audio_stream"]:
+                video_title = resolved["video_title"]
+                if chunk_plan and chunk_plan.get("segment_duration"):
+                    segment_duration = chunk_plan["segment_duration"]
+                else:
+                    segment_duration = plan_chunk_target(resolved["yt"].length or 0, resolved["audio_stream"].filesize)
+                    save_chunk_plan(video_id, video_title, segment_duration=segment_duration)
+                chunks = stream_audio_segments(
+                    resolved["audio_stream"],
+                    temp_dir,
+                    segment_duration=segment_duration,
+                    on_progress=progress.download_progress
+                )
+            else:
+                logging.info("No streamable audio-only source, falling back to sequential download")
+
+        if chunks is None and chunk_plan and chunk_plan.get("chunks") \
+                and all(checkpoints.get(chunk) for chunk in chunk_plan["chunks"]):
+            # Every chunk of the earlier plan is done, so the audio is not needed
+            logging.info(f"All {len(chunk_plan['chunks'])} chunks checkpointed, skipping download")
+            video_title = chunk_plan.get("video_title") or video_id
+            chunks = chunk_plan["chunks"]
+
+        if chunks is None:
+            # Step 1: Download YouTube Audio, unless an earlier job left it in the audio cache
+            cached_audio = audio_cache.acquire(video_id)
+            if cached_audio:
+                audio_file_path = cached_audio.audio_path
+                video_title = cached_audio.video_title or video_id
+                progress.download_progress(100.0)
+            else:
+                logging.info("Step 1: Downloading YouTube audio...")
+                with STAGE_DURATION.labels('download').time():
+                    download_result = download_youtube_audio(video_id, temp_dir, on_progress=progress.download_progress)
+                if not download_result:
+                    mark_job_failed(job_id, "Failed to download audio from YouTube", 'DOWNLOAD_ERROR')
+                    return
 
-        audio_file_path = download_result["audio_file_path"]
-        video_title = download_result["video_title"]
-        logging.info(f"Successfully downloaded audio: {audio_file_path}")
-        logging.info(f"Video title: {video_title}")
-
-        # Step 2: Check File Size and Chunk if Necessary
-        chunks = chunk_audio_file(audio_file_path, temp_dir)
-        if not chunks:
-            error_msg = "Failed to process audio file - file may be corrupted or in an unsupported format"
-            logging.error(error_msg)
-            jobs_collection.update_one(
-                {'job_id': job_id},
-                {'$set': {
-                    'status': 'failed',
-                    'error': error_msg,
-                    'error_type': 'AUDIO_PROCESSING_ERROR',
-                    'updated_at': datetime.utcnow()
-                }}
-            )
+                audio_file_path = download_result["audio_file_path"]
+                video_title = download_result["video_title"]
+                logging.info(f"Successfully downloaded audio: {audio_file_path}")
+                logging.info(f"Video title: {video_title}")
+                cached_audio = audio_cache.store(video_id, download_result.get("itag"), video_title, audio_file_path)
+                if cached_audio:
+                    audio_file_path = cached_audio.audio_path
+                elif not os.path.exists(audio_file_path):
+                    mark_job_failed(job_id, "Downloaded audio was lost while caching it", 'DOWNLOAD_ERROR')
+                    return
+            # Chunks are cut next to cached audio so later jobs can reuse them too
+            chunk_dir = cached_audio.directory if cached_audio else temp_dir
+
+            # Step 2: Size chunks for the available parallelism, reusing an
+            # earlier attempt's plan, and cut only the chunks still missing
+            chunking_started = time.monotonic()
+            if chunk_plan and chunk_plan.get("chunks"):
+                chunks = [dict(chunk) for chunk in chunk_plan["chunks"]]
+                logging.info(f"Reusing chunk plan of {len(chunks)} chunks from an earlier attempt")
+            else:
+                audio_duration = get_audio_duration(audio_file_path)
+                chunk_target = plan_chunk_target(audio_duration, os.path.getsize(audio_file_path))
+                chunks = plan_audio_chunks(audio_file_path, target_duration=chunk_target, duration=audio_duration)
+                if chunks and not chunks[0].get("chunk_path"):
+                    save_chunk_plan(video_id, video_title, chunks=chunks)
+            missing_chunks = [chunk for chunk in chunks or [] if not checkpoints.get(chunk)]
+            chunks_extracted = bool(chunks) and extract_audio_chunks(audio_file_path, chunk_dir, missing_chunks)
+            STAGE_DURATION.labels('chunking').observe(time.monotonic() - chunking_started)
+            if not chunks_extracted:
+                mark_job_failed(
+                    job_id,
+                    "Failed to process audio file - file may be corrupted or in an unsupported format",
+                    'AUDIO_PROCESSING_ERROR'
+                )
+                return
+
+        # Steps 3 & 4: Assign API Keys and Transcribe Chunks as they become available
+        try:
+            with STAGE_DURATION.labels('transcription').time():
+                transcription_results, total_chunks = transcribe_chunks(
+                    chunks,
+                    on_chunk_done=progress.chunk_progress,
+                    checkpoints=checkpoints
+                )
+        except AudioStreamError as e:
+            mark_job_failed(job_id, f"Failed to stream audio from YouTube: {str(e)}", 'DOWNLOAD_ERROR')
+            return
+        except Exception as e:
+            mark_job_failed(job_id, f"Transcription failed: {str(e)}", 'TRANSCRIPTION_API_ERROR')
             return
 
-        total_chunks = len(chunks)
         if total_chunks == 0:
-            error_msg = "No valid audio chunks to process"
-            logging.error(error_msg)
-            jobs_collection.update_one(
-                {'job_id': job_id},
-                {'$set': {
-                    'status': 'failed',
-                    'error': error_msg,
-                    'error_type': 'AUDIO_PROCESSING_ERROR',
-                    'updated_at': datetime.utcnow()
-                }}
-            )
+            mark_job_failed(job_id, "No valid audio chunks to process", 'AUDIO_PROCESSING_ERROR')
             return
 
-        # Step 3: Assign API Keys to Chunks
-        api_keys_assigned = rotate_api_keys(total_chunks)
-        for i, chunk in enumerate(chunks):
-            chunk["api_key"] = api_keys_assigned[i]
-
-        # Step 4: Transcribe All Chunks
-        transcription_results = []
-        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-            future_to_chunk = {executor.submit(transcribe_audio_chunk, chunk_info): chunk_info for chunk_info in chunks}
-            for future in as_completed(future_to_chunk):
-                try:
-                    result = future.result()
-                    if result:
-                        transcription_results.append(result)
-                except Exception as e:
-                    error_msg = f"Transcription failed: {str(e)}"
-                    logging.error(error_msg)
-                    jobs_collection.update_one(
-                        {'job_id': job_id},
-                        {'$set': {
-                            'status': 'failed',
-                            'error': error_msg,
-                            'error_type': 'TRANSCRIPTION_API_ERROR',
-                            'updated_at': datetime.utcnow()
-                        }}
-                    )
-                    return
-
         if len(transcription_results) != total_chunks:
-            error_msg = f"Incomplete transcription: Expected {total_chunks} chunks, got {len(transcription_results)}"
-            logging.error(error_msg)
-            jobs_collection.update_one(
-                {'job_id': job_id},
-                {'$set': {
-                    'status': 'failed',
-                    'error': error_msg,
-                    'error_type': 'INCOMPLETE_TRANSCRIPTION',
-                    'updated_at': datetime.utcnow()
-                }}
+            mark_job_failed(
+                job_id,
+                f"Incomplete transcription: Expected {total_chunks} chunks, got {len(transcription_results)}",
+                'INCOMPLETE_TRANSCRIPTION'
             )
             return
 
         # Step 5: Merge Transcriptions
-        complete_transcript = merge_transcriptions(transcription_results)
+        progress.update('merging')
+        with STAGE_DURATION.labels('merge').time():
+            complete_transcript = merge_transcriptions(transcription_results)
         
         # Validate merged transcription
         if not complete_transcript or not complete_transcript.get('text', '').strip():
-            error_msg = "Generated transcript is empty"
-            logging.error(error_msg)
-            jobs_collection.update_one(
-                {'job_id': job_id},
-                {'$set': {
-                    'status': 'failed',
-                    'error': error_msg,
-                    'error_type': 'EMPTY_TRANSCRIPTION',
-                    'updated_at': datetime.utcnow()
-                }}
-            )
+            mark_job_failed(job_id, "Generated transcript is empty", 'EMPTY_TRANSCRIPTION')
             return
 
         # Step 6: Save Transcription to MongoDB
+        progress.update('saving')
         transcription_doc = Transcription(
             id=video_id,  # Sets _id via alias
             video_title=video_title,
-            transcription=complete_transcript,
-            transcription_raw=complete_transcript['text'],
+            **encode_transcript(complete_transcript, include_scores=STORE_SEGMENT_SCORES),
             created_at=datetime.utcnow()
         ).dict(by_alias=True)  # Ensures _id is set correctly
 
         try:
-            transcriptions_collection.insert_one(transcription_doc)
+            with STAGE_DURATION.labels('mongo_write').time():
+                transcriptions_collection.insert_one(transcription_doc)
             logging.info(f"Transcription for video_id {video_id} inserted successfully.")
+            checkpoints.clear()
         except DuplicateKeyError:
-            error_msg = f"Transcription for video_id {video_id} already exists"
-            logging.error(error_msg)
-            jobs_collection.update_one(
-                {'job_id': job_id},
-                {'$set': {
-                    'status': 'failed',
-                    'error': error_msg,
-                    'error_type': 'DUPLICATE_TRANSCRIPTION',
-                    'updated_at': datetime.utcnow()
-                }}
-            )
+            mark_job_failed(job_id, f"Transcription for video_id {video_id} already exists", 'DUPLICATE_TRANSCRIPTION')
             return
         except Exception as e:
-            error_msg = f"Database error while saving transcription: {str(e)}"
-            logging.error(error_msg)
-            jobs_collection.update_one(
-                {'job_id': job_id},
-                {'$set': {
-                    'status': 'failed',
-                    'error': error_msg,
-                    'error_type': 'DATABASE_ERROR',
-                    'updated_at': datetime.utcnow()
-                }}
-            )
+            mark_job_failed(job_id, f"Database error while saving transcription: {str(e)}", 'DATABASE_ERROR')
             return
 
         # Update job status to 'success'
         jobs_collection.update_one(
             {'job_id': job_id},
-            {'$set': {'status': 'success', 'updated_at': datetime.utcnow()}}
+            {'$set': {'status': 'success', 'updated_at': datetime.utcnow()}, '$unset': {'active': ''}}
         )
+        JOBS_FINISHED.labels('success').inc()
+        publish_job_completion(job_id, 'success')
 
     except Exception as e:
-        error_msg = f"Unexpected error during transcription: {str(e)}"
-        logging.error(error_msg)
-        jobs_collection.update_one(
-            {'job_id': job_id},
-            {'$set': {
-                'status': 'failed',
-                'error': error_msg,
-                'error_type': 'UNEXPECTED_ERROR',
-                'updated_at': datetime.utcnow()
-            }}
-        )
+        mark_job_failed(job_id, f"Unexpected error during transcription: {str(e)}", 'UNEXPECTED_ERROR')
 
     finally:
+        # Let the cached audio be evicted again
+        if cached_audio:
+            cached_audio.release()
+
         # Cleanup Temporary Files
         try:
             shutil.rmtree(temp_dir)
@@ -365,4 +815,5 @@ def process_transcription(video_id: str, job_id: str):
         # Calculate and log overall duration
         overall_end_time = time.time()
         overall_duration = overall_end_time - overall_start_time
+        STAGE_DURATION.labels('total').observe(overall_duration)
         logging.info(f"Total processing time: {overall_duration:.2f} seconds")
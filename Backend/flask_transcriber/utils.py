@@ -2,12 +2,80 @@
 import re
 import os
 from pytubefix import YouTube
+from pytubefix.exceptions import BotDetection, PoTokenRequired
 import logging
 import shutil
 import tempfile
 import subprocess
-from typing import Optional, Dict, Any
+import requests
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, Iterator, Callable, List, Tuple
 from pathlib import Path
+from urllib.parse import urlparse
+from flask_transcriber.ranged_download import download_with_fallback
+from flask_transcriber.metrics import STAGE_DURATION
+
+# Chunking of downloaded audio: cuts are placed in silences near every
+# target duration (at most CHUNK_TARGET_DURATION seconds), and consecutive
+# chunks share CHUNK_OVERLAP seconds
+CHUNK_TARGET_DURATION = float(os.getenv("CHUNK_TARGET_DURATION", "600"))  # seconds
+CHUNK_OVERLAP = float(os.getenv("CHUNK_OVERLAP", "0"))  # seconds
+SILENCE_SEARCH_WINDOW = 30  # seconds before each target cut searched for a silence
+SILENCE_NOISE_DB = -35  # dB below which audio counts as silence
+SILENCE_MIN_DURATION = 0.3  # seconds
+# Transcription API upload limit; chunks are kept below CHUNK_SIZE_HEADROOM of it
+# to allow for bitrate variation
+MAX_UPLOAD_SIZE = 25 * 1024 * 1024  # bytes
+CHUNK_SIZE_HEADROOM = 0.9
+# FFmpeg processes cutting (and re-encoding) chunks at once
+CHUNK_EXTRACT_WORKERS = os.cpu_count() or 4
+
+# Optional re-encoding of chunks before upload: "opus" or "flac" at 16 kHz mono
+# (the rate Whisper resamples to anyway), or "none" to upload the source audio as is
+AUDIO_TRANSCODE = os.getenv("AUDIO_TRANSCODE", "none").lower()
+TRANSCODE_SAMPLE_RATE = 16000  # Hz
+OPUS_BITRATE_KBPS = int(os.getenv("OPUS_BITRATE_KBPS", "24"))
+TRANSCODE_FORMATS = {
+    "opus": {
+        "extension": "ogg",
+        "codec_args": ["-c:a", "libopus", "-b:a", f"{OPUS_BITRATE_KBPS}k", "-application", "voip"],
+        # Container overhead on top of the nominal bitrate
+        "bytes_per_second": OPUS_BITRATE_KBPS * 1000 / 8 * 1.1
+    },
+    "flac": {
+        "extension": "flac",
+        "codec_args": ["-c:a", "flac", "-sample_fmt", "s16"],
+        # Worst case is uncompressed 16-bit mono
+        "bytes_per_second": TRANSCODE_SAMPLE_RATE * 2
+    }
+}
+# Audio streams are picked as the lowest bitrate at or above this, since
+# Whisper gains nothing from more
+PREFERRED_AUDIO_BITRATE_KBPS = int(os.getenv("PREFERRED_AUDIO_BITRATE_KBPS", "48"))
+
+# Fetch audio from this URL, with {video_id} substituted, instead of YouTube.
+# Meant for benchmarks and local testing against a stand-in audio server.
+AUDIO_SOURCE_URL = os.getenv("AUDIO_SOURCE_URL")
+
+# Download audio streams over several concurrent byte-range connections
+RANGED_DOWNLOAD = os.getenv("RANGED_DOWNLOAD", "true").lower() == "true"
+
+# Length of each segment produced while the download is still in progress
+STREAM_SEGMENT_DURATION = 600  # seconds
+SEGMENT_LIST_POLL_INTERVAL = 0.5  # seconds
+
+# YouTube PO token caching
+YOUTUBE_TOKEN_TTL = int(os.getenv("YOUTUBE_TOKEN_TTL", "21600"))  # seconds
+YOUTUBE_TOKEN_REFRESH_MARGIN = int(os.getenv("YOUTUBE_TOKEN_REFRESH_MARGIN", "600"))  # seconds
+YOUTUBE_TOKEN_WAIT_TIMEOUT = 120  # seconds
+YOUTUBE_TOKEN_RETRY_DELAY = 5  # seconds
+
+class AudioStreamError(Exception):
+    """
+    Raised when streaming or segmenting the audio fails mid-download.
+    """
 
 def sanitize_filename(name: str) -> str:
     """
@@ -18,7 +86,56 @@ def sanitize_filename(name: str) -> str:
     sanitized = re.sub(r'\s+', '_', sanitized)
     return sanitized
 
-def get_youtube_tokens() -> Optional[Dict[str, str]]:
+def get_audio_duration(audio_file_path: str) -> float:
+    """
+    Returns the duration of an audio file in seconds using ffprobe, or 0.0 if
+    it cannot be determined.
+    """
+    ffprobe_path = shutil.which('ffprobe') or '/usr/bin/ffprobe'
+    command = [
+        ffprobe_path,
+        "-v", "error",
+        "-show_entries", "format=duration",
+        "-of", "default=noprint_wrappers=1:nokey=1",
+        audio_file_path
+    ]
+    try:
+        result = subprocess.run(command, check=True, capture_output=True, text=True)
+        return float(result.stdout.strip())
+    except (subprocess.CalledProcessError, FileNotFoundError, ValueError) as e:
+        logging.warning(f"Could not determine duration of {audio_file_path}: {e}")
+        return 0.0
+
+token_generator_ready = False
+
+def _ensure_token_generator(repo_path: Path):
+    """
+    Clones and installs the Node.js token generator once per process.
+    """
+    global token_generator_ready
+    if token_generator_ready:
+        return
+
+    # Clone repository if it doesn't exist
+    if not repo_path.exists():
+        logging.info("Cloning token generator repository...")
+        subprocess.run(
+            ['git', 'clone', 'https://github.com/YunzheZJU/youtube-po-token-generator.git'],
+            check=True,
+            capture_output=True
+        )
+        logging.info("Installing Node.js dependencies...")
+        subprocess.run(
+            ['npm', 'install'],
+            cwd=repo_path,
+            check=True,
+            capture_output=True
+        )
+    else:
+        logging.info("Token generator already installed")
+    token_generator_ready = True
+
+def generate_youtube_tokens() -> Optional[Dict[str, str]]:
     """
     Get authorization tokens using Node.js token generator.
     Returns a dictionary with visitor_data and po_token or None if failed.
@@ -27,24 +144,7 @@ def get_youtube_tokens() -> Optional[Dict[str, str]]:
     
     try:
         repo_path = Path('youtube-po-token-generator')
-        
-        # Clone repository if it doesn't exist
-        if not repo_path.exists():
-            logging.info("Cloning token generator repository...")
-            subprocess.run(
-                ['git', 'clone', 'https://github.com/YunzheZJU/youtube-po-token-generator.git'],
-                check=True,
-                capture_output=True
-            )
-            logging.info("Installing Node.js dependencies...")
-            subprocess.run(
-                ['npm', 'install'],
-                cwd=repo_path,
-                check=True,
-                capture_output=True
-            )
-        else:
-            logging.info("Token generator already installed")
+        _ensure_token_generator(repo_path)
 
         # Generate fresh tokens
         logging.info("Generating fresh tokens...")
@@ -82,23 +182,110 @@ def get_youtube_tokens() -> Optional[Dict[str, str]]:
         logging.error(f"Error in token generation: {str(e)}")
         return None
 
-def download_youtube_audio(video_id: str, download_dir: str) -> Optional[Dict[str, Any]]:
+class YouTubeTokenProvider:
     """
-    Downloads audio from YouTube. First tries to get audio stream directly,
-    falls back to downloading video and extracting audio if necessary.
+    Caches visitorData/poToken for YOUTUBE_TOKEN_TTL seconds and refreshes
+    them on a background thread shortly before they expire, so concurrent
+    downloads share one token pair instead of each spawning Node. Tokens are
+    only regenerated early when a download reports them as rejected.
+    """
+    def __init__(self, ttl: int = YOUTUBE_TOKEN_TTL, refresh_margin: int = YOUTUBE_TOKEN_REFRESH_MARGIN):
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self.tokens: Optional[Dict[str, str]] = None
+        self.expires_at = 0.0
+        self.condition = threading.Condition()
+        self.refresh_thread: Optional[threading.Thread] = None
+
+    def _is_valid(self) -> bool:
+        return self.tokens is not None and time.time() < self.expires_at
+
+    def start(self):
+        """
+        Starts the background refresher; tokens are generated immediately.
+        """
+        with self.condition:
+            if self.refresh_thread is None:
+                self.refresh_thread = threading.Thread(target=self._refresh_loop, name="youtube-token-refresh", daemon=True)
+                self.refresh_thread.start()
+
+    def _refresh_loop(self):
+        failures = 0
+        while True:
+            # Sleep until the current tokens are about to expire or are invalidated
+            with self.condition:
+                while self.tokens is not None:
+                    delay = self.expires_at - self.refresh_margin - time.time()
+                    if delay <= 0:
+                        break
+                    self.condition.wait(delay)
+
+            with STAGE_DURATION.labels('token_generation').time():
+                tokens = generate_youtube_tokens()
+            with self.condition:
+                if tokens:
+                    self.tokens = tokens
+                    self.expires_at = time.time() + self.ttl
+                    self.condition.notify_all()
+            if tokens:
+                failures = 0
+            else:
+                failures += 1
+                time.sleep(min(YOUTUBE_TOKEN_RETRY_DELAY * 2 ** (failures - 1), self.refresh_margin))
+
+    def get_tokens(self, timeout: float = YOUTUBE_TOKEN_WAIT_TIMEOUT) -> Optional[Dict[str, str]]:
+        """
+        Returns the cached tokens, waiting up to `timeout` seconds only when
+        no valid tokens exist yet.
+        """
+        self.start()
+        with self.condition:
+            if not self._is_valid():
+                self.condition.notify_all()
+                self.condition.wait_for(self._is_valid, timeout=timeout)
+            return dict(self.tokens) if self._is_valid() else None
+
+    def invalidate(self, tokens: Dict[str, str]):
+        """
+        Discards `tokens` after YouTube rejected them and triggers a refresh.
+        Ignored if the tokens were already replaced by a newer pair.
+        """
+        with self.condition:
+            if self.tokens == tokens:
+                logging.warning("YouTube rejected the cached tokens, regenerating")
+                self.tokens = None
+                self.expires_at = 0.0
+                self.condition.notify_all()
+
+youtube_token_provider = YouTubeTokenProvider()
+
+def get_youtube_tokens() -> Optional[Dict[str, str]]:
+    """
+    Returns cached YouTube authorization tokens from the shared provider.
+    """
+    return youtube_token_provider.get_tokens()
+
+def _abr_kbps(stream) -> int:
+    """
+    Parses a stream's bitrate label such as "128kbps"; unknown is 0.
     """
+    match = re.match(r"(\d+)", stream.abr or "")
+    return int(match.group(1)) if match else 0
+
+def resolve_youtube_audio(video_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Authorizes against YouTube and resolves the video's title and its best
+    audio-only stream without downloading anything. The returned audio_stream
+    is None when the video only offers combined audio/video streams.
+    """
+    if AUDIO_SOURCE_URL:
+        # Plain files cannot be streamed into the segmenter
+        return None
+
     video_url = f"https://www.youtube.com/watch?v={video_id}"
-    logging.info(f"Starting download process for video ID: {video_id}")
-    
-    try:
-        # Check if ffmpeg is installed (needed for both paths)
-        try:
-            subprocess.run(['ffmpeg', '-version'], capture_output=True, check=True)
-            logging.info("FFmpeg is installed")
-        except (subprocess.CalledProcessError, FileNotFoundError):
-            logging.error("FFmpeg not found. Please install FFmpeg first.")
-            return None
 
+    yt = None
+    for attempt in range(2):
         # Get authorization tokens
         tokens = get_youtube_tokens()
         if not tokens:
@@ -113,22 +300,80 @@ def download_youtube_audio(video_id: str, download_dir: str) -> Optional[Dict[st
             use_po_token=True,
             po_token_verifier=lambda: (tokens['visitorData'], tokens['poToken'])
         )
-        
+
         logging.info("Checking video availability...")
-        yt.check_availability()
-        video_title = yt.title or video_id
-        logging.info(f"Video title: {video_title}")
-        
-        # Get all audio streams and find the best compatible one
-        logging.info("Attempting to find audio-only stream...")
-        audio_streams = yt.streams.filter(only_audio=True)
-        
-        # Try to find MP4/M4A audio stream with highest bitrate
-        audio_stream = None
-        for stream in audio_streams:
-            if stream.subtype in ['mp4', 'm4a']:
-                if audio_stream is None or stream.abr > audio_stream.abr:
-                    audio_stream = stream
+        try:
+            yt.check_availability()
+            break
+        except (BotDetection, PoTokenRequired):
+            # Tokens were rejected, regenerate them once and try again
+            youtube_token_provider.invalidate(tokens)
+            if attempt == 1:
+                raise
+
+    video_title = yt.title or video_id
+    logging.info(f"Video title: {video_title}")
+
+    # Get all audio streams and find the best compatible one
+    logging.info("Attempting to find audio-only stream...")
+    audio_streams = yt.streams.filter(only_audio=True)
+
+    # Prefer the lowest MP4/M4A bitrate that is still adequate, else the highest available
+    compatible = sorted(
+        (stream for stream in audio_streams if stream.subtype in ['mp4', 'm4a']),
+        key=_abr_kbps
+    )
+    adequate = [stream for stream in compatible if _abr_kbps(stream) >= PREFERRED_AUDIO_BITRATE_KBPS]
+    audio_stream = adequate[0] if adequate else (compatible[-1] if compatible else None)
+
+    return {
+        "yt": yt,
+        "video_title": video_title,
+        "audio_stream": audio_stream
+    }
+
+def download_source_audio(video_id: str, download_dir: str, on_progress: Optional[Callable[[float], None]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Downloads a video's audio from AUDIO_SOURCE_URL. Returns the same shape
+    as download_youtube_audio, titled with the video ID.
+    """
+    url = AUDIO_SOURCE_URL.format(video_id=video_id)
+    extension = os.path.splitext(urlparse(url).path)[1] or ".m4a"
+    audio_file_path = os.path.join(download_dir, f"{sanitize_filename(video_id)}{extension}")
+    try:
+        download_with_fallback(url, audio_file_path, on_progress=on_progress)
+    except (requests.RequestException, OSError) as e:
+        logging.error(f"Audio download from {url} failed: {e}")
+        return None
+    return {"audio_file_path": audio_file_path, "video_title": video_id, "itag": None}
+
+def download_youtube_audio(video_id: str, download_dir: str, on_progress: Optional[Callable[[float], None]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Downloads audio from YouTube. First tries to get audio stream directly,
+    falls back to downloading video and extracting audio if necessary.
+    on_progress, if given, is called with the download percentage.
+    """
+    logging.info(f"Starting download process for video ID: {video_id}")
+    
+    try:
+        # Check if ffmpeg is installed (needed for both paths)
+        try:
+            subprocess.run(['ffmpeg', '-version'], capture_output=True, check=True)
+            logging.info("FFmpeg is installed")
+        except (subprocess.CalledProcessError, FileNotFoundError):
+            logging.error("FFmpeg not found. Please install FFmpeg first.")
+            return None
+
+        if AUDIO_SOURCE_URL:
+            return download_source_audio(video_id, download_dir, on_progress)
+
+        resolved = resolve_youtube_audio(video_id)
+        if not resolved:
+            return None
+
+        yt = resolved["yt"]
+        video_title = resolved["video_title"]
+        audio_stream = resolved["audio_stream"]
                     
         if audio_stream:
             logging.info(f"Found compatible audio stream: {audio_stream}")
@@ -143,15 +388,30 @@ def download_youtube_audio(video_id: str, download_dir: str) -> Optional[Dict[st
                 bytes_downloaded = total_size - bytes_remaining
                 percentage = (bytes_downloaded / total_size) * 100
                 logging.info(f"Download progress: {percentage:.1f}%")
+                if on_progress:
+                    on_progress(percentage)
                 
             yt.register_on_progress_callback(progress_callback)
 
             try:
-                # Download directly to final path
-                audio_file = audio_stream.download(
-                    output_path=download_dir,
-                    filename=sanitized_title + '.' + audio_stream.subtype
-                )
+                def download_directly() -> str:
+                    # Download directly to final path
+                    return audio_stream.download(
+                        output_path=download_dir,
+                        filename=sanitized_title + '.' + audio_stream.subtype
+                    )
+
+                if RANGED_DOWNLOAD:
+                    # Parallel byte ranges, falling back to a single connection
+                    audio_file = download_with_fallback(
+                        audio_stream.url,
+                        final_audio_path,
+                        total_size=audio_stream.filesize or None,
+                        on_progress=on_progress,
+                        fallback=download_directly
+                    )
+                else:
+                    audio_file = download_directly()
                 logging.info("Audio download completed")
                 final_audio_path = audio_file
                 
@@ -214,7 +474,8 @@ def download_youtube_audio(video_id: str, download_dir: str) -> Optional[Dict[st
         return {
             "audio_file_path": final_audio_path,
             "video_title": video_title,
-            "file_size": file_size
+            "file_size": file_size,
+            "itag": audio_stream.itag if audio_stream else video_stream.itag
         }
 
     except Exception as e:
@@ -223,9 +484,97 @@ def download_youtube_audio(video_id: str, download_dir: str) -> Optional[Dict[st
         logging.error(f"Traceback: {traceback.format_exc()}")
         return None
 
-def chunk_audio_file(audio_file_path: str, temp_dir: str, max_size: int = 25 * 1024 * 1024) -> Optional[list]:
+def max_chunk_duration_for(file_size: int, duration: float, max_size: int = MAX_UPLOAD_SIZE,
+                           transcode: str = AUDIO_TRANSCODE) -> float:
+    """
+    Longest chunk, in seconds, that stays under `max_size` bytes at the
+    bitrate chunks are uploaded at: the transcoded bitrate when transcoding,
+    the file's average bitrate otherwise.
+    """
+    transcode_format = TRANSCODE_FORMATS.get(transcode)
+    bytes_per_second = transcode_format["bytes_per_second"] if transcode_format else file_size / duration
+    return max_size * CHUNK_SIZE_HEADROOM / bytes_per_second
+
+def transcode_args(transcode: str) -> List[str]:
+    """
+    FFmpeg output arguments that re-encode audio to 16 kHz mono in the given
+    format, or stream-copy it when not transcoding.
+    """
+    transcode_format = TRANSCODE_FORMATS.get(transcode)
+    if not transcode_format:
+        return ["-c", "copy"]
+    return ["-vn", "-ac", "1", "-ar", str(TRANSCODE_SAMPLE_RATE)] + transcode_format["codec_args"]
+
+def detect_silences(audio_file_path: str) -> List[Tuple[float, float]]:
     """
-    Splits the audio file into chunks if it exceeds the max_size.
+    Returns the (start, end) times of silences in the audio using FFmpeg's
+    silencedetect filter, or an empty list if detection fails.
+    """
+    ffmpeg_path = shutil.which('ffmpeg') or '/usr/bin/ffmpeg'
+    command = [
+        ffmpeg_path,
+        "-hide_banner",
+        "-nostats",
+        "-i", audio_file_path,
+        "-af", f"silencedetect=noise={SILENCE_NOISE_DB}dB:d={SILENCE_MIN_DURATION}",
+        "-f", "null",
+        "-"
+    ]
+    try:
+        result = subprocess.run(command, check=True, capture_output=True, text=True)
+    except (subprocess.CalledProcessError, FileNotFoundError) as e:
+        logging.warning(f"Silence detection failed for {audio_file_path}: {e}")
+        return []
+
+    silences = []
+    silence_start = None
+    for line in result.stderr.splitlines():
+        start_match = re.search(r"silence_start: (-?\d+(?:\.\d+)?)", line)
+        if start_match:
+            silence_start = max(0.0, float(start_match.group(1)))
+            continue
+        end_match = re.search(r"silence_end: (\d+(?:\.\d+)?)", line)
+        if end_match and silence_start is not None:
+            silences.append((silence_start, float(end_match.group(1))))
+            silence_start = None
+    return silences
+
+def plan_chunk_boundaries(duration: float, silences: List[Tuple[float, float]],
+                          target_duration: float, search_window: float = SILENCE_SEARCH_WINDOW,
+                          max_duration: Optional[float] = None) -> List[float]:
+    """
+    Returns the cut points for splitting `duration` seconds of audio into
+    chunks of about `target_duration` seconds. Each cut is placed in the
+    middle of the latest silence within `search_window` seconds before the
+    target, or exactly on the target when there is none. Since cuts land
+    early, the last chunk may run up to `search_window` seconds past the
+    target, never beyond `max_duration`, rather than leaving a short tail.
+    """
+    midpoints = sorted((start + end) / 2 for start, end in silences)
+    last_chunk_limit = target_duration + search_window
+    if max_duration is not None:
+        last_chunk_limit = max(target_duration, min(last_chunk_limit, max_duration))
+    cuts = []
+    position = 0.0
+    while duration - position > last_chunk_limit:
+        target = position + target_duration
+        candidates = [m for m in midpoints if max(position, target - search_window) < m <= target]
+        cut = candidates[-1] if candidates else target
+        cuts.append(cut)
+        position = cut
+    return cuts
+
+def plan_audio_chunks(audio_file_path: str, max_size: int = MAX_UPLOAD_SIZE,
+                      target_duration: float = CHUNK_TARGET_DURATION, overlap: float = CHUNK_OVERLAP,
+                      duration: Optional[float] = None, transcode: str = AUDIO_TRANSCODE) -> Optional[list]:
+    """
+    Plans how to split the audio file into chunks of about `target_duration`
+    seconds, cut at silences, keeping every chunk under `max_size` bytes
+    (at the transcoded bitrate when `transcode` is set). Each planned chunk
+    records its exact start offset in the source audio, its duration and how
+    many seconds at its start overlap the previous chunk. When the file can
+    be uploaded as is, the single chunk already carries its chunk_path.
+    `duration` skips probing the file when the caller already knows it.
     """
     try:
         original_size = os.path.getsize(audio_file_path)
@@ -233,34 +582,219 @@ def chunk_audio_file(audio_file_path: str, temp_dir: str, max_size: int = 25 * 1
         logging.error(f"Error getting file size for {audio_file_path}: {e}")
         return None
 
-    if original_size <= max_size:
-        logging.info("Audio file is within the size limit. Proceeding without chunking.")
-        return [{"chunk_path": audio_file_path, "chunk_index": 1}]
+    if duration is None:
+        duration = get_audio_duration(audio_file_path)
+    if duration <= 0:
+        if original_size <= max_size:
+            logging.warning("Could not determine audio duration. Proceeding without chunking.")
+            return [{"chunk_path": audio_file_path, "chunk_index": 1, "start_offset": 0.0, "duration": None}]
+        logging.error(f"Cannot chunk {audio_file_path} without knowing its duration")
+        return None
 
-    logging.info("Audio file exceeds the size limit. Chunking required.")
-    CHUNK_DURATION = 600  
+    # Keep every chunk under the upload limit whatever the target
+    max_chunk_duration = max_chunk_duration_for(original_size, duration, max_size, transcode)
+    target_duration = min(target_duration, max_chunk_duration)
+
+    if duration <= target_duration:
+        if transcode not in TRANSCODE_FORMATS and original_size <= max_size:
+            logging.info("Audio file is within the chunk limits. Proceeding without chunking.")
+            return [{"chunk_path": audio_file_path, "chunk_index": 1, "start_offset": 0.0, "duration": duration}]
+        boundaries = [0.0, duration]
+    else:
+        silences = detect_silences(audio_file_path)
+        cuts = plan_chunk_boundaries(
+            duration, silences, max(target_duration - overlap, 1.0),
+            max_duration=max(max_chunk_duration - overlap, 1.0)
+        )
+        boundaries = [0.0] + cuts + [duration]
+        logging.info(f"Splitting {duration:.0f}s of audio into {len(boundaries) - 1} chunks "
+                     f"({len(silences)} silences detected)")
+
+    chunks = []
+    for index in range(len(boundaries) - 1):
+        overlap_before = min(overlap, boundaries[index]) if index > 0 else 0.0
+        start = boundaries[index] - overlap_before
+        chunks.append({
+            "chunk_index": index + 1,
+            "start_offset": start,
+            "duration": boundaries[index + 1] - start,
+            "overlap_before": overlap_before
+        })
+    return chunks
+
+def extract_audio_chunks(audio_file_path: str, temp_dir: str, chunks: List[Dict[str, Any]],
+                         transcode: str = AUDIO_TRANSCODE) -> bool:
+    """
+    Cuts the planned chunks that have no chunk_path yet out of the audio
+    file, re-encoding them to 16 kHz mono when `transcode` is set, and sets
+    their chunk_path. Returns False if FFmpeg fails.
+    """
+    pending = [chunk for chunk in chunks if not chunk.get("chunk_path")]
+    if not pending:
+        return True
+
+    transcode_format = TRANSCODE_FORMATS.get(transcode)
     base_filename = os.path.splitext(os.path.basename(audio_file_path))[0]
-    file_extension = os.path.splitext(audio_file_path)[1].lstrip('.')
-    chunk_pattern = os.path.join(temp_dir, f"{base_filename}_chunk_%03d.{file_extension}")
-    
+    if transcode_format:
+        file_extension = transcode_format["extension"]
+        logging.info(f"Transcoding chunks to 16 kHz mono {transcode}")
+    else:
+        file_extension = os.path.splitext(audio_file_path)[1].lstrip('.')
+    ffmpeg_path = shutil.which('ffmpeg') or '/usr/bin/ffmpeg'
+    output_args = transcode_args(transcode)
+
+    def extract_chunk(chunk: Dict[str, Any]):
+        # Named by span so chunks cut by an earlier job in the same directory are reused
+        start_ms = round(chunk['start_offset'] * 1000)
+        end_ms = round((chunk['start_offset'] + chunk['duration']) * 1000)
+        chunk_name = f"{base_filename}_chunk_{start_ms}-{end_ms}"
+        chunk_path = os.path.join(temp_dir, f"{chunk_name}.{file_extension}")
+        if not os.path.exists(chunk_path):
+            partial_path = os.path.join(temp_dir, f"{chunk_name}.partial-{threading.get_ident()}.{file_extension}")
+            command = [
+                ffmpeg_path,
+                "-loglevel", "error",
+                "-ss", f"{chunk['start_offset']:.3f}",
+                "-i", audio_file_path,
+                "-t", f"{chunk['duration']:.3f}",
+                *output_args,
+                partial_path,
+                "-y"
+            ]
+            subprocess.run(command, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            os.replace(partial_path, chunk_path)
+        chunk["chunk_path"] = chunk_path
+
+    # Re-encoding is CPU bound, so chunks are cut in parallel
+    try:
+        with ThreadPoolExecutor(max_workers=CHUNK_EXTRACT_WORKERS) as executor:
+            list(executor.map(extract_chunk, pending))
+    except subprocess.CalledProcessError as e:
+        logging.error(f"Error during chunking with FFmpeg {audio_file_path}: {e.stderr.decode()}")
+        return False
+
+    if transcode_format:
+        transcoded_size = sum(os.path.getsize(chunk["chunk_path"]) for chunk in pending)
+        logging.info(f"Transcoded {len(pending)} chunks to {transcoded_size} bytes")
+    return True
+
+def chunk_audio_file(audio_file_path: str, temp_dir: str, max_size: int = MAX_UPLOAD_SIZE,
+                     target_duration: float = CHUNK_TARGET_DURATION, overlap: float = CHUNK_OVERLAP,
+                     duration: Optional[float] = None, transcode: str = AUDIO_TRANSCODE) -> Optional[list]:
+    """
+    Plans and cuts the chunks of an audio file in one go.
+    See plan_audio_chunks and extract_audio_chunks.
+    """
+    chunks = plan_audio_chunks(audio_file_path, max_size, target_duration, overlap, duration, transcode)
+    if not chunks or not extract_audio_chunks(audio_file_path, temp_dir, chunks, transcode):
+        return None
+    return chunks
+
+def _read_segment_list(segment_list_path: str) -> list:
+    """
+    Reads the CSV segment list FFmpeg appends to as it closes each segment.
+    Each row is "<filename>,<start>,<end>".
+    """
+    if not os.path.exists(segment_list_path):
+        return []
+    rows = []
+    with open(segment_list_path, "r") as f:
+        for line in f:
+            parts = line.strip().split(",")
+            if len(parts) >= 3:
+                rows.append((parts[0], float(parts[1]), float(parts[2])))
+    return rows
+
+def stream_audio_segments(audio_stream, temp_dir: str, segment_duration: float = STREAM_SEGMENT_DURATION,
+                          on_progress: Optional[Callable[[float], None]] = None,
+                          transcode: str = AUDIO_TRANSCODE) -> Iterator[Dict[str, Any]]:
+    """
+    Pipes the audio stream into FFmpeg while it downloads and yields each
+    segment as soon as FFmpeg has finished writing it, so transcription of the
+    first segments can start before the download completes. Segments are
+    re-encoded on the fly when `transcode` is set.
+    Raises AudioStreamError if the download or segmentation fails.
+    """
+    transcode_format = TRANSCODE_FORMATS.get(transcode)
+    file_extension = transcode_format["extension"] if transcode_format else audio_stream.subtype
+    chunk_pattern = os.path.join(temp_dir, f"stream_chunk_%03d.{file_extension}")
+    segment_list_path = os.path.join(temp_dir, "stream_segments.csv")
+    ffmpeg_log_path = os.path.join(temp_dir, "stream_ffmpeg.log")
+
     ffmpeg_path = shutil.which('ffmpeg') or '/usr/bin/ffmpeg'
     command = [
         ffmpeg_path,
-        "-threads", "0",
-        "-i", audio_file_path,
+        "-loglevel", "error",
+        "-i", "pipe:0",
         "-f", "segment",
-        "-segment_time", str(CHUNK_DURATION),
-        "-c", "copy",
+        "-segment_time", str(segment_duration),
+        "-segment_list", segment_list_path,
+        "-segment_list_type", "csv",
+        "-reset_timestamps", "1",
+        *transcode_args(transcode),
         chunk_pattern,
         "-y"
     ]
+
+    ffmpeg_log = open(ffmpeg_log_path, "wb")
+    process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=ffmpeg_log)
+    feed_errors = []
+
+    def feed_ffmpeg():
+        total_size = audio_stream.filesize
+        bytes_downloaded = 0
+        last_logged = -10.0
+        try:
+            for data in audio_stream.iter_chunks():
+                process.stdin.write(data)
+                bytes_downloaded += len(data)
+                if total_size:
+                    percentage = (bytes_downloaded / total_size) * 100
+                    if on_progress:
+                        on_progress(percentage)
+                    if percentage - last_logged >= 10:
+                        logging.info(f"Download progress: {percentage:.1f}%")
+                        last_logged = percentage
+        except Exception as e:
+            feed_errors.append(e)
+        finally:
+            try:
+                process.stdin.close()
+            except Exception:
+                pass
+
+    feeder = threading.Thread(target=feed_ffmpeg, daemon=True)
+    feeder.start()
+
+    emitted = 0
     try:
-        subprocess.run(command, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        chunk_files = sorted([
-            os.path.join(temp_dir, f) for f in os.listdir(temp_dir)
-            if f.startswith(f"{base_filename}_chunk_") and f.endswith(f".{file_extension}")
-        ])
-        return [{"chunk_path": path, "chunk_index": idx + 1} for idx, path in enumerate(chunk_files)]
-    except subprocess.CalledProcessError as e:
-        logging.error(f"Error during chunking with FFmpeg {audio_file_path}: {e.stderr.decode()}")
-        return None
+        while True:
+            finished = process.poll() is not None
+            rows = _read_segment_list(segment_list_path)
+            for filename, start, end in rows[emitted:]:
+                emitted += 1
+                logging.info(f"Segment {emitted} ready ({start:.1f}s - {end:.1f}s)")
+                yield {
+                    "chunk_path": os.path.join(temp_dir, filename),
+                    "chunk_index": emitted,
+                    "start_offset": start,
+                    "duration": end - start
+                }
+            if finished:
+                break
+            time.sleep(SEGMENT_LIST_POLL_INTERVAL)
+
+        feeder.join()
+        if feed_errors:
+            raise AudioStreamError(f"Audio download failed: {feed_errors[0]}")
+        if process.returncode != 0:
+            ffmpeg_log.flush()
+            with open(ffmpeg_log_path, "r", errors="replace") as f:
+                raise AudioStreamError(f"FFmpeg segmentation failed: {f.read().strip()}")
+        if emitted == 0:
+            raise AudioStreamError("FFmpeg produced no audio segments")
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        ffmpeg_log.close()
@@ -3,77 +3,440 @@ import redis
 import threading
 import time
 import json
+import os
+import socket
 import requests
 import logging
-from typing import Dict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from pymongo import MongoClient
+from dotenv import load_dotenv
+from prometheus_client import Counter, Gauge, start_http_server
+
+load_dotenv()
 
 # Configuration
-REDIS_HOST = 'localhost'
-REDIS_PORT = 6379
-REDIS_DB = 0
-MAX_CONCURRENT_TASKS = 5
+REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
+REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
+REDIS_DB = int(os.getenv("REDIS_DB", "0"))
+# Jobs this worker keeps in flight; they run on the transcriber, not here
+MAX_IN_FLIGHT_JOBS = int(os.getenv("MAX_IN_FLIGHT_JOBS", "50"))
 FLASK_ENDPOINT_URL = 'http://localhost:9696/process_transcription'
+SUBMIT_TIMEOUT = 30  # seconds
 MAX_RETRIES = 3
 RETRY_DELAY = 5  # seconds
+# Jobs that have not completed after this long stop being heartbeated and get reclaimed
+JOB_TIMEOUT = 2 * 60 * 60  # seconds
+
+# Queue configuration
+TRANSCRIPTION_STREAM = 'transcription_stream'
+CONSUMER_GROUP = 'transcription_workers'
+DEAD_LETTER_STREAM = 'transcription_dead_letter'
+CONSUMER_NAME = os.getenv("WORKER_NAME", f"{socket.gethostname()}-{os.getpid()}")
+VISIBILITY_TIMEOUT_MS = int(os.getenv("VISIBILITY_TIMEOUT_MS", str(10 * 60 * 1000)))
+HEARTBEAT_INTERVAL = 60  # seconds, must be well below the visibility timeout
+RECLAIM_INTERVAL = 30  # seconds
+IDLE_WAIT = 5  # seconds an idle worker waits for a queued job before housekeeping
+MAX_DELIVERIES = int(os.getenv("MAX_DELIVERIES", "3"))
+# Priority queue filled by the API; workers promote jobs into the stream
+# as they gain capacity, so the stream only holds jobs about to run
+JOB_QUEUE_KEY = 'transcription_queue'
+QUEUE_WAKE_KEY = 'transcription_queue_wake'
+JOB_COMPLETION_CHANNEL = 'job_completions'
+JOB_COMPLETION_KEY_PREFIX = 'job_completion:'
+
+# Prometheus metrics are served on this port
+WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", "9697"))
+
+MONGODB_URL = os.getenv("MONGODB_URL")
+DATABASE_NAME = os.getenv("DATABASE_NAME", "transcriptions")
 
 # Initialize Redis client
 redis_client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB)
 
+# Initialize MongoDB client (used to fail dead-lettered jobs)
+mongo_client = MongoClient(MONGODB_URL)
+jobs_collection = mongo_client[DATABASE_NAME]['jobs']
+
 # Configure Logging
 logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s',
     level=logging.INFO
 )
 
-def invoke_flask_endpoint(job_data: Dict[str, str]):
+# In-flight entries: entry_id -> {'job_data', 'submitted_at', 'attempts', 'retry_at', 'busy'}.
+# submitted_at is None until the transcriber accepts the job; busy marks
+# entries waiting for the transcriber to free a slot.
+in_flight: Dict[str, Dict] = {}
+job_entries: Dict[str, str] = {}  # job_id -> entry_id
+in_flight_lock = threading.Lock()
+wake_event = threading.Event()
+
+def redis_gauge(read):
+    """
+    Wraps a Redis read for Gauge.set_function so a Redis outage shows up
+    as NaN instead of failing the scrape.
+    """
+    def value():
+        try:
+            return read()
+        except redis.RedisError:
+            return float('nan')
+    return value
+
+# Metrics
+QUEUE_LENGTH = Gauge('worker_queue_length', 'Jobs waiting in the priority queue')
+QUEUE_LENGTH.set_function(redis_gauge(lambda: redis_client.zcard(JOB_QUEUE_KEY)))
+STREAM_LENGTH = Gauge('worker_stream_length', 'Promoted jobs in the transcription stream, not yet acknowledged')
+STREAM_LENGTH.set_function(redis_gauge(lambda: redis_client.xlen(TRANSCRIPTION_STREAM)))
+IN_FLIGHT_JOBS = Gauge('worker_in_flight_jobs', 'Jobs this worker has handed to the transcriber')
+IN_FLIGHT_JOBS.set_function(lambda: len(in_flight))
+JOBS_DISPATCHED = Counter('worker_jobs_dispatched_total', 'Jobs read from the stream and dispatched')
+JOBS_COMPLETED = Counter('worker_jobs_completed_total', 'Jobs acknowledged after reaching a terminal state')
+JOBS_RELEASED = Counter('worker_jobs_released_total', 'Jobs left pending for redelivery')
+ENTRIES_RECLAIMED = Counter('worker_entries_reclaimed_total', 'Stalled entries claimed from other consumers')
+SUBMISSION_FAILURES = Counter('worker_submission_failures_total', 'Submissions the transcriber did not accept')
+TRANSCRIBER_BUSY = Counter('worker_transcriber_busy_total', 'Submissions deferred because the transcriber was at capacity')
+JOB_ERRORS = Counter('worker_job_errors_total', 'Jobs failed by the worker per recorded error_type', ['error_type'])
+
+# Moves the lowest-scored queued jobs into the stream in one step, so a job
+# is never lost or duplicated between the two, and leaves a wake-up token
+# for other workers while jobs remain queued
+PROMOTE_SCRIPT = redis_client.register_script("""
+local popped = redis.call('ZPOPMIN', KEYS[1], ARGV[1])
+for i = 1, #popped, 2 do
+    local job = cjson.decode(popped[i])
+    local fields = {}
+    for field, value in pairs(job) do
+        fields[#fields + 1] = field
+        fields[#fields + 1] = value
+    end
+    redis.call('XADD', KEYS[2], '*', unpack(fields))
+end
+if redis.call('ZCARD', KEYS[1]) > 0 then
+    redis.call('LPUSH', KEYS[3], '1')
+    redis.call('LTRIM', KEYS[3], 0, 0)
+end
+return #popped / 2
+""")
+
+def promote_queued_jobs(count: int) -> int:
+    """
+    Promotes up to `count` jobs from the priority queue into the stream and
+    returns how many were moved.
+    """
+    return PROMOTE_SCRIPT(keys=[JOB_QUEUE_KEY, TRANSCRIPTION_STREAM, QUEUE_WAKE_KEY], args=[count])
+
+def retry_after(response: requests.Response) -> float:
+    try:
+        return max(1.0, float(response.headers.get('Retry-After', RETRY_DELAY)))
+    except ValueError:
+        return RETRY_DELAY
+
+def submit_job(job_data: Dict[str, str]) -> Tuple[Optional[str], float]:
+    """
+    Hands the job to the transcription service, which accepts it and returns
+    immediately. Returns (result, retry delay) where result is 'accepted', a
+    terminal status if the job had already finished, 'invalid' if the
+    service rejected the job, 'busy' if it is at capacity (retry after the
+    delay) or None when the submission failed and should be retried later.
+    """
     job_id = job_data['job_id']
-    video_id = job_data['video_id']
+    try:
+        response = requests.post(
+            FLASK_ENDPOINT_URL,
+            json={'job_id': job_id, 'video_id': job_data['video_id']},
+            timeout=SUBMIT_TIMEOUT
+        )
+    except requests.RequestException as e:
+        logging.error(f"Exception occurred while submitting job {job_id}: {e}")
+        return None, RETRY_DELAY
+
+    if response.status_code == 202:
+        return 'accepted', 0
+    if response.status_code == 200:
+        return response.json().get('status'), 0
+    if response.status_code == 400:
+        return 'invalid', 0
+    if response.status_code == 503:
+        return 'busy', retry_after(response)
+    logging.warning(f"Job {job_id} submission failed with status code {response.status_code}.")
+    return None, RETRY_DELAY
 
-    attempt = 0
-    while attempt < MAX_RETRIES:
+def complete_entry(entry_id: str):
+    """
+    Acknowledges an entry whose job reached a terminal state.
+    """
+    with in_flight_lock:
+        entry = in_flight.pop(entry_id, None)
+        if entry:
+            job_entries.pop(entry['job_data']['job_id'], None)
+    pipeline = redis_client.pipeline()
+    pipeline.xack(TRANSCRIPTION_STREAM, CONSUMER_GROUP, entry_id)
+    pipeline.xdel(TRANSCRIPTION_STREAM, entry_id)
+    pipeline.execute()
+    if entry:
+        JOBS_COMPLETED.inc()
+        logging.info(f"Job {entry['job_data']['job_id']} completed.")
+    # The transcriber has a free slot now, so retry the oldest busy entry
+    with in_flight_lock:
+        waiting = [candidate for candidate in in_flight.values() if candidate['busy']]
+        if waiting:
+            min(waiting, key=lambda candidate: candidate['retry_at'])['retry_at'] = time.time()
+    wake_event.set()
+
+def release_entry(entry_id: str):
+    """
+    Stops tracking an entry without acknowledging it, so it is redelivered
+    once the visibility timeout expires.
+    """
+    with in_flight_lock:
+        entry = in_flight.pop(entry_id, None)
+        if entry:
+            job_entries.pop(entry['job_data']['job_id'], None)
+    if entry:
+        JOBS_RELEASED.inc()
+        logging.warning(f"Job {entry['job_data']['job_id']} left pending for redelivery.")
+    wake_event.set()
+
+def completion_listener():
+    """
+    Acknowledges in-flight entries as the transcriber publishes completions.
+    """
+    while True:
         try:
-            response = requests.post(
-                FLASK_ENDPOINT_URL,
-                json={'job_id': job_id, 'video_id': video_id},
-                timeout=7200  # Adjust timeout as needed
-            )
-            if response.status_code == 200:
-                logging.info(f"Job {job_id} processed successfully.")
-                break
-            else:
-                logging.warning(f"Job {job_id} failed with status code {response.status_code}.")
-                attempt += 1
-                time.sleep(RETRY_DELAY)
-        except requests.RequestException as e:
-            logging.error(f"Exception occurred while invoking Flask endpoint for job {job_id}: {e}")
-            attempt += 1
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(JOB_COMPLETION_CHANNEL)
+            for message in pubsub.listen():
+                event = json.loads(message['data'])
+                with in_flight_lock:
+                    entry_id = job_entries.get(event.get('job_id'))
+                if entry_id:
+                    complete_entry(entry_id)
+        except redis.RedisError as e:
+            logging.error(f"Completion listener error: {e}")
             time.sleep(RETRY_DELAY)
+
+def check_completions():
+    """
+    Catches completions published while this worker was not subscribed.
+    """
+    with in_flight_lock:
+        pairs = list(job_entries.items())
+    if not pairs:
+        return
+    statuses = redis_client.mget([f"{JOB_COMPLETION_KEY_PREFIX}{job_id}" for job_id, _ in pairs])
+    for (job_id, entry_id), status in zip(pairs, statuses):
+        if status:
+            complete_entry(entry_id)
+
+def dispatch_entry(entry_id: str) -> Optional[str]:
+    """
+    Submits a tracked entry and returns the submission result. Entries the
+    transcriber is too busy for stay in flight (and keep being heartbeated)
+    until it has room, without counting as failed attempts or deliveries.
+    Entries it could not be reached for are retried and released after
+    MAX_RETRIES failed submissions.
+    """
+    with in_flight_lock:
+        entry = in_flight.get(entry_id)
+    if not entry:
+        return None
+
+    result, delay = submit_job(entry['job_data'])
+    entry['busy'] = result == 'busy'
+    if result == 'accepted':
+        entry['submitted_at'] = time.time()
+        entry['retry_at'] = None
+        logging.info(f"Submitted job {entry['job_data']['job_id']}.")
+    elif result == 'busy':
+        TRANSCRIBER_BUSY.inc()
+        entry['retry_at'] = time.time() + delay
+    elif result in ('success', 'failed'):
+        complete_entry(entry_id)
+    elif result == 'invalid':
+        dead_letter(entry_id, entry['job_data'], 1)
+        with in_flight_lock:
+            in_flight.pop(entry_id, None)
+            job_entries.pop(entry['job_data']['job_id'], None)
     else:
-        logging.error(f"Job {job_id} failed after {MAX_RETRIES} attempts.")
+        SUBMISSION_FAILURES.inc()
+        entry['attempts'] += 1
+        if entry['attempts'] >= MAX_RETRIES:
+            logging.error(f"Job {entry['job_data']['job_id']} could not be submitted after {MAX_RETRIES} attempts.")
+            release_entry(entry_id)
+        else:
+            entry['retry_at'] = time.time() + delay
+    return result
+
+def ensure_consumer_group():
+    """
+    Creates the stream and consumer group if they do not exist yet.
+    """
+    try:
+        redis_client.xgroup_create(TRANSCRIPTION_STREAM, CONSUMER_GROUP, id='0', mkstream=True)
+        logging.info(f"Created consumer group {CONSUMER_GROUP} on {TRANSCRIPTION_STREAM}.")
+    except redis.ResponseError as e:
+        if 'BUSYGROUP' not in str(e):
+            raise
+
+def decode_fields(fields: Dict[bytes, bytes]) -> Dict[str, str]:
+    return {k.decode(): v.decode() for k, v in fields.items()}
+
+def dead_letter(entry_id: str, job_data: Dict[str, str], deliveries: int):
+    """
+    Moves an entry that keeps failing to the dead-letter stream and marks its
+    job as failed so clients stop waiting on it.
+    """
+    logging.error(f"Job {job_data.get('job_id')} dead-lettered after {deliveries} deliveries.")
+    JOB_ERRORS.labels('DEAD_LETTERED').inc()
+    error_msg = f"Job failed after {deliveries} delivery attempts"
+    if job_data.get('job_id'):
+        jobs_collection.update_one(
+            {'job_id': job_data['job_id'], 'status': {'$in': ['pending', 'processing']}},
+            {'$set': {
+                'status': 'failed',
+                'error': error_msg,
+                'error_type': 'DEAD_LETTERED',
+                'updated_at': datetime.utcnow()
+            }, '$unset': {'active': ''}}
+        )
+    pipeline = redis_client.pipeline()
+    pipeline.xadd(DEAD_LETTER_STREAM, {**job_data, 'entry_id': entry_id, 'deliveries': deliveries, 'error': error_msg})
+    pipeline.xack(TRANSCRIPTION_STREAM, CONSUMER_GROUP, entry_id)
+    pipeline.xdel(TRANSCRIPTION_STREAM, entry_id)
+    pipeline.execute()
+
+def delivery_count(entry_id: str) -> int:
+    pending = redis_client.xpending_range(TRANSCRIPTION_STREAM, CONSUMER_GROUP, min=entry_id, max=entry_id, count=1)
+    return pending[0]['times_delivered'] if pending else 1
+
+def reclaim_stalled_entries(count: int) -> List:
+    """
+    Claims entries whose consumer has not touched them for longer than the
+    visibility timeout (e.g. because its worker died mid-job).
+    """
+    result = redis_client.xautoclaim(
+        TRANSCRIPTION_STREAM, CONSUMER_GROUP, CONSUMER_NAME,
+        min_idle_time=VISIBILITY_TIMEOUT_MS, start_id='0-0', count=count
+    )
+    return [entry for entry in result[1] if entry and entry[1]]
+
+def heartbeat(entry_ids: List[str]):
+    """
+    Resets the idle time of in-flight entries so they are not reclaimed while
+    this worker is still processing them.
+    """
+    if entry_ids:
+        redis_client.xclaim(
+            TRANSCRIPTION_STREAM, CONSUMER_GROUP, CONSUMER_NAME,
+            min_idle_time=0, message_ids=entry_ids, justid=True
+        )
 
 def worker_loop():
-    active_tasks = []
+    ensure_consumer_group()
+    threading.Thread(target=completion_listener, name="completion-listener", daemon=True).start()
+    last_heartbeat = time.time()
+    last_reclaim = 0.0
+
     while True:
-        # Clean up completed tasks
-        active_tasks = [t for t in active_tasks if t.is_alive()]
-
-        # If we have capacity, fetch new jobs from the queue
-        while len(active_tasks) < MAX_CONCURRENT_TASKS:
-            job_data_raw = redis_client.lpop("transcription_queue")
-            if job_data_raw:
-                job_data = json.loads(job_data_raw)
-                # Start a new thread to invoke the Flask endpoint
-                t = threading.Thread(target=invoke_flask_endpoint, args=(job_data,))
-                t.start()
-                active_tasks.append(t)
-                logging.info(f"Started processing job {job_data['job_id']}.")
-            else:
-                # No jobs in the queue
-                break
-
-        # Sleep before checking again
-        time.sleep(5)
+        try:
+            now = time.time()
+            if now - last_heartbeat >= HEARTBEAT_INTERVAL:
+                check_completions()
+                with in_flight_lock:
+                    # Entries still waiting to be accepted are kept alive too
+                    live_entries = [
+                        entry_id for entry_id, entry in in_flight.items()
+                        if entry['submitted_at'] is None or now - entry['submitted_at'] < JOB_TIMEOUT
+                    ]
+                    timed_out = [entry_id for entry_id in in_flight if entry_id not in live_entries]
+                heartbeat(live_entries)
+                for entry_id in timed_out:
+                    release_entry(entry_id)
+                last_heartbeat = now
+
+            # Retry submissions the transcriber could not take earlier, oldest
+            # first, stopping at the first one it is still too busy for
+            with in_flight_lock:
+                due = sorted(
+                    (entry['retry_at'], entry_id) for entry_id, entry in in_flight.items()
+                    if entry['retry_at'] and entry['retry_at'] <= now
+                )
+            for index, (_, entry_id) in enumerate(due):
+                if dispatch_entry(entry_id) == 'busy':
+                    with in_flight_lock:
+                        deferred_until = in_flight[entry_id]['retry_at'] if entry_id in in_flight else now + RETRY_DELAY
+                        for _, later_id in due[index + 1:]:
+                            later = in_flight.get(later_id)
+                            if later and later['busy']:
+                                later['retry_at'] = deferred_until
+                    break
+
+            with in_flight_lock:
+                # Take no new work while the transcriber is turning jobs away
+                waiting_for_capacity = any(entry['busy'] for entry in in_flight.values())
+                capacity = 0 if waiting_for_capacity else MAX_IN_FLIGHT_JOBS - len(in_flight)
+            if capacity <= 0:
+                # Wait for a job to complete instead of polling
+                wake_event.wait(timeout=RETRY_DELAY)
+                wake_event.clear()
+                continue
+
+            entries = []
+            reclaimed = False
+            if now - last_reclaim >= RECLAIM_INTERVAL:
+                entries = reclaim_stalled_entries(capacity)
+                reclaimed = bool(entries)
+                last_reclaim = now
+                ENTRIES_RECLAIMED.inc(len(entries))
+                for entry_id, _ in entries:
+                    logging.info(f"Reclaimed stalled entry {entry_id.decode()}.")
+
+            if not entries:
+                promote_queued_jobs(capacity)
+                response = redis_client.xreadgroup(
+                    CONSUMER_GROUP, CONSUMER_NAME, {TRANSCRIPTION_STREAM: '>'},
+                    count=capacity
+                )
+                entries = response[0][1] if response else []
+                if not entries:
+                    # Blocks until the API queues a job or the wait times out
+                    redis_client.blpop([QUEUE_WAKE_KEY], timeout=IDLE_WAIT)
+                    continue
+
+            # Once the transcriber turns one job away, the rest of the batch
+            # waits for a free slot instead of being submitted
+            busy_until = None
+            for raw_id, fields in entries:
+                entry_id = raw_id.decode()
+                job_data = decode_fields(fields)
+                deliveries = delivery_count(entry_id) if reclaimed else 1
+                if deliveries > MAX_DELIVERIES:
+                    dead_letter(entry_id, job_data, deliveries)
+                    continue
+
+                with in_flight_lock:
+                    in_flight[entry_id] = {
+                        'job_data': job_data,
+                        'submitted_at': None,
+                        'attempts': 0,
+                        'retry_at': busy_until,
+                        'busy': busy_until is not None
+                    }
+                    job_entries[job_data['job_id']] = entry_id
+                JOBS_DISPATCHED.inc()
+                if busy_until is not None:
+                    continue
+                logging.info(f"Dispatching job {job_data['job_id']} (delivery {deliveries}).")
+                if dispatch_entry(entry_id) == 'busy':
+                    with in_flight_lock:
+                        busy_until = in_flight[entry_id]['retry_at']
+        except redis.RedisError as e:
+            logging.error(f"Redis error in worker loop: {e}")
+            time.sleep(RETRY_DELAY)
 
 if __name__ == "__main__":
-    logging.info("Starting Redis worker...")
+    logging.info(f"Starting Redis worker {CONSUMER_NAME}...")
+    start_http_server(WORKER_METRICS_PORT)
     worker_loop()
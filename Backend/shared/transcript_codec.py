@@ -0,0 +1,94 @@
+# shared/transcript_codec.py
+import json
+import zlib
+from typing import Optional, Dict, Any, List
+
+# Documents carrying this marker store their segments in `segments_blob`
+TRANSCRIPT_FORMAT = 'compact-v1'
+# Per-segment scores from verbose_json, only stored when asked for
+SCORE_FIELDS = ('avg_logprob', 'compression_ratio', 'no_speech_prob')
+COMPRESSION_LEVEL = 9
+
+def encode_transcript(transcription: Dict[str, Any], include_scores: bool = False) -> Dict[str, Any]:
+    """
+    Packs a merged transcription into the compact storage fields: parallel
+    start/end (milliseconds) and text arrays, plus the score arrays when
+    `include_scores` is set, serialized and zlib-compressed into one blob.
+    Tokens, seek and temperature are dropped, and the full text is not
+    stored since it is the concatenation of the segment texts.
+    """
+    segments = transcription.get("segments", [])
+    packed = {
+        "start": [round(segment["start"] * 1000) for segment in segments],
+        "end": [round(segment["end"] * 1000) for segment in segments],
+        "text": [segment.get("text", "") for segment in segments]
+    }
+    if include_scores:
+        packed["scores"] = {
+            field: [segment.get(field) for segment in segments] for field in SCORE_FIELDS
+        }
+    blob = zlib.compress(json.dumps(packed, separators=(',', ':')).encode(), COMPRESSION_LEVEL)
+    return {
+        "format": TRANSCRIPT_FORMAT,
+        "segment_count": len(segments),
+        "segments_blob": blob
+    }
+
+def is_compact(doc: Dict[str, Any]) -> bool:
+    return doc.get("format") == TRANSCRIPT_FORMAT
+
+class CompactTranscript:
+    """
+    Read-only view over a compact transcript document. The blob is only
+    decompressed on first access to segments or text, and segment dicts are
+    built for the requested range only.
+    """
+    def __init__(self, doc: Dict[str, Any]):
+        self.doc = doc
+        self._packed: Optional[Dict[str, Any]] = None
+
+    def __len__(self) -> int:
+        return self.doc.get("segment_count", 0)
+
+    @property
+    def packed(self) -> Dict[str, Any]:
+        if self._packed is None:
+            self._packed = json.loads(zlib.decompress(self.doc["segments_blob"]))
+        return self._packed
+
+    def segments(self, start: int = 0, stop: Optional[int] = None) -> List[Dict[str, Any]]:
+        packed = self.packed
+        scores = packed.get("scores") or {}
+        stop = len(packed["start"]) if stop is None else min(stop, len(packed["start"]))
+        segments = []
+        for index in range(start, stop):
+            segment = {
+                "id": index,
+                "start": packed["start"][index] / 1000,
+                "end": packed["end"][index] / 1000,
+                "text": packed["text"][index]
+            }
+            for field, values in scores.items():
+                segment[field] = values[index]
+            segments.append(segment)
+        return segments
+
+    @property
+    def text(self) -> str:
+        return " ".join(text.strip() for text in self.packed["text"] if text.strip())
+
+    def to_transcription(self) -> Dict[str, Any]:
+        """
+        Rebuilds the legacy `{"text", "segments"}` shape.
+        """
+        return {"text": self.text, "segments": self.segments()}
+
+def load_transcription(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Returns `transcription` and `transcription_raw` for a stored transcript
+    document in either the compact or the legacy format.
+    """
+    if is_compact(doc):
+        transcription = CompactTranscript(doc).to_transcription()
+        return {"transcription": transcription, "transcription_raw": transcription["text"]}
+    return {"transcription": doc.get("transcription"), "transcription_raw": doc.get("transcription_raw")}
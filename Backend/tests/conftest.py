@@ -0,0 +1,20 @@
+# tests/conftest.py
+import pytest
+
+@pytest.fixture
+def groq_headers():
+    """
+    What Groq sends after one request on a fresh key. The request headers
+    describe the daily budget.
+    """
+    return {
+        "x-ratelimit-limit-requests": "14400",
+        "x-ratelimit-remaining-requests": "14399",
+        "x-ratelimit-reset-requests": "6s",
+        "x-ratelimit-limit-tokens": "6000",
+        "x-ratelimit-remaining-tokens": "6000",
+        "x-ratelimit-reset-tokens": "0s",
+        "x-ratelimit-limit-audio-seconds": "7200",
+        "x-ratelimit-remaining-audio-seconds": "7080",
+        "x-ratelimit-reset-audio-seconds": "1m"
+    }
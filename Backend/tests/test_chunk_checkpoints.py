@@ -0,0 +1,55 @@
+# tests/test_chunk_checkpoints.py
+import copy
+from concurrent.futures import Future
+
+import mongomock
+import pytest
+
+from flask_transcriber import transcription_logic
+from flask_transcriber.transcription_logic import ChunkCheckpoints, merge_transcriptions
+
+def chunk_result(chunk_index, start_offset):
+    return {
+        "chunk_index": chunk_index,
+        "start_offset": start_offset,
+        "overlap_before": 0.0,
+        "segments": [{"id": 0, "start": 0.0, "end": 5.0, "text": f" Chunk {chunk_index}."}]
+    }
+
+@pytest.fixture
+def checkpoints_collection(monkeypatch):
+    collection = mongomock.MongoClient().db.chunk_checkpoints
+    monkeypatch.setattr(transcription_logic, 'chunk_checkpoints_collection', collection)
+    monkeypatch.setattr(transcription_logic, 'chunk_plans_collection', mongomock.MongoClient().db.chunk_plans)
+    return collection
+
+def test_merge_leaves_chunk_results_unshifted():
+    chunks = [chunk_result(1, 0.0), chunk_result(2, 600.0)]
+    original = copy.deepcopy(chunks)
+    merged = merge_transcriptions(chunks)
+    assert [segment["start"] for segment in merged["segments"]] == [0.0, 600.0]
+    # A checkpoint of these results must not carry shifted times
+    assert chunks == original
+
+def test_saves_queued_before_clear_are_dropped(checkpoints_collection, monkeypatch):
+    queued = []
+    monkeypatch.setattr(transcription_logic.checkpoint_executor, 'submit', lambda fn, *args: queued.append((fn, args)))
+    checkpoints = ChunkCheckpoints('video', 'job')
+    future = Future()
+    checkpoints.save_when_done({"chunk_index": 1, "start_offset": 0.0, "duration": 600.0}, future)
+    future.set_result(chunk_result(1, 0.0))
+
+    checkpoints.clear()
+    for fn, args in queued:
+        fn(*args)
+    assert checkpoints_collection.count_documents({}) == 0
+
+def test_results_are_checkpointed_until_cleared(checkpoints_collection, monkeypatch):
+    monkeypatch.setattr(transcription_logic.checkpoint_executor, 'submit', lambda fn, *args: fn(*args))
+    checkpoints = ChunkCheckpoints('video', 'job')
+    future = Future()
+    chunk_info = {"chunk_index": 1, "start_offset": 0.0, "duration": 600.0}
+    checkpoints.save_when_done(chunk_info, future)
+    future.set_result(chunk_result(1, 0.0))
+    assert checkpoints_collection.count_documents({'video_id': 'video'}) == 1
+    assert ChunkCheckpoints('video', 'job').get(chunk_info)["segments"][0]["start"] == 0.0
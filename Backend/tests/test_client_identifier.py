@@ -0,0 +1,31 @@
+# tests/test_client_identifier.py
+import ipaddress
+
+import pytest
+from starlette.requests import Request
+
+from api.routers import transcription
+from api.routers.transcription import client_identifier
+
+def make_request(peer: str, forwarded_for: str = None) -> Request:
+    headers = [(b'x-forwarded-for', forwarded_for.encode())] if forwarded_for else []
+    return Request({'type': 'http', 'method': 'POST', 'path': '/', 'headers': headers, 'client': (peer, 51234)})
+
+@pytest.fixture
+def trusted_proxies(monkeypatch):
+    monkeypatch.setattr(transcription, 'TRUSTED_PROXIES', [ipaddress.ip_network('10.0.0.0/8')])
+
+def test_forwarded_for_is_ignored_without_trusted_proxies():
+    assert client_identifier(make_request('203.0.113.7', '198.51.100.1')) == '203.0.113.7'
+
+def test_forwarded_for_from_an_untrusted_peer_is_ignored(trusted_proxies):
+    assert client_identifier(make_request('203.0.113.7', '198.51.100.1')) == '203.0.113.7'
+
+def test_spoofed_hops_before_the_proxy_are_ignored(trusted_proxies):
+    # The client sent "198.51.100.1"; the proxy appended the address it saw
+    request = make_request('10.0.0.2', '198.51.100.1, 203.0.113.7')
+    assert client_identifier(request) == '203.0.113.7'
+
+def test_chained_trusted_proxies_are_skipped(trusted_proxies):
+    request = make_request('10.0.0.2', '198.51.100.1, 203.0.113.7, 10.0.0.5')
+    assert client_identifier(request) == '203.0.113.7'
@@ -0,0 +1,47 @@
+# tests/test_key_leases.py
+import fakeredis
+import pytest
+
+from flask_transcriber.key_leases import SharedKeyManager
+
+@pytest.fixture
+def manager():
+    return SharedKeyManager(["key"], fakeredis.FakeRedis(), concurrency_limit=100,
+                            requests_per_minute=20, audio_seconds_per_hour=7200)
+
+def budget(manager):
+    values = manager.redis_client.hgetall(manager.budget_keys["key"])
+    return {name.decode(): float(value) for name, value in values.items()}
+
+def test_daily_request_headers_leave_the_per_minute_bucket_alone(manager, groq_headers):
+    manager.reserve()
+    manager.update_from_headers("key", groq_headers)
+    state = budget(manager)
+    assert state["req_tokens"] == pytest.approx(19, abs=0.1)
+    assert state["day_capacity"] == 14400
+    assert state["day_tokens"] == 14399
+    assert state["audio_tokens"] == 7080
+
+def test_per_minute_limit_still_applies_after_headers(manager, groq_headers):
+    manager.update_from_headers("key", groq_headers)
+    waits = [manager.reserve()[1] for _ in range(21)]
+    assert waits[:20] == [0.0] * 20
+    # The 21st request waits for the per-minute bucket, not the daily one
+    assert waits[20] == pytest.approx(3, abs=0.1)
+
+def test_exhausted_daily_budget_holds_the_key_back(manager, groq_headers):
+    manager.update_from_headers("key", {
+        **groq_headers,
+        "x-ratelimit-remaining-requests": "0",
+        "x-ratelimit-reset-requests": "8h"
+    })
+    # 14400 requests refill over 8 hours, one every two seconds
+    _, wait = manager.reserve()
+    assert wait == pytest.approx(2, rel=0.01)
+
+def test_rate_limited_key_without_retry_after_waits_for_its_minute_bucket(manager, groq_headers):
+    error = type("RateLimitError", (Exception,), {"status_code": 429})()
+    manager.update_from_headers("key", groq_headers)
+    manager.record_error_response("key", error)
+    _, wait = manager.reserve()
+    assert wait == pytest.approx(3, abs=0.1)
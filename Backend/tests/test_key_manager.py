@@ -0,0 +1,34 @@
+# tests/test_key_manager.py
+import pytest
+
+from flask_transcriber.key_manager import APIKeyManager
+
+def test_daily_request_headers_leave_the_per_minute_bucket_alone(groq_headers):
+    manager = APIKeyManager(["key"], requests_per_minute=20, audio_seconds_per_hour=7200)
+    manager.update_from_headers("key", groq_headers)
+    state = manager.states["key"]
+    assert state.requests.capacity == 20
+    assert state.requests.refill_rate == pytest.approx(20 / 60)
+    assert state.daily_requests.capacity == 14400
+    assert state.daily_requests.tokens == 14399
+    assert state.audio_seconds.tokens == 7080
+
+def test_per_minute_limit_still_applies_after_headers(groq_headers):
+    manager = APIKeyManager(["key"], requests_per_minute=20, audio_seconds_per_hour=7200)
+    manager.update_from_headers("key", groq_headers)
+    waits = [manager.reserve()[1] for _ in range(21)]
+    assert waits[:20] == [0.0] * 20
+    # The 21st request waits for the per-minute bucket, not the daily one
+    assert waits[20] == pytest.approx(3, abs=0.1)
+
+def test_exhausted_daily_budget_holds_the_key_back(groq_headers):
+    manager = APIKeyManager(["key"], requests_per_minute=20, audio_seconds_per_hour=7200)
+    manager.update_from_headers("key", {
+        **groq_headers,
+        "x-ratelimit-remaining-requests": "0",
+        "x-ratelimit-reset-requests": "8h"
+    })
+    # 14400 requests refill over 8 hours, one every two seconds
+    _, wait = manager.reserve()
+    assert wait == pytest.approx(2, rel=0.01)
+    assert manager.free_capacity() == (0, 0)
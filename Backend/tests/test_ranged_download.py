@@ -0,0 +1,128 @@
+# tests/test_ranged_download.py
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from flask_transcriber import ranged_download
+from flask_transcriber.ranged_download import (
+    download_ranged,
+    download_with_fallback,
+    RangesUnsupportedError
+)
+
+SOURCE = os.urandom(300_000)
+RANGE_SIZE = 64 * 1024
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """
+    Serves SOURCE, honouring Range headers unless `ranges` is off. The first
+    request for each offset in `truncate_at` is cut short after
+    `truncate_bytes` bytes.
+    """
+    protocol_version = 'HTTP/1.1'
+    ranges = True
+    truncate_at = set()
+    truncate_bytes = 1000
+    requests = []
+    lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        range_header = self.headers.get('Range')
+        with self.lock:
+            self.requests.append(range_header)
+        if not self.ranges or not range_header:
+            self._send(200, SOURCE)
+            return
+        start, end = (int(value) for value in re.match(r'bytes=(\d+)-(\d+)', range_header).groups())
+        end = min(end, len(SOURCE) - 1)
+        body = SOURCE[start:end + 1]
+        with self.lock:
+            if start in self.truncate_at:
+                self.truncate_at.discard(start)
+                body = body[:self.truncate_bytes]
+                end = start + len(body) - 1
+        self._send(206, body, {'Content-Range': f"bytes {start}-{end}/{len(SOURCE)}"})
+
+    def _send(self, status, body, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+@pytest.fixture
+def server(monkeypatch):
+    # Retries should not wait out the production backoff
+    monkeypatch.setattr(ranged_download, 'RANGE_INITIAL_BACKOFF', 0)
+    monkeypatch.setattr(ranged_download.random, 'uniform', lambda low, high: 0)
+    handler = type('Handler', (RangeHandler,), {'truncate_at': set(), 'requests': []})
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield handler, f"http://127.0.0.1:{httpd.server_address[1]}/audio.m4a"
+    httpd.shutdown()
+    httpd.server_close()
+
+def read(path):
+    with open(path, 'rb') as file:
+        return file.read()
+
+def test_ranged_download_matches_source(server, tmp_path):
+    handler, url = server
+    progress = []
+    path = download_ranged(url, str(tmp_path / 'audio.m4a'), connections=4,
+                           range_size=RANGE_SIZE, on_progress=progress.append)
+    assert read(path) == SOURCE
+    # One probe plus one request per range
+    assert len(handler.requests) == 1 + -(-len(SOURCE) // RANGE_SIZE)
+    assert max(progress) == pytest.approx(100)
+
+def test_truncated_range_is_resumed(server, tmp_path):
+    handler, url = server
+    handler.truncate_at.update({RANGE_SIZE, 3 * RANGE_SIZE})
+    progress = []
+    path = download_ranged(url, str(tmp_path / 'audio.m4a'), connections=4,
+                           range_size=RANGE_SIZE, on_progress=progress.append)
+    assert read(path) == SOURCE
+    # Each cut-short range is requested again from where it stopped
+    assert f"bytes={RANGE_SIZE + handler.truncate_bytes}-{2 * RANGE_SIZE - 1}" in handler.requests
+    assert f"bytes={3 * RANGE_SIZE + handler.truncate_bytes}-{4 * RANGE_SIZE - 1}" in handler.requests
+    assert max(progress) == pytest.approx(100)
+
+def test_ignored_ranges_fail_without_retrying(server, tmp_path):
+    handler, url = server
+    handler.ranges = False
+    with pytest.raises(RangesUnsupportedError):
+        download_ranged(url, str(tmp_path / 'audio.m4a'), total_size=len(SOURCE), range_size=RANGE_SIZE)
+    assert not (tmp_path / 'audio.m4a').exists()
+
+def test_falls_back_to_single_stream(server, tmp_path):
+    handler, url = server
+    handler.ranges = False
+    progress = []
+    path = download_with_fallback(url, str(tmp_path / 'audio.m4a'), range_size=RANGE_SIZE,
+                                  on_progress=progress.append)
+    assert read(path) == SOURCE
+    # The range probe, then one plain request
+    assert handler.requests == ['bytes=0-0', None]
+    assert progress[-1] == pytest.approx(100)
+
+def test_falls_back_to_given_downloader(server, tmp_path):
+    handler, url = server
+    handler.ranges = False
+    fallback_path = tmp_path / 'fallback.m4a'
+
+    def fallback():
+        fallback_path.write_bytes(b'fallback')
+        return str(fallback_path)
+
+    path = download_with_fallback(url, str(tmp_path / 'audio.m4a'), total_size=len(SOURCE),
+                                  range_size=RANGE_SIZE, fallback=fallback)
+    assert path == str(fallback_path)
@@ -0,0 +1,69 @@
+# tests/test_rate_limit_retries.py
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from flask_transcriber import transcription_logic
+from flask_transcriber.async_engine import AsyncTranscriptionEngine
+from flask_transcriber.key_manager import APIKeyManager
+
+RATE_LIMITS_BEFORE_SUCCESS = 5
+TRANSCRIPTION = {"text": " Hello.", "segments": [{"id": 0, "start": 0.0, "end": 1.0, "text": " Hello."}]}
+
+class RateLimited(Exception):
+    status_code = 429
+    response = SimpleNamespace(headers={"retry-after": "0.01"})
+
+def fake_create(calls, parse):
+    def create(**kwargs):
+        calls.append(kwargs)
+        if len(calls) <= RATE_LIMITS_BEFORE_SUCCESS:
+            raise RateLimited("Rate limit reached")
+        return SimpleNamespace(headers={}, parse=parse)
+    return create
+
+def fake_client(create):
+    return SimpleNamespace(audio=SimpleNamespace(transcriptions=SimpleNamespace(
+        with_raw_response=SimpleNamespace(create=create)
+    )))
+
+@pytest.fixture
+def chunk_info(tmp_path):
+    chunk_path = tmp_path / "chunk_1.mp3"
+    chunk_path.write_bytes(b"audio")
+    return {"chunk_index": 1, "chunk_path": str(chunk_path), "duration": 1.0, "start_offset": 0.0}
+
+def test_threaded_engine_waits_out_rate_limits(monkeypatch, chunk_info):
+    calls = []
+    parse = lambda: SimpleNamespace(model_dump=lambda: TRANSCRIPTION)
+    client = fake_client(fake_create(calls, parse))
+    monkeypatch.setattr(transcription_logic, 'MAX_RETRIES', 3)
+    monkeypatch.setattr(transcription_logic, 'api_key_manager', APIKeyManager(["key"]))
+    monkeypatch.setattr(transcription_logic, 'get_groq_client', lambda api_key: client)
+
+    result = transcription_logic.transcribe_audio_chunk(chunk_info)
+    assert result["segments"] == TRANSCRIPTION["segments"]
+    assert len(calls) == RATE_LIMITS_BEFORE_SUCCESS + 1
+
+def test_async_engine_waits_out_rate_limits(chunk_info):
+    calls = []
+
+    async def parse():
+        return SimpleNamespace(model_dump=lambda: TRANSCRIPTION)
+
+    create = fake_create(calls, parse)
+
+    async def create_async(**kwargs):
+        return create(**kwargs)
+
+    engine = AsyncTranscriptionEngine(APIKeyManager(["key"]), per_key_concurrency=1, max_retries=3, initial_backoff=0)
+    engine.clients["key"] = fake_client(create_async)
+    engine.semaphores["key"] = asyncio.Semaphore(1)
+    try:
+        result = engine.submit(chunk_info).result(timeout=10)
+    finally:
+        engine.loop.call_soon_threadsafe(engine.loop.stop)
+        engine.thread.join()
+    assert result["segments"] == TRANSCRIPTION["segments"]
+    assert len(calls) == RATE_LIMITS_BEFORE_SUCCESS + 1
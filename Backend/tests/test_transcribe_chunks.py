@@ -0,0 +1,80 @@
+# tests/test_transcribe_chunks.py
+import threading
+import time
+
+import pytest
+
+from flask_transcriber import transcription_logic
+
+CHUNK_LATENCY = 0.3  # seconds
+
+@pytest.fixture
+def threaded_engine(monkeypatch):
+    """
+    Runs transcribe_chunks on two threads against a fake transcriber whose
+    first chunk fails quickly. Returns the indexes of the chunks sent.
+    """
+    monkeypatch.setattr(transcription_logic, 'TRANSCRIPTION_ENGINE', 'threads')
+    monkeypatch.setattr(transcription_logic, 'MAX_WORKERS', 2)
+    sent = []
+    lock = threading.Lock()
+
+    def transcribe_audio_chunk(chunk_info):
+        with lock:
+            sent.append(chunk_info['chunk_index'])
+        if chunk_info['chunk_index'] == 1:
+            time.sleep(0.05)
+            raise Exception("Groq server error (HTTP 500)")
+        time.sleep(CHUNK_LATENCY)
+        return {'chunk_index': chunk_info['chunk_index'], 'segments': []}
+
+    monkeypatch.setattr(transcription_logic, 'transcribe_audio_chunk', transcribe_audio_chunk)
+    return sent
+
+def chunk_list(count):
+    return [{'chunk_index': index, 'chunk_path': f"chunk_{index}.mp3", 'duration': 60.0} for index in range(1, count + 1)]
+
+def test_first_failure_is_raised_without_waiting_for_queued_chunks(threaded_engine):
+    started = time.monotonic()
+    with pytest.raises(Exception, match="HTTP 500"):
+        transcription_logic.transcribe_chunks(chunk_list(8))
+    assert time.monotonic() - started < CHUNK_LATENCY
+    # Only chunks already running were sent; the failed chunk's thread may
+    # have picked up one more before the failure was seen
+    time.sleep(CHUNK_LATENCY * 2)
+    assert len(threaded_engine) <= 3
+
+def test_failure_closes_the_chunk_generator(threaded_engine):
+    closed = threading.Event()
+
+    def stream():
+        try:
+            for chunk_info in chunk_list(8):
+                yield chunk_info
+                time.sleep(0.1)
+        finally:
+            closed.set()
+
+    with pytest.raises(Exception, match="HTTP 500"):
+        transcription_logic.transcribe_chunks(stream())
+    assert closed.is_set()
+    assert len(threaded_engine) < 8
+
+def test_rejected_youtube_tokens_fail_the_pipelined_job_as_a_download_error(monkeypatch):
+    from pytubefix.exceptions import BotDetection
+
+    failures = []
+
+    def resolve_youtube_audio(video_id):
+        raise BotDetection(video_id)
+
+    monkeypatch.setattr(transcription_logic, 'PIPELINED_TRANSCRIPTION', True)
+    monkeypatch.setattr(transcription_logic, 'resolve_youtube_audio', resolve_youtube_audio)
+    monkeypatch.setattr(transcription_logic, 'mark_job_failed', lambda job_id, error, error_type: failures.append(error_type))
+    monkeypatch.setattr(transcription_logic, 'ChunkCheckpoints', lambda video_id, job_id: None)
+    monkeypatch.setattr(transcription_logic, 'load_chunk_plan', lambda video_id: None)
+    monkeypatch.setattr(transcription_logic, 'publish_job_event', lambda job_id, event, pipeline=None: None)
+    monkeypatch.setattr(transcription_logic.jobs_collection, 'update_one', lambda *args, **kwargs: None)
+
+    transcription_logic.process_transcription('video', 'job')
+    assert failures == ['DOWNLOAD_ERROR']
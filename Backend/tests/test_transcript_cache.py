@@ -0,0 +1,35 @@
+# tests/test_transcript_cache.py
+from starlette.requests import Request
+
+from api.cache.transcript_cache import CachedBody, compress, compressed_json_response, make_etag
+
+BODY = b'{"status":"completed"}'
+
+def make_request(method: str, headers: dict) -> Request:
+    return Request({
+        'type': 'http',
+        'method': method,
+        'path': '/',
+        'headers': [(name.lower().encode(), value.encode()) for name, value in headers.items()]
+    })
+
+def cached_body() -> CachedBody:
+    return CachedBody(compress(BODY, 'gzip'), make_etag(BODY))
+
+def test_conditional_response_is_tagged_and_honours_if_none_match():
+    cached = cached_body()
+    response = compressed_json_response(make_request('GET', {}), cached, 'gzip')
+    assert response.headers['etag'] == cached.etag
+    assert 'public' in response.headers['cache-control']
+
+    response = compressed_json_response(make_request('GET', {'If-None-Match': cached.etag}), cached, 'gzip')
+    assert response.status_code == 304
+
+def test_unconditional_response_ignores_if_none_match():
+    cached = cached_body()
+    request = make_request('POST', {'If-None-Match': cached.etag})
+    response = compressed_json_response(request, cached, None, status_code=202, conditional=False)
+    assert response.status_code == 202
+    assert response.body == BODY
+    assert 'etag' not in response.headers
+    assert 'cache-control' not in response.headers
@@ -0,0 +1,28 @@
+# tests/test_transcript_codec.py
+from shared.transcript_codec import CompactTranscript, encode_transcript, load_transcription
+
+TRANSCRIPTION = {
+    "text": "Hello there. General Kenobi.",
+    "segments": [
+        {"id": 0, "start": 0.0, "end": 1.25, "text": " Hello there.", "tokens": [1, 2], "avg_logprob": -0.2},
+        {"id": 1, "start": 1.25, "end": 2.5, "text": " General Kenobi.", "tokens": [3], "avg_logprob": -0.4}
+    ]
+}
+
+def test_compact_transcript_round_trips():
+    doc = {"_id": "video", **encode_transcript(TRANSCRIPTION)}
+    loaded = load_transcription(doc)
+    assert loaded["transcription_raw"] == "Hello there. General Kenobi."
+    assert loaded["transcription"]["segments"] == [
+        {"id": 0, "start": 0.0, "end": 1.25, "text": " Hello there."},
+        {"id": 1, "start": 1.25, "end": 2.5, "text": " General Kenobi."}
+    ]
+
+def test_scores_are_only_kept_when_asked_for():
+    transcript = CompactTranscript(encode_transcript(TRANSCRIPTION, include_scores=True))
+    assert len(transcript) == 2
+    assert transcript.segments(1)[0]["avg_logprob"] == -0.4
+
+def test_legacy_documents_load_unchanged():
+    doc = {"_id": "video", "transcription": TRANSCRIPTION, "transcription_raw": TRANSCRIPTION["text"]}
+    assert load_transcription(doc) == {"transcription": TRANSCRIPTION, "transcription_raw": TRANSCRIPTION["text"]}
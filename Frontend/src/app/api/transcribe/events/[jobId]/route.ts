@@ -0,0 +1,59 @@
+import { NextRequest, NextResponse } from 'next/server';
+
+type RouteContext = {
+  params: {
+    jobId: Promise<string> | string;
+  };
+};
+
+export async function GET(
+  request: NextRequest,
+  context: RouteContext
+) {
+  try {
+    const jobId = await context.params.jobId;
+
+    if (!jobId || typeof jobId !== 'string') {
+      return NextResponse.json(
+        { error: 'Job ID is required' },
+        { status: 400 }
+      );
+    }
+
+    const apiUrl = process.env.NEXT_PUBLIC_API_URL || 'https://api.transcrib.ee';
+    const eventsUrl = new URL(`/transcribe/events/${jobId}`, apiUrl);
+
+    const response = await fetch(eventsUrl, {
+      headers: {
+        'Accept': 'text/event-stream',
+        'Origin': process.env.NEXT_PUBLIC_APP_URL || 'http://localhost:3000'
+      },
+      cache: 'no-store',
+      signal: request.signal,
+    });
+
+    if (!response.ok || !response.body) {
+      const errorData = await response.json().catch(() => ({}));
+      throw new Error(errorData.detail || `HTTP error! status: ${response.status}`);
+    }
+
+    // Pass the event stream through unbuffered
+    return new Response(response.body, {
+      headers: {
+        'Content-Type': 'text/event-stream',
+        'Cache-Control': 'no-cache, no-transform',
+        'Connection': 'keep-alive',
+      },
+    });
+
+  } catch (error) {
+    console.error('Error streaming transcription events:', error);
+    return NextResponse.json(
+      {
+        error: error instanceof Error ? error.message : 'Failed to stream transcription events',
+        status: 'failed',
+      },
+      { status: 500 }
+    );
+  }
+}
@@ -41,14 +41,21 @@ export async function POST(request: Request) {
     const controller = new AbortController()
     const timeoutId = setTimeout(() => controller.abort(), 15000)
 
+    // The backend schedules queued jobs fairly per client address
+    const headers: Record<string, string> = {
+      'Content-Type': 'application/json',
+      'Accept': 'application/json',
+      'Origin': process.env.NEXT_PUBLIC_APP_URL || 'http://localhost:3000'
+    }
+    const forwardedFor = request.headers.get('x-forwarded-for') || request.headers.get('x-real-ip')
+    if (forwardedFor) {
+      headers['X-Forwarded-For'] = forwardedFor
+    }
+
     try {
       const response = await fetch(backendApiUrl, {
         method: 'POST',
-        headers: { 
-          'Content-Type': 'application/json',
-          'Accept': 'application/json',
-          'Origin': process.env.NEXT_PUBLIC_APP_URL || 'http://localhost:3000'
-        },
+        headers,
         body: JSON.stringify({ youtube_url: formattedUrl }),
         signal: controller.signal,
       })
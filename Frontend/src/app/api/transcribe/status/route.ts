@@ -0,0 +1,47 @@
+import { NextRequest, NextResponse } from 'next/server';
+
+// Resolves many job IDs in one backend request
+export async function POST(request: NextRequest) {
+  try {
+    const { job_ids } = await request.json();
+
+    if (!Array.isArray(job_ids) || job_ids.some((jobId) => typeof jobId !== 'string')) {
+      return NextResponse.json(
+        { error: 'job_ids must be a list of job IDs' },
+        { status: 400 }
+      );
+    }
+
+    const apiUrl = process.env.NEXT_PUBLIC_API_URL || 'https://api.transcrib.ee';
+    const statusUrl = new URL('/transcribe/status', apiUrl);
+
+    const response = await fetch(statusUrl, {
+      method: 'POST',
+      headers: {
+        'Accept': 'application/json',
+        'Content-Type': 'application/json',
+        'Origin': process.env.NEXT_PUBLIC_APP_URL || 'http://localhost:3000'
+      },
+      body: JSON.stringify({ job_ids }),
+      cache: 'no-store'
+    });
+
+    if (!response.ok) {
+      const errorData = await response.json().catch(() => ({}));
+      throw new Error(errorData.error || errorData.detail || `HTTP error! status: ${response.status}`);
+    }
+
+    const data = await response.json();
+    return NextResponse.json(data);
+
+  } catch (error) {
+    console.error('Error checking transcription statuses:', error);
+    return NextResponse.json(
+      {
+        error: error instanceof Error ? error.message : 'Failed to check transcription statuses',
+        status: 'failed',
+      },
+      { status: error instanceof Error && error.message.includes('timeout') ? 504 : 500 }
+    );
+  }
+}
@@ -0,0 +1,73 @@
+import { NextRequest, NextResponse } from 'next/server';
+
+type RouteContext = {
+  params: {
+    videoId: Promise<string> | string;
+  };
+};
+
+export async function GET(
+  request: NextRequest,
+  context: RouteContext
+) {
+  try {
+    const videoId = await context.params.videoId;
+
+    if (!videoId || typeof videoId !== 'string') {
+      return NextResponse.json(
+        { error: 'Video ID is required' },
+        { status: 400 }
+      );
+    }
+
+    const apiUrl = process.env.NEXT_PUBLIC_API_URL || 'https://api.transcrib.ee';
+    const transcriptUrl = new URL(`/transcribe/transcript/${videoId}`, apiUrl);
+    // Forward pagination parameters (cursor, limit)
+    transcriptUrl.search = request.nextUrl.search;
+
+    const headers: Record<string, string> = {
+      'Accept': 'application/json',
+      'Origin': process.env.NEXT_PUBLIC_APP_URL || 'http://localhost:3000'
+    };
+    const ifNoneMatch = request.headers.get('if-none-match');
+    if (ifNoneMatch) {
+      headers['If-None-Match'] = ifNoneMatch;
+    }
+
+    const response = await fetch(transcriptUrl, {
+      headers,
+      cache: 'no-store'
+    });
+
+    const etag = response.headers.get('etag');
+    if (response.status === 304) {
+      return new Response(null, {
+        status: 304,
+        headers: etag ? { 'ETag': etag } : {},
+      });
+    }
+
+    if (!response.ok) {
+      const errorData = await response.json().catch(() => ({}));
+      return NextResponse.json(
+        { error: errorData.detail || `HTTP error! status: ${response.status}` },
+        { status: response.status }
+      );
+    }
+
+    const data = await response.json();
+    return NextResponse.json(data, {
+      headers: {
+        ...(etag ? { 'ETag': etag } : {}),
+        'Cache-Control': response.headers.get('cache-control') || 'no-cache',
+      },
+    });
+
+  } catch (error) {
+    console.error('Error fetching transcript:', error);
+    return NextResponse.json(
+      { error: error instanceof Error ? error.message : 'Failed to fetch transcript' },
+      { status: 500 }
+    );
+  }
+}
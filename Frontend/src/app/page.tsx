@@ -17,6 +17,7 @@ import { Skeleton } from "@/components/ui/skeleton"
 import { useTranscriptionHistory } from '@/hooks/use-transcription-history'
 import { TranscriptionProgress } from '@/components/TranscriptionProgress'
 import { useTranscriptionProgress } from '@/hooks/useTranscriptionProgress'
+import { useJobProgress } from '@/hooks/useJobProgress'
 import { type TranscriptionStatus } from '@/types/transcription'
 
 export interface TranscriptResponse {
@@ -235,6 +236,9 @@ export default function HomePage({ initialUrl, skipHero }: { initialUrl?: string
   const pollIntervalRef = useRef<NodeJS.Timeout | null>(null)
   const pollCountRef = useRef<number>(0)
   const MAX_POLL_ATTEMPTS = 100
+  const POLL_INTERVAL = 2000
+  // Progress arrives over server-sent events, so polling is only a fallback
+  const POLL_INTERVAL_WITH_EVENTS = 15000
   const [videoDetails, setVideoDetails] = useState<{
     title?: string;
     duration?: string;
@@ -253,6 +257,9 @@ export default function HomePage({ initialUrl, skipHero }: { initialUrl?: string
   const [isClientReady, setIsClientReady] = useState(false)
   const { history, addToHistory, removeFromHistory, clearHistory, count } = useTranscriptionHistory()
   const transcriptionProgress = useTranscriptionProgress(transcript?.status as TranscriptionStatus || 'processing');
+  const [activeJobId, setActiveJobId] = useState<string | null>(null)
+  const { event: jobEvent, connected: jobEventsConnected } = useJobProgress(activeJobId)
+  const jobEventsConnectedRef = useRef(false)
 
   const formatTimestamp = useCallback((seconds: number) => {
     const hours = Math.floor(seconds / 3600)
@@ -343,7 +350,17 @@ export default function HomePage({ initialUrl, skipHero }: { initialUrl?: string
         throw new Error(data.error || `HTTP error! status: ${response.status}`);
       }
 
-      const data = await response.json();
+      let data = await response.json();
+
+      // Status responses only carry metadata; fetch the transcript once the job is done
+      if (data.status === 'success' && data.video_id) {
+        const transcriptResponse = await fetch(`${API_URL}/transcribe/transcript/${data.video_id}`);
+        if (!transcriptResponse.ok) {
+          const errorData = await transcriptResponse.json().catch(() => ({}));
+          throw new Error(errorData.error || `HTTP error! status: ${transcriptResponse.status}`);
+        }
+        data = await transcriptResponse.json();
+      }
       setTranscript(data);
 
       // If we have a complete transcript, stop polling and update history
@@ -384,7 +401,8 @@ export default function HomePage({ initialUrl, skipHero }: { initialUrl?: string
 
       // Continue polling if still processing
       if (['processing', 'accepted', 'pending'].includes(data.status)) {
-        pollIntervalRef.current = setTimeout(() => pollTranscriptionStatus(jobId), 2000);
+        const delay = jobEventsConnectedRef.current ? POLL_INTERVAL_WITH_EVENTS : POLL_INTERVAL;
+        pollIntervalRef.current = setTimeout(() => pollTranscriptionStatus(jobId), delay);
         return;
       }
 
@@ -401,6 +419,20 @@ export default function HomePage({ initialUrl, skipHero }: { initialUrl?: string
     }
   }, [clearPolling, toast, url, videoDetails.duration, addToHistory, formatToSRT, formatToVTT]);
 
+  useEffect(() => {
+    jobEventsConnectedRef.current = jobEventsConnected
+  }, [jobEventsConnected])
+
+  // Fetch the result as soon as the job reports a terminal state instead of
+  // waiting for the next poll
+  useEffect(() => {
+    if (activeJobId && jobEvent && ['success', 'failed'].includes(jobEvent.stage)) {
+      clearPolling();
+      pollTranscriptionStatus(activeJobId);
+      setActiveJobId(null);
+    }
+  }, [activeJobId, jobEvent, clearPolling, pollTranscriptionStatus]);
+
   const fetchTranscript = useCallback(async (e: React.FormEvent) => {
     e.preventDefault();
     
@@ -411,6 +443,7 @@ export default function HomePage({ initialUrl, skipHero }: { initialUrl?: string
       setLoading(true);
       setError(null);
       setTranscript(null);
+      setActiveJobId(null);
       clearPolling();
       startTimeRef.current = performance.now();
 
@@ -445,6 +478,7 @@ export default function HomePage({ initialUrl, skipHero }: { initialUrl?: string
           title: "Processing started",
           description: "Your transcript is being processed...",
         });
+        setActiveJobId(data.job_id);
         pollTranscriptionStatus(data.job_id);
         return;
       }
@@ -819,7 +853,7 @@ export default function HomePage({ initialUrl, skipHero }: { initialUrl?: string
                                   <div className="flex flex-col items-center justify-center h-full">
                                     <TranscriptionProgress 
                                       status={transcript?.status as TranscriptionStatus || 'processing'}
-                                      progress={transcriptionProgress}
+                                      progress={jobEvent?.progress ?? transcriptionProgress}
                                       className="mb-4"
                                     />
                                   </div>
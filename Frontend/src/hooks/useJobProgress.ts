@@ -0,0 +1,57 @@
+import { useState, useEffect } from 'react';
+
+export interface JobProgressEvent {
+  job_id: string;
+  stage: 'processing' | 'downloading' | 'transcribing' | 'merging' | 'saving' | 'success' | 'failed' | string;
+  progress: number;
+  download_percent?: number;
+  chunks_done?: number;
+  chunks_total?: number;
+  error?: string;
+}
+
+const TERMINAL_STAGES = ['success', 'failed'];
+
+// Subscribes to the backend's server-sent progress events for a job.
+// Returns null until the first event arrives or if the stream is unavailable,
+// so callers can fall back to estimated progress.
+export function useJobProgress(jobId: string | null) {
+  const [event, setEvent] = useState<JobProgressEvent | null>(null);
+  const [connected, setConnected] = useState(false);
+
+  useEffect(() => {
+    setEvent(null);
+    setConnected(false);
+    if (!jobId || typeof EventSource === 'undefined') {
+      return;
+    }
+
+    const source = new EventSource(`/api/transcribe/events/${jobId}`);
+
+    source.onopen = () => setConnected(true);
+
+    source.addEventListener('progress', (message) => {
+      try {
+        const data = JSON.parse((message as MessageEvent).data) as JobProgressEvent;
+        setEvent(data);
+        if (TERMINAL_STAGES.includes(data.stage)) {
+          source.close();
+          setConnected(false);
+        }
+      } catch (error) {
+        console.error('Error parsing progress event:', error);
+      }
+    });
+
+    source.onerror = () => {
+      source.close();
+      setConnected(false);
+    };
+
+    return () => {
+      source.close();
+    };
+  }, [jobId]);
+
+  return { event, connected };
+}